@@ -1,4 +1,6 @@
 # app.py
+import os
+
 from flask import Flask, jsonify
 import pyautogui
 
@@ -24,4 +26,6 @@ def write_message():
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # development server only; FLASK_DEBUG=1 turns on the debugger and reloader.
+    # Serve with `python serve.py` in production.
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1")
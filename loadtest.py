@@ -0,0 +1,176 @@
+# loadtest.py
+"""
+Load-test harness for the Flask demos: an asyncio HTTP/1.1 client with
+keep-alive connections, no dependencies beyond the standard library.
+
+    python loadtest.py                                  # /calculate against a running server
+    python loadtest.py --spawn "--threads 16"           # start serve.py, test, stop it
+    python loadtest.py --route write-message --base-url http://127.0.0.1:5000 --duration 5
+
+Each of --connections connections sends its next request as soon as the
+previous response arrives, for --duration seconds (after a --warmup), and
+the report gives requests/sec and latency percentiles per route. Note that
+/write-message also types the message with pyautogui, about 2.5 s per call.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OPERATIONS = ("add", "subtract", "multiply", "divide")
+
+
+def calculate_body() -> bytes:
+    return json.dumps({"num1": round(random.uniform(-1e3, 1e3), 3), "num2": round(random.uniform(1, 100), 3),
+                       "operation": random.choice(OPERATIONS)}).encode()
+
+
+ROUTES = {
+    # name -> (method, path, body factory or None)
+    "calculate": ("POST", "/calculate", calculate_body),
+    "write-message": ("GET", "/write-message", None),
+}
+ROUTE_APPS = {"calculate": "calculator", "write-message": "message"}  # serve.py app names
+
+
+def _request(host: str, method: str, path: str, body: bytes) -> bytes:
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+    if body is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return (head + "\r\n").encode() + (body or b"")
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """(status, keep_alive) of one response, with its body consumed."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    keep_alive = headers.get("connection", "").lower() != "close" and lines[0].startswith("HTTP/1.1")
+    return status, keep_alive
+
+
+async def _connection(url, route: str, stop_at: float, record_from: float, stats: dict):
+    method, path, make_body = ROUTES[route]
+    writer = None
+    while time.perf_counter() < stop_at:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            t0 = time.perf_counter()
+            writer.write(_request(url.netloc, method, path, make_body() if make_body else None))
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+            t1 = time.perf_counter()
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            stats["errors"][type(e).__name__] = stats["errors"].get(type(e).__name__, 0) + 1
+            writer = None
+            await asyncio.sleep(0.05)
+            continue
+        if t0 >= record_from:
+            stats["latencies"].append(t1 - t0)
+            if status >= 400:
+                stats["errors"][f"HTTP {status}"] = stats["errors"].get(f"HTTP {status}", 0) + 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url: str, route: str, connections: int, duration: float, warmup: float) -> dict:
+    url = urlsplit(base_url)
+    stats = {"latencies": [], "errors": {}}
+    start = time.perf_counter()
+    record_from, stop_at = start + warmup, start + warmup + duration
+    await asyncio.gather(*(_connection(url, route, stop_at, record_from, stats) for _ in range(connections)))
+    return summarize(route, stats, duration)
+
+
+def summarize(route: str, stats: dict, duration: float) -> dict:
+    latencies = sorted(stats["latencies"])
+    n = len(latencies)
+
+    def pct(p):
+        return latencies[min(n - 1, int(p / 100 * n))] * 1000 if n else float("nan")
+
+    return {"route": route, "requests": n, "rps": n / duration, "p50_ms": pct(50), "p90_ms": pct(90),
+            "p99_ms": pct(99), "max_ms": latencies[-1] * 1000 if n else float("nan"),
+            "mean_ms": statistics.fmean(latencies) * 1000 if n else float("nan"), "errors": stats["errors"]}
+
+
+def wait_for_port(host: str, port: int, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start listening on {host}:{port}")
+
+
+def spawn(base_url: str, route: str, serve_args: str) -> subprocess.Popen:
+    """Start serve.py with the app that has ``route`` and wait until it listens."""
+    url = urlsplit(base_url)
+    command = [sys.executable, os.path.join(ROOT, "serve.py"), ROUTE_APPS[route], "--host", url.hostname,
+               "--port", str(url.port or 80)] + shlex.split(serve_args)
+    server = subprocess.Popen(command)
+    try:
+        wait_for_port(url.hostname, url.port or 80)
+    except RuntimeError:
+        server.kill()
+        raise
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--route", choices=list(ROUTES), action="append",
+                        help="route to test; repeat for several (default: calculate)")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per route")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds run before measuring")
+    parser.add_argument("--spawn", nargs="?", const="", default=None, metavar="SERVE_ARGS",
+                        help="start serve.py with these arguments for each route's test and stop it afterwards")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON lines")
+    args = parser.parse_args()
+    routes = args.route or ["calculate"]
+
+    for route in routes:
+        server = spawn(args.base_url, route, args.spawn) if args.spawn is not None else None
+        try:
+            result = asyncio.run(run_load(args.base_url, route, args.connections, args.duration, args.warmup))
+        finally:
+            if server is not None:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=60)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{route:<14} {result['requests']:>8} requests  {result['rps']:9.1f} req/s  "
+                  f"p50 {result['p50_ms']:7.2f}ms  p90 {result['p90_ms']:7.2f}ms  "
+                  f"p99 {result['p99_ms']:7.2f}ms  max {result['max_ms']:7.2f}ms"
+                  + (f"  errors {result['errors']}" if result["errors"] else ""), flush=True)
+
+if __name__ == "__main__":
+    main()
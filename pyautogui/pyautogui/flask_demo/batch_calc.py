@@ -0,0 +1,137 @@
+"""
+Vectorized evaluation of many (num1, num2, operation) items at once.
+
+``/calculate`` answers one operation per HTTP request; ``/calculate/batch``
+hands a whole list to ``evaluate_batch``, which converts the operands into
+two float arrays, groups the items by operation and runs one NumPy ufunc
+per group. Operands and operations go through the same checks as
+``/calculate`` (``validation.number`` and ``one_of``); an item it would
+reject gets one error in its slot, e.g. "num1 must be a number",
+"Division by zero is not allowed" or "Result out of range", instead of
+failing the batch.
+
+Clients that can send columns ({"num1": [...], "num2": [...],
+"operation": [...]}) skip building one object per item on both sides,
+which is most of the cost of a large batch: ``evaluate_columns``.
+"""
+from itertools import repeat
+
+import numpy as np
+
+from fastjson import loads
+from validation import number, one_of
+
+OPERATIONS = {
+    "add": np.add,
+    "subtract": np.subtract,
+    "multiply": np.multiply,
+    "divide": np.divide,
+}
+MAX_BATCH = 1_000_000  # items per request
+_INVALID_OPERATION = "operation " + one_of(*OPERATIONS)(None)[1]
+
+
+def parse_ndjson(body: bytes) -> list:
+    """
+    Items of an NDJSON body, one JSON value per non-empty line, so item i is
+    always line i. A line that is not valid JSON (or not UTF-8) becomes an
+    error item for ``evaluate_batch``.
+    """
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(loads(line))
+        except ValueError as e:  # includes UnicodeDecodeError
+            items.append(_Invalid(f"Invalid JSON: {e}"))
+    return items
+
+
+class _Invalid:
+    """Placeholder for an item that could not be parsed."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def _operands(values: list, name: str, errors: dict) -> np.ndarray:
+    """
+    Every value as a float array, recording "<name> <message>" for values
+    ``validation.number`` rejects. NumPy converts the common case, plain
+    JSON numbers, in one call; anything else is checked value by value.
+    """
+    out = None
+    if set(map(type, values)) <= {int, float}:  # no bool, str, None or containers
+        try:
+            out = np.array(values, dtype="float64")
+        except OverflowError:  # an integer beyond the float range
+            pass
+    if out is not None:
+        suspects = np.flatnonzero(~np.isfinite(out))
+    else:
+        out = np.full(len(values), np.nan)
+        suspects = range(len(values))
+    for i in suspects:
+        value, message = number(values[i])
+        if message is None:
+            out[i] = value
+        else:
+            errors.setdefault(int(i), f"{name} {message}")
+    return out
+
+
+def evaluate_columns(num1: list, num2: list, operation: list, errors=None):
+    """
+    Results of the items (num1[i], num2[i], operation[i]), in order.
+
+    Returns (results, errors): ``results`` is a float array with NaN where
+    the item failed and ``errors`` maps the index of each failed item to
+    its error message. ``errors`` may come in pre-filled with items that
+    already failed.
+    """
+    n = len(operation)
+    if not len(num1) == len(num2) == n:
+        raise ValueError("num1, num2 and operation must have the same length")
+    errors = {} if errors is None else errors
+    num1 = _operands(num1, "num1", errors)
+    num2 = _operands(num2, "num2", errors)
+
+    codes = {name: k for k, name in enumerate(OPERATIONS)}
+    try:
+        op = np.fromiter(map(codes.get, operation, repeat(-1)), dtype=np.int64, count=n)
+    except TypeError:
+        # an unhashable operation (list, object) is just an invalid one
+        op = np.array([codes.get(name, -1) if isinstance(name, str) else -1 for name in operation], dtype=np.int64)
+    failed = np.zeros(n, dtype=bool)
+    failed[list(errors)] = True
+    results = np.full(n, np.nan)
+    for k, (name, ufunc) in enumerate(OPERATIONS.items()):
+        mask = (op == k) & ~failed
+        if name == "divide":
+            zero = mask & (num2 == 0)
+            errors.update(dict.fromkeys(np.flatnonzero(zero).tolist(), "Division by zero is not allowed"))
+            mask &= ~zero
+        if mask.any():
+            with np.errstate(over="ignore"):  # reported per item below
+                results[mask] = ufunc(num1[mask], num2[mask])
+    errors.update(dict.fromkeys(np.flatnonzero((op < 0) & ~failed).tolist(), _INVALID_OPERATION))
+    # finite operands can still overflow, e.g. 1e308 * 10
+    overflow = ~np.isfinite(results)
+    overflow[list(errors)] = False
+    errors.update(dict.fromkeys(np.flatnonzero(overflow).tolist(), "Result out of range"))
+    return results, errors
+
+
+def evaluate_batch(items: list):
+    """``evaluate_columns`` for a list of {"num1", "num2", "operation"} objects."""
+    errors = {}
+    objects = []
+    for i, item in enumerate(items):
+        if isinstance(item, dict):
+            objects.append(item)
+        else:
+            errors[i] = item.error if isinstance(item, _Invalid) else "Each operation must be a JSON object"
+            objects.append({})
+    return evaluate_columns([item.get("num1") for item in objects], [item.get("num2") for item in objects],
+                            [item.get("operation") for item in objects], errors)
@@ -0,0 +1,113 @@
+"""
+Per-request overhead of /calculate, before and after schema validation and
+the fast JSON codec.
+
+    python bench_calculate.py
+    python bench_calculate.py --requests 50000 --repeat 5
+
+Calls the Flask app's WSGI callable directly with prebuilt environs, so
+the numbers are the app's own cost per request (routing, parsing,
+validation, encoding) without a server or network in front of it:
+
+    legacy    the original handler: request.get_json(), float() conversions
+              and a blanket ``except Exception`` for malformed input
+    current   the /calculate route: fastjson.loads on the raw body, the
+              compiled CALCULATE_SCHEMA and a pre-encoded response
+
+for unique valid bodies, for 50 bodies repeated as polling dashboards do
+(served from the response cache) and for malformed ones (bad JSON, wrong
+types, missing fields). requests/s is for one core; a server runs one app per
+worker, so multiply by the number of workers.
+"""
+import argparse
+import io
+import random
+import time
+
+from flask import Flask, jsonify, request
+
+from fastjson import dumps
+from flask_structure import app, OPERATIONS
+
+# the calculator as it was before validation.py and fastjson.py: Flask's
+# default JSON provider and the original handler
+legacy = Flask("legacy")
+
+
+@legacy.route('/calculate', methods=['POST'])
+def calculate_legacy():
+    try:
+        data = request.get_json()
+        num1 = float(data.get('num1'))
+        num2 = float(data.get('num2'))
+        operation = data.get('operation')
+        if operation == "add":
+            result = num1 + num2
+        elif operation == "subtract":
+            result = num1 - num2
+        elif operation == "multiply":
+            result = num1 * num2
+        elif operation == "divide":
+            if num2 == 0:
+                return jsonify({"error": "Division by zero is not allowed"}), 400
+            result = num1 / num2
+        else:
+            return jsonify({"error": "Invalid operation"}), 400
+        return jsonify({"num1": num1, "num2": num2, "operation": operation, "result": result})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+def valid_bodies(n: int, seed=0) -> list:
+    rng = random.Random(seed)
+    return [dumps({"num1": round(rng.uniform(-1e3, 1e3), 3), "num2": round(rng.uniform(1, 100), 3),
+                   "operation": rng.choice(list(OPERATIONS))}).encode() for _ in range(n)]
+
+
+def malformed_bodies(n: int) -> list:
+    samples = [b'{"num1": 1, "num2": ', b'{"num1": "abc", "num2": 2, "operation": "add"}',
+               b'{"num1": 1, "operation": "add"}', b'{"num1": 1, "num2": 2, "operation": "mod"}',
+               b'[1, 2, "add"]', b'{"num1": null, "num2": 0, "operation": "divide"}']
+    return [samples[i % len(samples)] for i in range(n)]
+
+
+def environ(path: str, body: bytes) -> dict:
+    return {"REQUEST_METHOD": "POST", "PATH_INFO": path, "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.url_scheme": "http", "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body), "wsgi.errors": io.StringIO()}
+
+
+def run(wsgi, bodies: list) -> float:
+    environs = [environ("/calculate", body) for body in bodies]
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    t0 = time.perf_counter()
+    for env in environs:
+        for _ in wsgi(env, start_response):
+            pass
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    n = args.requests
+    repeated = valid_bodies(50, seed=1) * (n // 50 + 1)
+    for label, bodies in (("valid", valid_bodies(n)), ("repeated", repeated[:n]), ("malformed", malformed_bodies(n))):
+        best = {}
+        for name, wsgi in (("legacy", legacy.wsgi_app), ("current", app.wsgi_app)):
+            run(wsgi, bodies[:500])  # warm up
+            best[name] = min(run(wsgi, bodies) for _ in range(args.repeat))
+            print(f"{label:<10} {name:<8} {n:>8} requests  {best[name] / n * 1e6:7.1f}us/request  "
+                  f"{n / best[name]:>9,.0f} requests/s", flush=True)
+        saved = (best["legacy"] - best["current"]) / n * 1e6
+        print(f"{label:<10} {saved:.1f}us less per request ({best['legacy'] / best['current']:.2f}x)\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Safe arithmetic expressions for the calculator.
+
+``compile_expression("sqrt(x) + percent(price, 18)")`` parses the text with
+``ast``, rejects every node that is not arithmetic (no attributes,
+subscripts, comprehensions, lambdas or keyword arguments; calls only to the
+functions in ``FUNCTIONS``), turns integer literals into floats so ``**``
+cannot build huge integers, and compiles the checked tree to a code object.
+Compiled expressions are kept in an LRU keyed by the expression text, so
+evaluating a known formula with new variable bindings skips parsing and
+checking entirely.
+
+The functions are NumPy ufuncs, so the same compiled expression evaluates a
+whole column of bindings in one call (``evaluate_many``).
+"""
+import ast
+from functools import lru_cache
+
+import numpy as np
+
+from validation import number
+
+MAX_LENGTH = 1000        # characters per expression
+CACHE_SIZE = 1024        # compiled expressions kept
+
+
+def _percent(value, rate):
+    """``rate`` percent of ``value``."""
+    return value * rate / 100.0
+
+
+def _round(value, digits=0.0):
+    # literals are floats, np.round wants an int digit count
+    return np.round(value, int(digits))
+
+
+FUNCTIONS = {
+    "sqrt": np.sqrt,
+    "pow": np.power,
+    "percent": _percent,
+    "abs": np.abs,
+    "min": np.minimum,
+    "max": np.maximum,
+    "round": _round,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+
+_ALLOWED = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+
+
+class ExpressionError(ValueError):
+    """
+    An expression that cannot be parsed, is not allowed, or fails to
+    evaluate; ``details`` lists the rejected variables as {"field", "message"}.
+    """
+
+    def __init__(self, message: str, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+class _FloatLiterals(ast.NodeTransformer):
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+def _check(tree: ast.AST):
+    """Raise ExpressionError for any node outside the arithmetic subset."""
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED):
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool)
+                                               or not isinstance(node.value, (int, float))):
+            raise ExpressionError(f"Unsupported constant: {node.value!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                name = node.func.id if isinstance(node.func, ast.Name) else type(node.func).__name__
+                raise ExpressionError(f"Unknown function: {name}")
+            if node.keywords:
+                raise ExpressionError("Keyword arguments are not supported")
+        if isinstance(node, ast.Name) and node.id.startswith("_"):
+            raise ExpressionError(f"Unsupported name: {node.id}")
+
+
+class CompiledExpression:
+    """A checked, compiled expression and the variable names it reads."""
+
+    def __init__(self, text: str, code, variables):
+        self.text = text
+        self.code = code
+        self.variables = tuple(sorted(variables))
+
+    def _namespace(self, bindings: dict) -> dict:
+        missing = [name for name in self.variables if name not in bindings]
+        if missing:
+            raise ExpressionError(f"Missing variable(s): {', '.join(missing)}")
+        namespace = dict(_GLOBALS)
+        namespace.update((name, bindings[name]) for name in self.variables)
+        return namespace
+
+    def evaluate(self, bindings=None) -> float:
+        """Value of the expression for one set of ``bindings`` {name: number}."""
+        namespace = self._namespace(bindings or {})
+        # the same rules as /calculate operands: numbers or numeric strings, no booleans
+        invalid = []
+        for name in self.variables:
+            value, message = number(namespace[name])
+            if message is None:
+                namespace[name] = value
+            else:
+                invalid.append((name, message))
+        if invalid:
+            raise ExpressionError("Invalid variable value: " + "; ".join(f"{n} {m}" for n, m in invalid),
+                                  [{"field": f"variables.{n}", "message": m} for n, m in invalid])
+        return _run(self.code, namespace)
+
+    def evaluate_many(self, columns: dict) -> np.ndarray:
+        """
+        Values for many bindings at once: ``columns`` maps each variable to
+        a sequence of numbers and the expression runs once over the arrays.
+        Raises ExpressionError if any item fails, or holds anything but
+        plain JSON numbers; use ``evaluate`` per item to find which.
+        """
+        namespace = self._namespace(columns)
+        if not all(set(map(type, namespace[name])) <= {int, float} for name in self.variables):
+            raise ExpressionError("Invalid variable value: not a JSON number")  # no bool, str or None
+        try:
+            arrays = {name: np.array(namespace[name], dtype="float64") for name in self.variables}
+        except (OverflowError, TypeError, ValueError) as e:
+            raise ExpressionError(f"Invalid variable value: {e}") from None
+        lengths = {a.shape for a in arrays.values()}
+        if len(lengths) > 1 or any(len(shape) != 1 for shape in lengths):
+            raise ExpressionError("Variables must be equally long lists of numbers")
+        if not all(np.isfinite(a).all() for a in arrays.values()):
+            raise ExpressionError("Invalid variable value: not a finite number")
+        namespace.update(arrays)
+        return np.asarray(_run(self.code, namespace), dtype="float64")
+
+
+_GLOBALS = {"__builtins__": {}, **FUNCTIONS, **CONSTANTS}
+
+
+def _run(code, namespace: dict):
+    # floating-point problems (sqrt(-1), log(0), overflow) are errors, not NaN/inf:
+    # NumPy raises under errstate, plain float arithmetic is caught by the isfinite check
+    with np.errstate(all="raise"):
+        try:
+            result = eval(code, namespace)  # checked by _check: arithmetic and FUNCTIONS only
+        except OverflowError:
+            raise ExpressionError("Result out of range") from None
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise ExpressionError(str(e) or type(e).__name__) from None
+    if isinstance(result, complex):
+        raise ExpressionError("Result is not a real number")
+    if not np.isfinite(result).all():
+        raise ExpressionError("Result out of range")
+    return float(result) if np.ndim(result) == 0 else result
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """Parse, check and compile ``text``; cached by the exact text."""
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError(f"Expression longer than {MAX_LENGTH} characters")
+    try:
+        return _compile(text)
+    except (RecursionError, MemoryError):
+        # e.g. "-" * 999 + "1": short enough, but too deep for the parser or compiler
+        raise ExpressionError("Expression is nested too deeply") from None
+
+
+def _compile(text: str) -> CompiledExpression:
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, ValueError) as e:
+        raise ExpressionError(f"Invalid expression: {e.msg if isinstance(e, SyntaxError) else e}") from None
+    _check(tree)
+    called = {node.func for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    variables = {node.id for node in ast.walk(tree)
+                 if isinstance(node, ast.Name) and node not in called and node.id not in CONSTANTS}
+    shadowed = variables & set(FUNCTIONS)
+    if shadowed:
+        raise ExpressionError(f"Function used as a variable: {', '.join(sorted(shadowed))}")
+    tree = ast.fix_missing_locations(_FloatLiterals().visit(tree))
+    return CompiledExpression(text, compile(tree, "<expression>", "eval"), variables)
+
+
+def cache_stats() -> dict:
+    info = compile_expression.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
@@ -0,0 +1,55 @@
+"""
+JSON encoding and decoding for the calculator API, through orjson when it
+is installed and the standard library otherwise.
+
+``OrjsonProvider`` plugs the fast codec into Flask, so ``jsonify`` and
+``request.get_json`` use it on every route; ``loads`` / ``dumps`` are the
+same functions for code that reads the raw body itself. orjson writes NaN
+and infinity as null, where the standard library would emit invalid JSON.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+
+def dumps(obj) -> str:
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider using the fast codec; keys are not sorted."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs or orjson is None:
+            # e.g. indent= from a caller, or no orjson: Flask's own encoder
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s) if not kwargs else super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
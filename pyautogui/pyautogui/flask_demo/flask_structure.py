@@ -1,39 +1,166 @@
+import math
+import os
+
+import numpy as np
 from flask import Flask, request, jsonify
 
+from batch_calc import evaluate_batch, evaluate_columns, parse_ndjson, MAX_BATCH
+from expressions import cache_stats, compile_expression, ExpressionError
+from fastjson import dumps_bytes, loads, OrjsonProvider
+from response_cache import etag_for, ResponseCache
+from validation import compile_schema, error_response, number, one_of
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+OPERATIONS = {
+    "add": lambda a, b: a + b,
+    "subtract": lambda a, b: a - b,
+    "multiply": lambda a, b: a * b,
+    "divide": lambda a, b: a / b,
+}
+CALCULATE_SCHEMA = compile_schema({"num1": number, "num2": number, "operation": one_of(*OPERATIONS)})
+# successful /calculate responses by (num1, num2, operation); CALCULATE_CACHE_SIZE=0 turns it off
+CALCULATE_CACHE = ResponseCache(max_size=int(os.environ.get("CALCULATE_CACHE_SIZE", 4096)),
+                                ttl=float(os.environ.get("CALCULATE_CACHE_TTL", 300)))
+
+def cached_json(body: bytes, etag: str):
+    """A JSON response with its ETag, or an empty 304 if the client already has it."""
+    if "HTTP_IF_NONE_MATCH" in request.environ and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
 
 @app.route('/calculate', methods=['POST'])
 def calculate():
+    """
+    {"num1": ..., "num2": ..., "operation": "add" | "subtract" | "multiply"
+    | "divide"}; numbers may also be numeric strings. Errors come back as
+    {"error", "code", "details"} with status 400. Results are cached and
+    carry an ETag; send it back in If-None-Match to get a 304.
+    """
     try:
-        # Get JSON body
-        data = request.get_json()
-        num1 = float(data.get('num1'))
-        num2 = float(data.get('num2'))
-        operation = data.get('operation')  # add, subtract, multiply, divide
-
-        result = None
-
-        if operation == "add":
-            result = num1 + num2
-        elif operation == "subtract":
-            result = num1 - num2
-        elif operation == "multiply":
-            result = num1 * num2
-        elif operation == "divide":
-            if num2 == 0:
-                return jsonify({"error": "Division by zero is not allowed"}), 400
-            result = num1 / num2
+        data = loads(request.get_data(cache=False))
+    except ValueError:
+        return error_response("Request body is not valid JSON", "invalid_json")
+    values, details = CALCULATE_SCHEMA(data)
+    if details:
+        return error_response("Invalid request", "invalid_request", details=details)
+
+    num1, num2, operation = values["num1"], values["num2"], values["operation"]
+    # 0.0 == -0.0 would share a key though the results can differ in sign
+    key = (num1, num2, operation) if num1 and num2 else None
+    cached = CALCULATE_CACHE.get(key) if key else None
+    if cached is not None:
+        return cached_json(*cached)
+    if operation == "divide" and num2 == 0:
+        return error_response("Division by zero is not allowed", "division_by_zero",
+                              details=[{"field": "num2", "message": "must not be zero"}])
+    result = OPERATIONS[operation](num1, num2)
+    if not math.isfinite(result):
+        return error_response("Result out of range", "out_of_range")
+    body = dumps_bytes({"num1": num1, "num2": num2, "operation": operation, "result": result})
+    return cached_json(body, CALCULATE_CACHE.put(key, body) if key else etag_for(body))
+
+@app.route('/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """
+    Many operations in one request: a JSON array of {num1, num2, operation}
+    objects (or {"operations": [...]}), the same as columns ({"num1": [...],
+    "num2": [...], "operation": [...]}), or an NDJSON body with one object
+    per line. Results come back in order; failed items are null in
+    ``results`` and listed in ``errors`` with their index.
+    """
+    columns = None
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = parse_ndjson(request.get_data(cache=False))
+    else:
+        try:
+            data = loads(request.get_data(cache=False))
+        except ValueError:
+            return error_response("Request body is not valid JSON", "invalid_json")
+        if isinstance(data, dict) and "operations" not in data:
+            columns = [data.get(key) for key in ("num1", "num2", "operation")]
+            items = columns[2]
         else:
-            return jsonify({"error": "Invalid operation"}), 400
+            items = data.get("operations") if isinstance(data, dict) else data
+    if not isinstance(items, list) or (columns and not all(isinstance(c, list) for c in columns)):
+        return error_response("Expected a JSON array of operations, num1/num2/operation arrays "
+                              "or an NDJSON body", "invalid_request")
+    if len(items) > MAX_BATCH:
+        return error_response(f"At most {MAX_BATCH} operations per request", "too_large", 413)
+
+    try:
+        results, errors = evaluate_columns(*columns) if columns else evaluate_batch(items)
+    except ValueError as e:
+        return error_response(str(e), "invalid_request")
+    values = results.tolist()
+    for i in errors:
+        values[i] = None
+    failed = [{"index": i, "error": errors[i]} for i in sorted(errors)]
+    return jsonify({"count": len(values), "results": values, "errors": failed})
+
+@app.route('/calculate/expression', methods=['POST'])
+def calculate_expression():
+    """
+    Evaluate an arithmetic expression such as "sqrt(x) + percent(y, 18)":
+    {"expression": ..., "variables": {"x": 16, "y": 200}} for one result, or
+    {"expression": ..., "bindings": [{...}, ...]} for one result per set of
+    variables, in the /calculate/batch response format.
+    """
+    try:
+        data = loads(request.get_data(cache=False))
+    except ValueError:
+        return error_response("Request body is not valid JSON", "invalid_json")
+    if not isinstance(data, dict) or not isinstance(data.get("expression"), str):
+        return error_response("Expected a JSON object with an 'expression' string", "invalid_request",
+                              details=[{"field": "expression", "message": "is required and must be a string"}])
+    try:
+        compiled = compile_expression(data["expression"])
+    except ExpressionError as e:
+        return error_response(str(e), "invalid_expression")
+
+    bindings = data.get("bindings")
+    if bindings is None:
+        variables = data.get("variables") or {}
+        if not isinstance(variables, dict):
+            return error_response("'variables' must be an object", "invalid_request",
+                                  details=[{"field": "variables", "message": "must be an object"}])
+        try:
+            result = compiled.evaluate(variables)
+        except ExpressionError as e:
+            return error_response(str(e), "evaluation_error", details=e.details)
+        return jsonify({"expression": compiled.text, "variables": variables, "result": result})
+
+    if not isinstance(bindings, list):
+        return error_response("'bindings' must be an array of objects", "invalid_request",
+                              details=[{"field": "bindings", "message": "must be an array of objects"}])
+    if len(bindings) > MAX_BATCH:
+        return error_response(f"At most {MAX_BATCH} bindings per request", "too_large", 413)
+    errors = {}
+    try:
+        # one pass over columns of the variables when every item is valid
+        columns = {name: [b[name] for b in bindings] for name in compiled.variables}
+        values = np.broadcast_to(compiled.evaluate_many(columns), (len(bindings),)).tolist()
+    except (KeyError, TypeError, ExpressionError):
+        values = []
+        for i, b in enumerate(bindings):
+            try:
+                values.append(compiled.evaluate(b if isinstance(b, dict) else None))
+            except ExpressionError as e:
+                values.append(None)
+                errors[i] = str(e)
+    failed = [{"index": i, "error": errors[i]} for i in sorted(errors)]
+    return jsonify({"expression": compiled.text, "count": len(values), "results": values, "errors": failed})
 
-        return jsonify({
-            "num1": num1,
-            "num2": num2,
-            "operation": operation,
-            "result": result
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Hit, miss and eviction counters of the /calculate response cache and the expression cache."""
+    return jsonify({"calculate_cache": CALCULATE_CACHE.stats(), "expression_cache": cache_stats()})
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # development server only; FLASK_DEBUG=1 turns on the debugger and reloader.
+    # Serve with `python serve.py` in production.
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1")
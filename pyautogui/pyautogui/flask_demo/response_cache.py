@@ -0,0 +1,72 @@
+"""
+Bounded LRU cache with a time-to-live for encoded JSON responses.
+
+/calculate results depend only on (num1, num2, operation), so the route
+keys this cache on those validated values: "2" and 2.0 or reordered keys
+are the same request. A hit returns the encoded body and its ETag without
+computing or serializing anything, and a client that sends the ETag back
+in If-None-Match gets an empty 304.
+
+The cache is shared by the threads of one worker process; each gunicorn
+worker keeps its own.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """{key: (body, etag)} for at most ``max_size`` keys, each for ``ttl`` seconds."""
+
+    def __init__(self, max_size=4096, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (body, etag, expires)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        """(body, etag) for ``key``, or None when it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, body: bytes):
+        """Store an encoded body under ``key``; returns its ETag."""
+        etag = etag_for(body)
+        if self.max_size <= 0:
+            return etag
+        with self._lock:
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "expirations": self.expirations, "hit_rate": self.hits / lookups if lookups else None,
+                    "size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl}
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag of a response body, unquoted."""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
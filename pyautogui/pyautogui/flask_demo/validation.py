@@ -0,0 +1,85 @@
+"""
+Request validation for the calculator API.
+
+A schema maps each field of a JSON object to a check. ``compile_schema``
+turns it into one validating function at import time, and every check
+tests types and patterns instead of attempting a conversion and catching
+the exception, so a malformed request costs about as much as a valid one.
+
+Every calculator route reports request errors in one structured shape;
+items of a batch that fail are listed in its "errors" array instead:
+
+    {"error": "Invalid request", "code": "invalid_request",
+     "details": [{"field": "num1", "message": "must be a number"}]}
+"""
+import math
+import re
+import sys
+
+from flask import jsonify
+
+_MAX_FLOAT = int(sys.float_info.max)
+# what float() accepts from a JSON string, minus inf/nan spellings
+_NUMBER = re.compile(r"\s*[+-]?(\d+(_\d+)*\.?(\d+(_\d+)*)?|\.\d+(_\d+)*)([eE][+-]?\d+(_\d+)*)?\s*")
+
+
+def number(value):
+    """(float, None) for a JSON number or numeric string, else (None, message)."""
+    kind = type(value)
+    if kind is float or kind is int:  # exact types: no bool
+        # False for NaN, inf and integers beyond the float range
+        if -_MAX_FLOAT <= value <= _MAX_FLOAT:
+            return float(value), None
+        return None, "must be a finite number"
+    if kind is str and _NUMBER.fullmatch(value):
+        parsed = float(value)
+        if math.isfinite(parsed):  # "1e400" overflows to inf
+            return parsed, None
+        return None, "must be a finite number"
+    return None, "must be a number"
+
+
+def one_of(*choices):
+    """Check that accepts exactly one of the given strings."""
+    allowed = frozenset(choices)
+    message = f"must be one of {', '.join(choices)}"
+
+    def check(value):
+        if type(value) is str and value in allowed:
+            return value, None
+        return None, message
+    return check
+
+
+def compile_schema(fields: dict):
+    """
+    Validator for a JSON object with the given {field: check} schema.
+    Returns validate(data) -> (values, details): the converted field values,
+    or None and one {"field", "message"} entry per invalid field.
+    """
+    checks = tuple(fields.items())
+
+    def validate(data):
+        if type(data) is not dict:
+            return None, [{"field": None, "message": "body must be a JSON object"}]
+        values = {}
+        details = []
+        for name, check in checks:
+            if name not in data:
+                details.append({"field": name, "message": "is required"})
+                continue
+            value, message = check(data[name])
+            if message is None:
+                values[name] = value
+            else:
+                details.append({"field": name, "message": message})
+        return (None, details) if details else (values, None)
+    return validate
+
+
+def error_response(message: str, code: str, status=400, details=None):
+    """A structured error: {"error", "code"} plus ``details`` when given."""
+    body = {"error": message, "code": code}
+    if details:
+        body["details"] = details
+    return jsonify(body), status
@@ -1,120 +1,171 @@
+import os
+import time
+import uuid
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error
-import matplotlib.pyplot as plt
+from price_cache import PriceCache, YFinanceSource, DEFAULT_CACHE_DIR
+from price_store import PriceStore, DEFAULT_STORE_DIR
+from batch_fetch import fetch_many
+from indicator_engine import IndicatorEngine, INDICATORS
+from forecast import lag_sweep, direct_forecast
+from backtest import run_backtest
+from portfolio import compute_portfolio_metrics
+from optimizer import optimize_sma, RANK_METRICS
+from montecarlo import simulate_portfolio, risk_summary, METHODS as MC_METHODS
+from frontier import optimize_portfolio
+from rebalance import schedule, simulate_rebalancing, FREQUENCIES
+from rolling_risk import rolling_risk, rolling_correlation, rolling_average_correlation, WINDOWS
+from intraday import IntradayEngine, YFinanceMinuteSource, stream_intraday, RESAMPLE_FREQS
+from pipeline import normalize_nse_ticker, add_extended_indicators, generate_trade_points, read_universe
+from screener import ScreenerIndex, QueryError, SCREENS, DEFAULT_INDEX_DIR
+from stage_cache import StageCache
+import charts
 
 # ---------------------------
 # Helper functions
 # ---------------------------
 
-def normalize_nse_ticker(ticker: str):
-    ticker = ticker.strip().upper()
-    if not ticker:
-        return ""
-    if "." not in ticker:
-        ticker = ticker + ".NS"
-    return ticker
+@st.cache_resource(show_spinner=False)
+def get_price_cache():
+    # one on-disk cache per process, shared by all sessions
+    cache_dir = os.environ.get("STOCK_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return PriceCache(cache_dir, source=YFinanceSource())
+
+@st.cache_resource(show_spinner=False)
+def get_price_store():
+    # memory-mapped prices shared by all sessions; frames handed out are read-only views
+    store_dir = os.environ.get("STOCK_STORE_DIR", DEFAULT_STORE_DIR)
+    return PriceStore(get_price_cache(), store_dir)
+
+@st.cache_resource(show_spinner=False)
+def get_screener(sma_short: int, sma_long: int):
+    # one persistent index per SMA setting, shared by all sessions
+    index_dir = os.environ.get("STOCK_SCREENER_DIR", DEFAULT_INDEX_DIR)
+    return ScreenerIndex(os.path.join(index_dir, f"sma_{sma_short}_{sma_long}"), sma_short=sma_short, sma_long=sma_long)
+
+def session_id():
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
+def get_stage_cache():
+    # one per browser session, so reruns of this session reuse their stages
+    if "stage_cache" not in st.session_state:
+        st.session_state["stage_cache"] = StageCache()
+    return st.session_state["stage_cache"]
 
-@st.cache_data(show_spinner=False)
 def fetch_data(ticker: str, start_date: str, end_date: str):
     try:
-        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
-        if data.empty:
-            return None
-        data.index = pd.to_datetime(data.index)
-        return data
+        return get_price_store().get(ticker, start_date, end_date)
     except Exception:
         return None
 
-def add_technical_indicators(df: pd.DataFrame, sma_short=20, sma_long=50):
-    df = df.copy()
-    df[f"SMA_{sma_short}"] = df["Close"].rolling(window=sma_short, min_periods=1).mean()
-    df[f"SMA_{sma_long}"] = df["Close"].rolling(window=sma_long, min_periods=1).mean()
-    df["Signal"] = 0
-    df.loc[df[f"SMA_{sma_short}"] > df[f"SMA_{sma_long}"], "Signal"] = 1
-    df.loc[df[f"SMA_{sma_short}"] < df[f"SMA_{sma_long}"], "Signal"] = -1
-    df["Crossover"] = df["Signal"].diff().fillna(0)
-    return df
-
-def generate_trade_points(df: pd.DataFrame):
-    buys = df[df["Crossover"] == 2]
-    sells = df[df["Crossover"] == -2]
-    return buys, sells
-
-def create_lag_features(df: pd.DataFrame, lags=5):
-    df = df.copy()
-    for lag in range(1, lags+1):
-        df[f"lag_{lag}"] = df["Close"].shift(lag)
-    df = df.dropna()
-    return df
-
-def train_predict_lr(df: pd.DataFrame, lags=5, predict_days=5):
-    """
-    Simple Linear Regression on lag features to predict next day's Close.
-    Then recursively predict predict_days ahead.
-    """
-    df_feat = create_lag_features(df, lags=lags)
-    X = df_feat[[f"lag_{i}" for i in range(1, lags+1)]].values
-    y = df_feat["Close"].values
-    if len(X) < 20:
-        return None, None, None
-    model = LinearRegression()
-    model.fit(X, y)
-    last_row = df_feat.iloc[-1]
-    preds = []
-    # ensure 1-D array of lags
-    current_input = np.array([last_row[f"lag_{i}"] for i in range(1, lags+1)]).ravel()
-    for i in range(predict_days):
-        p = float(model.predict(current_input.reshape(1, -1))[0])
-        preds.append(p)
-        # slide lags - ensure flatten
-        new_lags = np.concatenate((np.array([p]), current_input[:-1].ravel()))
-        current_input = new_lags
-    y_pred_in_sample = model.predict(X)
-    rmse = float(np.sqrt(mean_squared_error(y, y_pred_in_sample)))
-    return preds, model, rmse
-
-def compute_portfolio_metrics(price_df: pd.DataFrame, weights: np.ndarray, trading_days=252):
-    daily_returns = price_df.pct_change().dropna()
-    port_returns = daily_returns.dot(weights)
-    cum_returns = (1 + port_returns).cumprod()
-    total_return = cum_returns.iloc[-1] - 1
-    days = (price_df.index[-1] - price_df.index[0]).days
-    years = days / 365.25 if days > 0 else 1/365.25
-    cagr = (1 + total_return) ** (1/years) - 1 if years > 0 else 0.0
-    ann_vol = port_returns.std() * np.sqrt(trading_days)
-    ann_return = port_returns.mean() * trading_days
-    sharpe = (ann_return / ann_vol) if ann_vol != 0 else np.nan
-    rolling_max = cum_returns.cummax()
-    drawdown = cum_returns / rolling_max - 1
-    max_dd = drawdown.min()
-    metrics = {
-        "Total Return": float(total_return),
-        "CAGR": float(cagr),
-        "Annual Return": float(ann_return),
-        "Annual Volatility": float(ann_vol),
-        "Sharpe Ratio": float(sharpe) if not np.isnan(sharpe) else None,
-        "Max Drawdown": float(max_dd)
-    }
-    return metrics, port_returns, cum_returns
-
-def plot_price_with_signals(df: pd.DataFrame, buys: pd.DataFrame, sells: pd.DataFrame, sma_short, sma_long):
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(df.index, df["Close"], label="Close")
-    ax.plot(df.index, df[f"SMA_{sma_short}"], label=f"SMA_{sma_short}")
-    ax.plot(df.index, df[f"SMA_{sma_long}"], label=f"SMA_{sma_long}")
-    if not buys.empty:
-        ax.scatter(buys.index, buys["Close"], marker="^", color="green", s=80, label="Buy")
-    if not sells.empty:
-        ax.scatter(sells.index, sells["Close"], marker="v", color="red", s=80, label="Sell")
-    ax.set_title("Price with SMA and Buy/Sell signals")
-    ax.legend()
-    ax.grid(True)
-    return fig
+def fetch_universe(tickers, fetch_start: str, fetch_end: str):
+    price_store = get_price_store()
+    return fetch_many(
+        tickers, lambda t: price_store.get(t, fetch_start, fetch_end),
+        max_workers=8, timeout=30.0, retries=2,
+    )
+
+def analyze_indicators(data_map: dict, primary_ticker: str, sma_short=20, sma_long=50):
+    # one vectorized pass for all tickers; SMAs are memoized per (ticker, window)
+    engine = IndicatorEngine.from_data_map(data_map)
+    df_primary = engine.frame(data_map[primary_ticker], primary_ticker, sma_short=sma_short, sma_long=sma_long)
+    buys, sells = generate_trade_points(df_primary)
+    return engine, df_primary, buys, sells
+
+def portfolio_close(data_map: dict):
+    # --------- FIXED: build list of 1-D Series with explicit names ----------
+    series_list = []
+    for t in data_map.keys():
+        s = data_map[t]["Close"]
+        # if for some reason Close is a DataFrame (rare), take its first column
+        if isinstance(s, pd.DataFrame):
+            # try to extract first column as series
+            s = s.iloc[:, 0]
+        # ensure it's a Series
+        s = s.copy()
+        s.name = t  # set series name to ticker
+        series_list.append(s)
+    # concat along columns, inner-join by default (align on index)
+    if not series_list:
+        return None
+    return pd.concat(series_list, axis=1, join='inner').dropna(how='all')
+    # --------------------------------------------------------------------
+
+def optimize_weights(all_close: pd.DataFrame, max_weight: float):
+    try:
+        return optimize_portfolio(all_close, upper=max_weight), None
+    except ValueError as e:
+        return None, str(e)
+
+def run_monte_carlo(all_close: pd.DataFrame, weights, n_paths, horizon, method, seed):
+    try:
+        sim = simulate_portfolio(all_close, weights, n_paths=n_paths, horizon=horizon,
+                                 method=method, block=5 if method == "bootstrap" else 1, seed=seed)
+    except ValueError as e:
+        return None, None, str(e)
+    return sim, risk_summary(sim), None
+
+REBALANCE_POLICIES = ["Buy and hold", "Monthly", "Quarterly", "Drift band", "SMA signal"]
+
+def run_rebalancing(all_close: pd.DataFrame, weights, signal: pd.DataFrame, investment_amt, policies,
+                    band, fee_rate, cash_rate):
+    specs = []
+    for policy in policies:
+        if policy == "Buy and hold":
+            specs.append(schedule(policy, weights))
+        elif policy in FREQUENCIES:
+            specs.append(schedule(policy, weights, freq=FREQUENCIES[policy]))
+        elif policy == "Drift band":
+            specs.append(schedule(f"Drift band ±{band:.0%}", weights, band=band))
+        elif policy == "SMA signal":
+            specs.append(schedule(policy, weights, signal=signal))
+    try:
+        return simulate_rebalancing(all_close, specs, initial=investment_amt, fee_rate=fee_rate, cash_rate=cash_rate), None
+    except ValueError as e:
+        return None, str(e)
+
+def benchmark_returns(symbol: str, fetch_start: str, fetch_end: str):
+    df = fetch_data(symbol, fetch_start, fetch_end) if symbol else None
+    return None if df is None else df["Close"].pct_change().dropna().rename(symbol)
+
+def correlation_summary(all_close: pd.DataFrame, window: int):
+    # keep only what is shown: the latest matrix and the mean pairwise correlation
+    returns = all_close.pct_change().dropna()
+    latest = pd.DataFrame(rolling_correlation(returns, window, rows=[-1])[0],
+                          index=returns.columns, columns=returns.columns)
+    average = pd.DataFrame({"Average correlation": rolling_average_correlation(returns, window)},
+                           index=returns.index)
+    return latest, average
+
+def analyze_intraday(tickers, primary_ticker: str, days: int, sma_short=20, sma_long=50):
+    # streams one trading day at a time; only the primary ticker's bars (every
+    # resolution) and the running metrics of all tickers are kept
+    engine = IntradayEngine(tickers, sma_short=sma_short, sma_long=sma_long)
+    end = datetime.today().date() + timedelta(days=1)
+    kept = {}
+    for chunk in stream_intraday(engine, end - timedelta(days=days), end, YFinanceMinuteSource()):
+        for resolution, frame in [("1min", chunk["bars"])] + list(chunk["resampled"].items()):
+            if primary_ticker in frame.index.get_level_values("ticker"):
+                kept.setdefault(resolution, []).append(frame.loc[primary_ticker])
+    return {resolution: pd.concat(frames) for resolution, frames in kept.items()}, engine.metrics()
+
+def frontier_points(mv_result: dict, all_close: pd.DataFrame, weights):
+    rows = []
+    for label, w in [("Min variance", mv_result["min_variance"].values),
+                     ("Max Sharpe", mv_result["max_sharpe"].values),
+                     ("Current", weights)]:
+        point_metrics, _, _ = compute_portfolio_metrics(all_close, w)
+        rows.append({"portfolio": label, "Annual Volatility": point_metrics["Annual Volatility"],
+                     "Annual Return": point_metrics["Annual Return"]})
+    return pd.DataFrame(rows)
+
+def show_chart(stages: StageCache, stage: str, key, build, *args):
+    # downsampled Altair charts render in the browser; the chart objects are cached per key
+    st.altair_chart(stages.run(stage, key, build, *args), width="stretch")
 
 # ---------------------------
 # Streamlit UI
@@ -131,42 +182,93 @@ sma_short = st.sidebar.number_input("SMA short window (days)", min_value=5, max_
 sma_long = st.sidebar.number_input("SMA long window (days)", min_value=10, max_value=400, value=50)
 predict_days = st.sidebar.number_input("Forecast horizon (days)", min_value=1, max_value=30, value=5)
 lags = st.sidebar.number_input("Lag features for LR model", min_value=1, max_value=20, value=5)
+extra_indicators = st.sidebar.multiselect("Extra indicators", options=list(INDICATORS), default=["RSI", "MACD"])
 investment_amt = st.sidebar.number_input("Investment amount (INR)", min_value=1000.0, value=100000.0, step=1000.0)
+optimizer_mode = st.sidebar.checkbox("Optimizer mode: sweep SMA windows", value=False)
+optimizer_metric = st.sidebar.selectbox("Rank window pairs by", options=list(RANK_METRICS), disabled=not optimizer_mode)
+intraday_mode = st.sidebar.checkbox("Intraday mode (minute bars)", value=False)
+screener_mode = st.sidebar.checkbox("Screener mode (ticker universe)", value=False)
+benchmark_symbol = st.sidebar.text_input("Benchmark index (for beta)", value="^NSEI").strip()
+show_cache_debug = st.sidebar.checkbox("Show stage cache debug panel", value=False)
 run_button = st.sidebar.button("Run Analysis")
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Disclaimer:** Educational only. Not financial advice.")
 
+if screener_mode:
+    st.header("Screener")
+    screener = get_screener(int(sma_short), int(sma_long))
+    scr_cols = st.columns([3, 1])
+    universe_path = scr_cols[0].text_input("Universe file (.txt or .csv of NSE tickers)",
+                                           value=os.environ.get("STOCK_UNIVERSE", ""))
+    if scr_cols[1].button("Update index", disabled=not universe_path):
+        with st.spinner("Updating screener index..."):
+            try:
+                universe = read_universe(universe_path)
+                recomputed, scr_failures = screener.refresh(universe, get_price_cache())
+                st.success(f"{len(recomputed)} of {len(universe)} tickers had new bars and were recomputed.")
+                if scr_failures:
+                    with st.expander(f"{len(scr_failures)} tickers failed to fetch"):
+                        st.write(scr_failures)
+            except OSError as e:
+                st.error(f"Could not read the universe file: {e}")
+    if screener.table.empty:
+        st.info("The screener index is empty: update it from a universe file.")
+    else:
+        scr_cols = st.columns(2)
+        preset = scr_cols[0].selectbox("Screen", options=list(SCREENS))
+        custom_query = scr_cols[1].text_input("Custom query (overrides the screen), e.g. rsi < 30 and volume_ratio > 2")
+        try:
+            t0 = time.perf_counter()
+            screened = screener.query(custom_query) if custom_query.strip() else screener.screen(preset)
+            elapsed = time.perf_counter() - t0
+            st.dataframe(screened)
+            st.caption(f"{len(screened)} of {len(screener.table)} tickers matched in {elapsed * 1000:.1f} ms; "
+                       f"index updated {screener.updated}.")
+        except QueryError as e:
+            st.error(f"Invalid query: {e}")
+
 if run_button:
+    # tickers and dates apply on "Run Analysis"; the other inputs update the
+    # analysis on every rerun, recomputing only the stages they feed
+    st.session_state["fetch_inputs"] = (tickers_input, start_date, end_date)
+    st.session_state["fetch_generation"] = st.session_state.get("fetch_generation", 0) + 1
+
+if "fetch_inputs" in st.session_state:
+    stages = get_stage_cache()
+    stages.new_run()
+    run_tickers_input, run_start_date, run_end_date = st.session_state["fetch_inputs"]
     with st.spinner("Fetching data..."):
-        tickers = [normalize_nse_ticker(t) for t in tickers_input.split(",") if t.strip()]
-        data_map = {}
-        failed = []
-        for t in tickers:
-            df = fetch_data(t, start_date.strftime("%Y-%m-%d"), (end_date + timedelta(days=1)).strftime("%Y-%m-%d"))
-            if df is None or df.empty:
-                failed.append(t)
-            else:
-                data_map[t] = df
+        tickers = list(dict.fromkeys(normalize_nse_ticker(t) for t in run_tickers_input.split(",") if t.strip()))
+        fetch_start = run_start_date.strftime("%Y-%m-%d")
+        fetch_end = (run_end_date + timedelta(days=1)).strftime("%Y-%m-%d")
+        # every click refetches; downstream keys extend this one
+        fetch_key = (st.session_state["fetch_generation"], tuple(tickers), fetch_start, fetch_end)
+        # renewed on every rerun so the shared store keeps this session's tickers mapped
+        get_price_store().lease(session_id(), tickers + [benchmark_symbol])
+        data_map, fetch_failures = stages.run("fetch", fetch_key, fetch_universe, tickers, fetch_start, fetch_end)
+        failed = list(fetch_failures)
     if failed:
         st.error(f"Failed to fetch data for: {', '.join(failed)}.")
+        with st.expander("Fetch errors"):
+            st.write(fetch_failures)
     if not data_map:
         st.stop()
 
     st.success("Data fetched successfully.")
-    primary_ticker = tickers[0]
+    primary_ticker = next(t for t in tickers if t in data_map)
     st.header(f"Single Stock Analysis — {primary_ticker}")
 
-    df_primary = data_map[primary_ticker].copy()
-    df_primary = add_technical_indicators(df_primary, sma_short=sma_short, sma_long=sma_long)
-    buys, sells = generate_trade_points(df_primary)
+    indicator_key = fetch_key + (sma_short, sma_long)
+    engine, df_primary, buys, sells = stages.run(
+        "indicators", indicator_key, analyze_indicators, data_map, primary_ticker, sma_short, sma_long
+    )
 
     latest_signal = df_primary["Signal"].iloc[-1]
     signal_text = "BUY" if latest_signal == 1 else ("SELL" if latest_signal == -1 else "HOLD/NEUTRAL")
     st.metric(label="Latest SMA Signal", value=signal_text)
 
-    fig = plot_price_with_signals(df_primary, buys, sells, sma_short, sma_long)
-    st.pyplot(fig)
+    show_chart(stages, "chart: price", indicator_key, charts.price_chart, df_primary, buys, sells, sma_short, sma_long)
 
     st.subheader("Recent Buy/Sell points (last 30 rows)")
     recent_bs = pd.concat([
@@ -175,22 +277,37 @@ if run_button:
     ], axis=1).dropna(how='all').tail(30)
     st.dataframe(recent_bs)
 
-    st.subheader("Short-term Price Prediction (Simple Linear Regression on lags)")
-    preds, model, rmse = train_predict_lr(df_primary, lags=lags, predict_days=predict_days)
-    if preds is None:
+    with st.expander("Backtest of this SMA pair (long-only, 10 bps fees + 5 bps slippage)"):
+        bt_daily, bt_trades, bt_metrics = stages.run("backtest", indicator_key, run_backtest, df_primary, sma_short, sma_long)
+        st.table(pd.DataFrame.from_dict(bt_metrics, orient="index", columns=["Value"]))
+        st.line_chart(bt_daily["Equity"])
+        st.dataframe(bt_trades.tail(30))
+
+    if extra_indicators:
+        st.subheader("Extended indicators (last 30 rows)")
+        df_extended = stages.run("extended indicators", indicator_key + tuple(extra_indicators),
+                                 add_extended_indicators, df_primary, indicators=extra_indicators)
+        st.dataframe(df_extended.drop(columns=df_primary.columns).tail(30))
+
+    st.subheader("Short-term Price Prediction (Linear Regression on lags)")
+    # one direct model per horizon for every ticker; the regression only reads
+    # Close, so the SMA windows are not part of its key
+    model_key = fetch_key + (lags, predict_days)
+    forecast = stages.run("model fit", model_key, direct_forecast, engine.close, lags=lags, predict_days=predict_days)
+    primary_forecast = forecast.loc[primary_ticker]
+    preds = primary_forecast["pred"].to_numpy()
+    if np.isnan(preds).all():
         st.info("Not enough data for prediction with chosen lag size.")
     else:
-        last_date = df_primary.index[-1]
-        pred_index = [last_date + timedelta(days=i+1) for i in range(len(preds))]
-        pred_series = pd.Series(data=preds, index=pred_index)
-        fig2, ax2 = plt.subplots(figsize=(10, 4))
-        ax2.plot(df_primary.index[-60:], df_primary["Close"].iloc[-60:], label="Recent Close")
-        ax2.plot(pred_series.index, pred_series.values, marker='o', linestyle='--', label="Predicted Close")
-        ax2.set_title("Recent Close and Predicted Prices")
-        ax2.legend()
-        ax2.grid(True)
-        st.pyplot(fig2)
-        st.write(f"Model in-sample RMSE: {rmse:.4f}")
+        show_chart(stages, "chart: prediction", model_key + (primary_ticker,), charts.prediction_chart, df_primary, preds)
+        st.write(f"Model in-sample RMSE (1 day ahead): {primary_forecast['rmse'].iloc[0]:.4f}")
+        with st.expander("Walk-forward validation RMSE by horizon"):
+            st.caption(f"Direct models vs. the 1-day model applied recursively, over the last "
+                       f"{int(primary_forecast['wf_folds'].iloc[0])} forecast origins.")
+            st.dataframe(forecast[["wf_rmse", "wf_rmse_recursive"]].unstack("horizon"))
+        with st.expander("Lag sweep: in-sample RMSE for all tickers and lags 1-20"):
+            sweep = stages.run("lag sweep", fetch_key + (predict_days,), lag_sweep, engine.close, range(1, 21), predict_days=predict_days)
+            st.dataframe(sweep["rmse"].unstack("lags"))
 
         last_pred = float(preds[-1])
         last_actual = float(df_primary["Close"].iloc[-1])
@@ -201,25 +318,10 @@ if run_button:
 
     st.header("Portfolio Analysis")
 
-    # --------- FIXED: build list of 1-D Series with explicit names ----------
-    series_list = []
-    for t in data_map.keys():
-        s = data_map[t]["Close"]
-        # if for some reason Close is a DataFrame (rare), take its first column
-        if isinstance(s, pd.DataFrame):
-            # try to extract first column as series
-            s = s.iloc[:, 0]
-        # ensure it's a Series
-        s = s.copy()
-        s.name = t  # set series name to ticker
-        series_list.append(s)
-    # concat along columns, inner-join by default (align on index)
-    if series_list:
-        all_close = pd.concat(series_list, axis=1, join='inner').dropna(how='all')
-    else:
+    all_close = stages.run("portfolio prices", fetch_key, portfolio_close, data_map)
+    if all_close is None:
         st.error("No price series available for portfolio.")
         st.stop()
-    # --------------------------------------------------------------------
 
     # Input weights: user-provided or equal weights
     weight_input = st.text_input("Portfolio weights (comma separated in same order as tickers) or leave blank for equal weights:", value="")
@@ -233,7 +335,21 @@ if run_button:
     else:
         weights = np.array([1/len(all_close.columns)]*len(all_close.columns))
 
-    metrics, port_returns, cum_returns = compute_portfolio_metrics(all_close, weights)
+    # mean-variance optimizer: one covariance estimate, one batched frontier solve
+    weight_cols = st.columns(2)
+    weight_mode = weight_cols[0].selectbox("Weighting", options=["Manual / equal", "Minimum variance", "Maximum Sharpe"])
+    max_weight = weight_cols[1].number_input("Max weight per ticker", min_value=0.05, max_value=1.0, value=1.0, step=0.05)
+    frontier_key = fetch_key + (max_weight,)
+    mv_result, mv_error = stages.run("efficient frontier", frontier_key, optimize_weights, all_close, max_weight)
+    if mv_error:
+        st.error(f"Weight optimizer unavailable: {mv_error}")
+    if mv_result is not None and weight_mode == "Minimum variance":
+        weights = mv_result["min_variance"].values
+    elif mv_result is not None and weight_mode == "Maximum Sharpe":
+        weights = mv_result["max_sharpe"].values
+    weights_key = fetch_key + (tuple(np.round(weights, 12)),)
+
+    metrics, port_returns, cum_returns = stages.run("portfolio metrics", weights_key, compute_portfolio_metrics, all_close, weights)
     st.subheader("Portfolio Metrics")
     metrics_display = {
         "Total Return (%)": round(metrics["Total Return"]*100, 2),
@@ -245,14 +361,42 @@ if run_button:
     }
     st.table(pd.DataFrame.from_dict(metrics_display, orient='index', columns=["Value"]))
 
-    fig3, ax3 = plt.subplots(figsize=(10, 5))
-    for col in all_close.columns:
-        (all_close[col].pct_change().dropna().add(1).cumprod()-1).plot(ax=ax3, label=col)
-    cum_returns.plot(ax=ax3, label="Portfolio", linewidth=2, linestyle='--', color='black')
-    ax3.set_title("Cumulative Returns")
-    ax3.legend()
-    ax3.grid(True)
-    st.pyplot(fig3)
+    if mv_result is not None:
+        with st.expander("Efficient frontier"):
+            points = frontier_points(mv_result, all_close, weights)
+            show_chart(stages, "chart: frontier", frontier_key + weights_key, charts.frontier_chart, mv_result["frontier"], points)
+            st.dataframe(pd.DataFrame({"Min variance": mv_result["min_variance"], "Max Sharpe": mv_result["max_sharpe"]}).round(4))
+
+    if optimizer_mode:
+        st.subheader(f"SMA window optimizer (top 10 by {optimizer_metric})")
+        with st.spinner("Sweeping SMA window pairs..."):
+            ranked = stages.run("sma optimizer", weights_key + (optimizer_metric,), optimize_sma, all_close,
+                                range(5, 55, 5), range(20, 210, 10), weights=weights, metric=optimizer_metric)
+        st.dataframe(ranked.head(10))
+
+    show_chart(stages, "chart: cumulative returns", weights_key, charts.cumulative_returns_chart, all_close, cum_returns)
+
+    with st.expander("Rolling risk"):
+        bench = stages.run("benchmark returns", fetch_key + (benchmark_symbol,), benchmark_returns,
+                           benchmark_symbol, fetch_start, fetch_end)
+        if bench is None and benchmark_symbol:
+            st.warning(f"No data for benchmark {benchmark_symbol}; beta is not shown.")
+        rolling = stages.run("rolling risk", weights_key + (benchmark_symbol,), rolling_risk, port_returns, bench)
+        metric_names = ["Sharpe Ratio", "Volatility"] + (["Beta"] if bench is not None else [])
+        rolling_metric = st.selectbox("Rolling metric", options=metric_names)
+        show_chart(stages, "chart: rolling risk", weights_key + (benchmark_symbol, rolling_metric), charts.rolling_chart,
+                   rolling[[f"{rolling_metric} {w}d" for w in WINDOWS]], f"Rolling {rolling_metric}", rolling_metric)
+        if len(all_close.columns) > 1:
+            corr_window = st.selectbox("Correlation window (days)", options=list(WINDOWS), index=1)
+            latest_corr, avg_corr = stages.run("rolling correlation", fetch_key + (corr_window,),
+                                               correlation_summary, all_close, corr_window)
+            corr_cols = st.columns(2)
+            with corr_cols[0]:
+                show_chart(stages, "chart: correlation matrix", fetch_key + (corr_window,), charts.correlation_heatmap,
+                           latest_corr, f"Correlation, last {corr_window} days")
+            with corr_cols[1]:
+                show_chart(stages, "chart: average correlation", fetch_key + (corr_window,), charts.rolling_chart,
+                           avg_corr, f"Average pairwise correlation ({corr_window}d)", "Correlation")
 
     st.subheader("Allocation")
     alloc_df = pd.DataFrame({
@@ -261,20 +405,47 @@ if run_button:
     })
     st.write(alloc_df.set_index("Ticker"))
 
-    latest_prices = all_close.iloc[-1]
-    num_shares = (weights * investment_amt) / latest_prices.values
-    port_value_df = (num_shares * all_close).sum(axis=1)
-    fig4, ax4 = plt.subplots(figsize=(10,4))
-    ax4.plot(port_value_df.index, port_value_df.values)
-    ax4.set_title(f"Simulated Portfolio Value (initial {investment_amt:.0f} INR)")
-    ax4.grid(True)
-    st.pyplot(fig4)
-
-    agg_signals = []
-    for t in all_close.columns:
-        df_tmp = add_technical_indicators(data_map[t], sma_short=sma_short, sma_long=sma_long)
-        agg_signals.append(df_tmp["Signal"].iloc[-1])
-    agg_sum = sum(agg_signals)
+    st.subheader("Rebalancing")
+    rb_cols = st.columns(4)
+    rb_policies = rb_cols[0].multiselect("Schedules", options=REBALANCE_POLICIES, default=["Buy and hold", "Monthly", "Drift band"])
+    rb_band = rb_cols[1].number_input("Drift band (%)", min_value=0.5, max_value=50.0, value=5.0, step=0.5) / 100
+    rb_fee = rb_cols[2].number_input("Fee per trade (bps)", min_value=0.0, max_value=500.0, value=10.0, step=1.0) / 10_000
+    rb_cash_rate = rb_cols[3].number_input("Cash yield (% p.a.)", min_value=0.0, max_value=20.0, value=0.0, step=0.25) / 100
+    if rb_policies:
+        rb_key = weights_key + (investment_amt, tuple(rb_policies), rb_band, rb_fee, rb_cash_rate, sma_short, sma_long)
+        # SMA signal schedule: hold a ticker's weight while its short SMA is above the long one
+        signal, _ = engine.signals(sma_short, sma_long, tickers=all_close.columns)
+        rebalanced, rb_error = stages.run("rebalancing", rb_key, run_rebalancing, all_close, weights, signal,
+                                          investment_amt, rb_policies, rb_band, rb_fee, rb_cash_rate)
+        if rb_error:
+            st.error(f"Rebalancing simulation failed: {rb_error}")
+        else:
+            show_chart(stages, "chart: portfolio value", rb_key, charts.portfolio_value_chart, rebalanced["value"], investment_amt)
+            summary = rebalanced["summary"]
+            pct = ["Total Return", "CAGR", "Annual Volatility", "Max Drawdown", "Avg Turnover"]
+            st.dataframe(pd.concat([(summary[pct] * 100).round(2).add_suffix(" (%)"),
+                                    summary[["Sharpe Ratio"]].round(3),
+                                    summary[["Rebalances", "Fees Paid", "Final Value"]].round(0)], axis=1))
+
+    with st.expander("Monte Carlo simulation"):
+        mc_cols = st.columns(4)
+        mc_paths = mc_cols[0].number_input("Paths", min_value=1000, max_value=1_000_000, value=100_000, step=10_000)
+        mc_horizon = mc_cols[1].number_input("Horizon (trading days)", min_value=5, max_value=2520, value=252, step=21)
+        mc_method = mc_cols[2].selectbox("Return model", options=list(MC_METHODS))
+        mc_seed = mc_cols[3].number_input("Seed", min_value=0, value=42, step=1)
+        mc_key = weights_key + (int(mc_paths), int(mc_horizon), mc_method, int(mc_seed))
+        sim, mc_summary, mc_error = stages.run("monte carlo", mc_key, run_monte_carlo, all_close, weights,
+                                               int(mc_paths), int(mc_horizon), mc_method, int(mc_seed))
+        if mc_error:
+            st.error(f"Simulation failed: {mc_error}")
+        else:
+            st.table((mc_summary * 100).round(2).rename(columns={"Value": "Value (%)"}))
+            show_chart(stages, "chart: monte carlo", mc_key, charts.histogram_chart, sim["terminal_returns"] * 100,
+                       f"Simulated {sim['horizon']}-day portfolio returns (%)", 100,
+                       -mc_summary.loc["VaR 95%", "Value"] * 100, "VaR 95%")
+
+    agg_signals = engine.latest_signals(sma_short, sma_long, tickers=all_close.columns)
+    agg_sum = int(agg_signals.sum())
     if agg_sum > 0:
         st.success("Portfolio-level signal: MORE BUY signals (educational).")
     elif agg_sum < 0:
@@ -282,5 +453,39 @@ if run_button:
     else:
         st.info("Portfolio-level signal: Neutral/Mixed signals.")
 
+    if intraday_mode:
+        st.header("Intraday")
+        intra_cols = st.columns(2)
+        intra_days = intra_cols[0].number_input("Calendar days back (Yahoo keeps ~30 days of 1m bars)",
+                                                min_value=1, max_value=30, value=5)
+        intra_resolution = intra_cols[1].selectbox("Bar size", options=["1min"] + list(RESAMPLE_FREQS))
+        intra_key = (st.session_state["fetch_generation"], tuple(tickers), primary_ticker, int(intra_days),
+                     sma_short, sma_long)
+        with st.spinner("Streaming minute bars..."):
+            intra_bars, intra_metrics = stages.run("intraday", intra_key, analyze_intraday, tickers, primary_ticker,
+                                                   int(intra_days), sma_short, sma_long)
+        if intra_resolution not in intra_bars:
+            st.info("No intraday bars available for this range.")
+        else:
+            bars = intra_bars[intra_resolution]
+            if intra_resolution == "1min":
+                intra_buys, intra_sells = generate_trade_points(bars)
+                show_chart(stages, "chart: intraday", intra_key + (intra_resolution,), charts.price_chart, bars,
+                           intra_buys, intra_sells, sma_short, sma_long)
+            else:
+                show_chart(stages, "chart: intraday", intra_key + (intra_resolution,), charts.rolling_chart,
+                           bars[["Close"]], f"{primary_ticker} {intra_resolution} closes", "Price")
+            st.dataframe(intra_metrics.round(4))
+
     st.markdown("---")
     st.info("Again — this tool is a learning/demo app. Do not use this alone to trade.")
+
+    if show_cache_debug:
+        with st.expander("Stage cache (this rerun)", expanded=True):
+            cache_stats = stages.stats()
+            st.dataframe(cache_stats.round(4))
+            st.caption(f"Time saved by cache hits so far: {cache_stats['saved (s)'].sum():.2f}s")
+        with st.expander("Shared price store (all sessions)"):
+            store_stats = get_price_store().stats()
+            st.dataframe(store_stats.round(3))
+            st.caption(f"{len(store_stats)} tickers mapped, {store_stats['MB'].sum():.1f} MB")
@@ -0,0 +1,375 @@
+"""
+Vectorized backtest engine for the SMA crossover strategy.
+
+Positions come from the same Signal column as ``add_technical_indicators``
+(+1 when the short SMA is above the long SMA, -1 below), acted on at the
+next bar. Every entry point uses one policy for missing prices: SMAs run
+over each ticker's own trading days (``rolling_mean_valid``, as in
+``IndicatorEngine``), and on a date the ticker has no price the position
+from its last bar is held. Fees and slippage are charged in basis points of
+turnover.
+
+- ``run_backtest``: one ticker and one (sma_short, sma_long) pair, with the
+  daily frame (position, returns, equity) and the trade list.
+- ``grid_backtest``: summary metrics for many tickers x many window pairs,
+  computed as whole-array operations per pair and spread over a process
+  pool by ticker chunk.
+- ``walk_forward``: picks the best pair per ticker on a rolling training
+  window and reports it out of sample on the following test window.
+
+Offline run on synthetic prices:
+
+    python backtest.py --tickers 500 --years 10 --windows 5:250:5
+
+That 1225-pair grid takes about a minute on one core and divides by the
+number of worker processes; "a few seconds" for 500 tickers needs a
+machine with a dozen or more cores. Each pair costs a handful of passes
+over the (bars x tickers) returns, and the equity curve behind drawdown and
+total return leaves no way to share those passes between pairs.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from indicator_engine import rolling_mean_valid, ffill
+
+TRADING_DAYS = 252
+METRICS = ["Total Return", "CAGR", "Annual Volatility", "Sharpe Ratio", "Max Drawdown", "Trades", "Exposure"]
+
+
+# ---------------------------
+# Array kernels
+# ---------------------------
+
+def bar_returns(close: np.ndarray) -> np.ndarray:
+    """Simple returns per bar; gaps carry the last price, no data -> 0."""
+    filled = ffill(close)
+    out = np.zeros_like(filled)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[1:] = filled[1:] / filled[:-1] - 1.0
+    out[~np.isfinite(out)] = 0.0
+    return out
+
+
+def held_sma(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    SMA over each ticker's own trading days, carried over dates without a
+    price (NaN before listing), so comparisons hold the last bar's signal.
+    """
+    return ffill(rolling_mean_valid(values, window))
+
+
+def held_signal(sma_short: np.ndarray, sma_long: np.ndarray) -> np.ndarray:
+    """Signal (+1 / -1 / 0) from two ``held_sma`` arrays; 0 before listing."""
+    return np.nan_to_num(np.sign(sma_short - sma_long)).astype(np.int64)
+
+
+def strategy_returns(signal: np.ndarray, returns: np.ndarray, cost: float, long_only=True):
+    """
+    Position held over each bar (yesterday's signal), net strategy returns
+    and turnover. ``cost`` is the fraction of traded value lost per unit of
+    turnover (fees + slippage).
+    """
+    target = np.maximum(signal, 0) if long_only else signal
+    position = np.zeros(signal.shape)
+    position[1:] = target[:-1]
+    turnover = np.abs(np.diff(position, axis=0, prepend=0.0))
+    return position, position * returns - cost * turnover, turnover
+
+
+def summarize(net: np.ndarray, position: np.ndarray, turnover: np.ndarray, years: np.ndarray, n_bars=None) -> dict:
+    """
+    Per-column metrics, with the keys of compute_portfolio_metrics.
+    ``n_bars`` is the number of listed bars per column (default: all rows).
+    """
+    n = np.full(net.shape[1], len(net)) if n_bars is None else np.maximum(n_bars, 2)
+    equity = np.cumprod(1.0 + net, axis=0)
+    total = equity[-1] - 1.0
+    mean = net.sum(axis=0) / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cagr = np.where(total > -1.0, (1.0 + total) ** (1.0 / years) - 1.0, -1.0)
+        ann_vol = np.sqrt(np.maximum((net * net).sum(axis=0) / n - mean * mean, 0.0) * n / (n - 1)) * np.sqrt(TRADING_DAYS)
+        ann_ret = mean * TRADING_DAYS
+        sharpe = np.where(ann_vol > 0, ann_ret / ann_vol, np.nan)
+    drawdown = (equity / np.maximum.accumulate(equity, axis=0) - 1.0).min(axis=0)
+    entries = ((position != 0) & (np.diff(position, axis=0, prepend=0.0) != 0)).sum(axis=0)
+    return {
+        "Total Return": total,
+        "CAGR": cagr,
+        "Annual Volatility": ann_vol,
+        "Sharpe Ratio": sharpe,
+        "Max Drawdown": drawdown,
+        "Trades": entries,
+        "Exposure": (position != 0).sum(axis=0) / n,
+    }
+
+
+def _years(index: pd.DatetimeIndex, close: np.ndarray) -> np.ndarray:
+    first = np.argmax(~np.isnan(close), axis=0)
+    days = (index[-1] - index[first]).days.to_numpy()
+    return np.maximum(days / 365.25, 1 / 365.25)
+
+
+def _pairs(shorts, longs):
+    return [(int(s), int(l)) for s in shorts for l in longs if s < l]
+
+
+# ---------------------------
+# Single ticker
+# ---------------------------
+
+def run_backtest(df: pd.DataFrame, sma_short=20, sma_long=50, fee_bps=10.0, slippage_bps=5.0, long_only=True):
+    """
+    Backtest one ticker. Returns (daily frame, trades frame, metrics dict);
+    the daily frame adds Position, Return, Strategy_Return and Equity.
+    """
+    close = df["Close"]
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    values = close.to_numpy(dtype="float64")[:, None]
+    signal = held_signal(held_sma(values, sma_short), held_sma(values, sma_long))
+    returns = bar_returns(values)
+    cost = (fee_bps + slippage_bps) / 1e4
+    position, net, turnover = strategy_returns(signal, returns, cost, long_only)
+
+    daily = pd.DataFrame({
+        "Close": close,
+        "Signal": signal[:, 0],
+        "Position": position[:, 0],
+        "Return": returns[:, 0],
+        "Strategy_Return": net[:, 0],
+        "Equity": np.cumprod(1.0 + net[:, 0]),
+    }, index=close.index)
+    listed = np.maximum.accumulate(~np.isnan(values), axis=0).sum(axis=0)  # as in _grid_chunk
+    metrics = {k: float(v[0]) for k, v in summarize(net, position, turnover, _years(close.index, values),
+                                                      listed).items()}
+    return daily, trade_list(daily, cost), metrics
+
+
+def trade_list(daily: pd.DataFrame, cost: float) -> pd.DataFrame:
+    """
+    One row per position from entry bar to exit bar (or the last bar).
+    A position still held at the last bar is ``Open``: it has no Exit and
+    its Return is marked to the last close with only the entry cost.
+    """
+    pos = daily["Position"].to_numpy()
+    change = np.flatnonzero(np.diff(pos, prepend=0.0) != 0)
+    rows = []
+    for k, i in enumerate(change):
+        if pos[i] == 0:
+            continue
+        end = change[k + 1] if k + 1 < len(change) else len(pos)
+        is_open = end == len(pos)
+        # entered at the previous bar's close, exited at the close before ``end``
+        entry_price = daily["Close"].iloc[i - 1]
+        exit_price = daily["Close"].iloc[end - 1]
+        gross = pos[i] * (exit_price / entry_price - 1.0)
+        rows.append({
+            "Entry": daily.index[i - 1],
+            "Exit": pd.NaT if is_open else daily.index[end - 1],
+            "Side": "LONG" if pos[i] > 0 else "SHORT",
+            "Entry_Price": entry_price,
+            "Exit_Price": exit_price,
+            "Bars": end - i,
+            "Open": is_open,
+            "Return": gross - (1 if is_open else 2) * cost,
+        })
+    return pd.DataFrame(rows, columns=["Entry", "Exit", "Side", "Entry_Price", "Exit_Price", "Bars", "Open",
+                                       "Return"])
+
+
+# ---------------------------
+# Parameter grid
+# ---------------------------
+
+def _grid_chunk(values, years, pairs, cost, long_only):
+    """
+    Metrics for every pair on one block of tickers: {pair: {metric: array}}.
+    Same results as summarize(strategy_returns(...)) but with fewer passes
+    over the arrays, since this loop runs once per pair.
+    """
+    returns = bar_returns(values)
+    listed = np.maximum.accumulate(~np.isnan(values), axis=0)
+    n = np.maximum(listed.sum(axis=0), 2)  # statistics only count listed bars
+    windows = sorted({w for pair in pairs for w in pair})
+    sma = {w: held_sma(values, w) for w in windows}
+    net = np.empty_like(returns)
+    log_equity = np.empty_like(returns)
+    out = {}
+    for s, l in pairs:
+        if long_only:
+            # SMAs are NaN before listing, so the comparison is False there
+            target = sma[s] > sma[l]
+        else:
+            target = np.nan_to_num(np.sign(sma[s] - sma[l]))
+        # position over bar t is the target at t-1
+        net[0] = 0.0
+        np.multiply(target[:-1], returns[1:], out=net[1:])
+        turnover = np.abs(np.diff(target[:-1].astype(np.int8), axis=0, prepend=0))
+        net[1:] -= cost * turnover
+
+        np.log1p(net, out=log_equity)
+        np.cumsum(log_equity, axis=0, out=log_equity)
+        total = np.expm1(log_equity[-1])
+        drawdown = np.expm1((log_equity - np.maximum.accumulate(log_equity, axis=0)).min(axis=0))
+        mean = net.sum(axis=0) / n
+        std = np.sqrt(np.maximum(np.einsum("tn,tn->n", net, net) / n - mean * mean, 0.0) * n / (n - 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cagr = np.where(total > -1.0, (1.0 + total) ** (1.0 / years) - 1.0, -1.0)
+            sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), np.nan)
+        held = target[:-1] != 0
+        out[(s, l)] = {
+            "Total Return": total,
+            "CAGR": cagr,
+            "Annual Volatility": std * np.sqrt(TRADING_DAYS),
+            "Sharpe Ratio": sharpe,
+            "Max Drawdown": drawdown,
+            "Trades": (held & (turnover != 0)).sum(axis=0),
+            "Exposure": held.sum(axis=0) / n,
+        }
+    return out
+
+
+def grid_backtest(close: pd.DataFrame, shorts, longs, fee_bps=10.0, slippage_bps=5.0,
+                  long_only=True, workers=None, chunk=32) -> pd.DataFrame:
+    """
+    Summary metrics for every ticker x (short, long) pair with short < long.
+
+    Returns a DataFrame indexed by (sma_short, sma_long, ticker) with the
+    ``METRICS`` columns. Ticker blocks of ``chunk`` columns run in parallel
+    on ``workers`` processes (``workers=1`` runs inline).
+    """
+    pairs = _pairs(shorts, longs)
+    values = close.to_numpy(dtype="float64")
+    years = _years(close.index, values)
+    cost = (fee_bps + slippage_bps) / 1e4
+    blocks = [slice(i, i + chunk) for i in range(0, values.shape[1], chunk)]
+    args = [(values[:, b], years[b], pairs, cost, long_only) for b in blocks]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(blocks) == 1:
+        results = [_grid_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+            results = list(pool.map(_grid_chunk, *zip(*args)))
+
+    data = {m: np.concatenate([np.stack([r[p][m] for p in pairs]) for r in results], axis=1).ravel()
+            for m in METRICS}
+    index = pd.MultiIndex.from_product(
+        [pairs, list(close.columns)], names=["pair", "ticker"]
+    )
+    frame = pd.DataFrame(data, index=index).reset_index()
+    frame[["sma_short", "sma_long"]] = pd.DataFrame(frame.pop("pair").tolist(), index=frame.index)
+    return frame.set_index(["sma_short", "sma_long", "ticker"])
+
+
+# ---------------------------
+# Walk-forward
+# ---------------------------
+
+def _window_stats(net: np.ndarray, bounds):
+    """(sum, sum of squares) of net returns per (window, ticker) via cumsum."""
+    csum = np.vstack([np.zeros(net.shape[1]), np.cumsum(net, axis=0)])
+    csq = np.vstack([np.zeros(net.shape[1]), np.cumsum(net * net, axis=0)])
+    a, b = bounds[:, 0], bounds[:, 1]
+    return csum[b] - csum[a], csq[b] - csq[a]
+
+
+def _sharpe(s, sq, n):
+    """Annualized Sharpe from window sums; NaN when the returns do not vary (e.g. never held)."""
+    mean = s / n
+    var = np.maximum(sq / n - mean * mean, 0.0) * n / max(n - 1, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(var > 0, mean / np.sqrt(var) * np.sqrt(TRADING_DAYS), np.nan)
+
+
+def walk_forward(close: pd.DataFrame, shorts, longs, train_bars=504, test_bars=126,
+                 fee_bps=10.0, slippage_bps=5.0, long_only=True):
+    """
+    Rolling walk-forward selection by Sharpe ratio.
+
+    For each fold the pair with the best training-window Sharpe is chosen
+    per ticker, then scored on the next ``test_bars`` bars. Indicators use
+    all history up to each bar, so there is no warm-up gap at fold edges.
+
+    Returns (choices, oos): ``choices`` is indexed by (fold start date,
+    ticker) with the chosen pair and its train/test Sharpe; ``oos`` has the
+    stitched out-of-sample Sharpe and mean annual return per ticker.
+    """
+    pairs = _pairs(shorts, longs)
+    values = close.to_numpy(dtype="float64")
+    T, N = values.shape
+    starts = np.arange(train_bars, T - test_bars + 1, test_bars)
+    if len(starts) == 0:
+        raise ValueError("history is shorter than one train + test window")
+    train_bounds = np.column_stack([starts - train_bars, starts])
+    test_bounds = np.column_stack([starts, starts + test_bars])
+
+    returns = bar_returns(values)
+    sma = {w: held_sma(values, w) for w in sorted({w for p in pairs for w in p})}
+    cost = (fee_bps + slippage_bps) / 1e4
+    train = np.empty((len(pairs), len(starts), N))
+    test_sum = np.empty_like(train)
+    test_sq = np.empty_like(train)
+    for k, (s, l) in enumerate(pairs):
+        _, net, _ = strategy_returns(held_signal(sma[s], sma[l]), returns, cost, long_only)
+        train[k] = _sharpe(*_window_stats(net, train_bounds), train_bars)
+        test_sum[k], test_sq[k] = _window_stats(net, test_bounds)
+
+    # pairs without a training Sharpe never win; all-NaN folds fall back to the first pair
+    best = np.argmax(np.where(np.isnan(train), -np.inf, train), axis=0)  # (folds, tickers)
+    pick = lambda a: np.take_along_axis(a, best[None], axis=0)[0]
+    chosen_sum, chosen_sq = pick(test_sum), pick(test_sq)
+    choices = pd.DataFrame({
+        "sma_short": np.array([pairs[i][0] for i in best.ravel()]),
+        "sma_long": np.array([pairs[i][1] for i in best.ravel()]),
+        "train_sharpe": pick(train).ravel(),
+        "test_sharpe": _sharpe(chosen_sum, chosen_sq, test_bars).ravel(),
+    }, index=pd.MultiIndex.from_product([close.index[starts], close.columns], names=["fold_start", "ticker"]))
+
+    n_oos = test_bars * len(starts)
+    total_sum, total_sq = chosen_sum.sum(axis=0), chosen_sq.sum(axis=0)
+    oos = pd.DataFrame({
+        "oos_sharpe": _sharpe(total_sum, total_sq, n_oos),
+        "oos_annual_return": total_sum / n_oos * TRADING_DAYS,
+    }, index=close.columns)
+    return choices, oos
+
+
+# ---------------------------
+# Offline benchmark
+# ---------------------------
+
+def main():
+    from benchmark import synthetic_panel
+
+    parser = argparse.ArgumentParser(description="SMA crossover grid backtest on synthetic prices")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--windows", default="5:250:5", help="start:stop:step for both SMA windows")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    a, b, c = (int(x) for x in args.windows.split(":"))
+    windows = range(a, b + 1, c)
+    n_days = int(args.years * TRADING_DAYS)
+    panel = synthetic_panel(n_days, args.tickers)
+    close = pd.DataFrame(panel["Close"], index=pd.bdate_range("2000-01-03", periods=n_days),
+                         columns=[f"SYN{i}" for i in range(args.tickers)])
+    n_pairs = len(_pairs(windows, windows))
+
+    t0 = time.perf_counter()
+    result = grid_backtest(close, windows, windows, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"{n_pairs} pairs x {args.tickers} tickers x {n_days} bars in {elapsed:.2f}s")
+    best = result.groupby(level=["sma_short", "sma_long"])["Sharpe Ratio"].mean().nlargest(5)
+    print("Top pairs by mean Sharpe:")
+    print(best.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Concurrent multi-ticker download for the stock indicators app.
+
+``fetch_many`` runs a fetch callable for many tickers on a bounded thread
+pool, with a per-attempt timeout, retry with exponential backoff, and a
+report of the tickers that still failed. Wall-clock time for N tickers is
+close to the slowest single ticker rather than the sum of all of them.
+
+Offline benchmark against the synthetic stand-in provider:
+
+    python batch_fetch.py --tickers 30 --latency 0.3
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def fetch_many(tickers, fetch, max_workers=8, timeout=30.0, retries=2, backoff=0.5):
+    """
+    Call ``fetch(ticker)`` for every ticker concurrently.
+
+    An attempt that raises or runs longer than ``timeout`` seconds is retried
+    up to ``retries`` times, waiting ``backoff * 2**attempt`` seconds first.
+    A ``None``/empty result means "no data" and is not retried.
+
+    A running thread cannot be stopped, so after a timeout the pool is
+    replaced and the hung call is left to finish on the old one: it no
+    longer holds a worker the other tickers need. ``fetch`` should still
+    have its own network timeout (the sources do) so those threads end.
+
+    Returns (results, failures): ``results`` maps ticker -> DataFrame in input
+    order, ``failures`` maps ticker -> short reason string.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    results, failures = {}, {}
+    attempts = {t: 0 for t in tickers}
+    queue = [(0.0, t) for t in tickers]  # (ready_at, ticker)
+    pending = {}  # future -> (ticker, started_at)
+
+    def retry_or_fail(ticker, reason, now):
+        attempts[ticker] += 1
+        if attempts[ticker] > retries:
+            failures[ticker] = f"{reason} (after {attempts[ticker]} attempts)"
+        else:
+            queue.append((now + backoff * 2 ** (attempts[ticker] - 1), ticker))
+
+    pools = [ThreadPoolExecutor(max_workers=max_workers)]
+    try:
+        while queue or pending:
+            now = time.monotonic()
+
+            # start ready attempts only when a worker is free, so the timeout
+            # clock measures the fetch itself and not time spent queued
+            queue.sort()
+            while queue and queue[0][0] <= now and len(pending) < max_workers:
+                _, ticker = queue.pop(0)
+                pending[pools[-1].submit(fetch, ticker)] = (ticker, now)
+
+            wake_at = [started + timeout for _, started in pending.values()]
+            if queue and len(pending) < max_workers:
+                wake_at.append(queue[0][0])
+            wait_for = max(0.0, min(wake_at) - now) if wake_at else None
+            if pending:
+                done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(wait_for)
+                done = set()
+
+            now = time.monotonic()
+            for future in done:
+                ticker, _ = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    retry_or_fail(ticker, f"{type(e).__name__}: {e}", now)
+                    continue
+                if df is None or df.empty:
+                    failures[ticker] = "no data"
+                else:
+                    results[ticker] = df
+
+            hung = False
+            for future, (ticker, started) in list(pending.items()):
+                if now - started >= timeout:
+                    pending.pop(future)
+                    hung |= not future.cancel()
+                    retry_or_fail(ticker, f"timed out after {timeout:g}s", now)
+            if hung:
+                # calls still running on the old pool keep their own threads
+                pools[-1].shutdown(wait=False)
+                pools.append(ThreadPoolExecutor(max_workers=max_workers))
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    results = {t: results[t] for t in tickers if t in results}
+    return results, failures
+
+
+# ---------------------------
+# Offline benchmark
+# ---------------------------
+
+def main():
+    from price_cache import SyntheticSource
+
+    parser = argparse.ArgumentParser(description="Serial vs concurrent fetch against a synthetic provider")
+    parser.add_argument("--tickers", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per simulated request")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    source = SyntheticSource(latency=args.latency)
+    tickers = [f"SYN{i}.NS" for i in range(args.tickers)]
+
+    def fetch(t):
+        return source.fetch(t, "2022-01-01", "2024-01-01")
+
+    t0 = time.perf_counter()
+    for t in tickers:
+        fetch(t)
+    serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results, failures = fetch_many(tickers, fetch, max_workers=args.workers)
+    concurrent = time.perf_counter() - t0
+
+    print(f"{args.tickers} tickers, {args.latency:.2f}s latency each")
+    print(f"serial:     {serial:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s ({len(results)} ok, {len(failures)} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Regression benchmark suite for the stock indicators analytics.
+
+Runs the app's analysis functions on synthetic prices over a grid of history
+lengths and universe sizes, records wall time and peak memory, appends the
+results to a JSON-lines history file and flags every case that got slower
+or hungrier than its recent history on the same machine and library
+versions, beyond the noise of that history:
+
+    python bench_suite.py                          # quick grid
+    python bench_suite.py --grid full              # 1-30 years x 1-1000 tickers
+    python bench_suite.py --filter lag --threshold 0.1 --fail-on-regression
+
+``add_technical_indicators`` and the reference lag regression
+(``create_lag_features``, ``train_predict_lr`` from ``benchmark``) are
+called once per ticker frame; ``compute_portfolio_metrics``, ``lag_sweep``
+and ``direct_forecast`` get the whole close matrix. Time is the best of ``--repeat`` runs;
+peak memory comes from one extra run under ``tracemalloc``, so tracing
+does not slow down the timed runs.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmark import synthetic_panel, panel_frame, create_lag_features, train_predict_lr, TRADING_DAYS
+from indicator_engine import add_technical_indicators
+from portfolio import compute_portfolio_metrics
+from forecast import direct_forecast, lag_sweep
+
+DEFAULT_HISTORY = os.path.join(os.path.expanduser("~"), ".cache", "stockindicators", "bench_history.jsonl")
+GRIDS = {
+    "quick": {"years": (1, 10), "tickers": (1, 10, 100)},
+    "full": {"years": (1, 5, 10, 30), "tickers": (1, 10, 100, 1000)},
+}
+BASELINE_RUNS = 5   # previous results of a case the new one is compared with
+THRESHOLD = 0.2     # relative slowdown / memory growth flagged as a regression
+NOISE = 3.0         # ... and it must also exceed this many baseline spreads
+MIN_DELTA = {"seconds": 0.005, "peak_mb": 1.0}  # ... and these absolute changes
+COMPARABLE = ("case", "years", "tickers", "machine", "python", "numpy", "pandas")
+
+
+# ---------------------------
+# Cases
+# ---------------------------
+
+def _frames(panel: dict) -> list:
+    return [panel_frame(panel, j) for j in range(panel["Close"].shape[1])]
+
+
+def _close(panel: dict) -> pd.DataFrame:
+    index = panel_frame(panel, 0).index
+    return pd.DataFrame(panel["Close"], index=index, columns=[f"T{j}" for j in range(panel["Close"].shape[1])])
+
+
+CASES = {
+    # name -> (setup(panel) -> data, run(data))
+    "add_technical_indicators": (_frames, lambda frames: [add_technical_indicators(df, 20, 50) for df in frames]),
+    "create_lag_features": (_frames, lambda frames: [create_lag_features(df, 5) for df in frames]),
+    "train_predict_lr": (_frames, lambda frames: [train_predict_lr(df, 5, 5) for df in frames]),
+    "lag_sweep": (_close, lambda close: lag_sweep(close, range(1, 21), 5)),
+    "direct_forecast": (_close, lambda close: direct_forecast(close, 5, 5)),
+    "compute_portfolio_metrics": (
+        _close, lambda close: compute_portfolio_metrics(close, np.full(close.shape[1], 1.0 / close.shape[1]))
+    ),
+}
+
+
+def measure(run, data, repeat: int) -> dict:
+    """Best and median wall time of ``repeat`` runs, and peak traced memory of one more."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run(data)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        run(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "peak_mb": peak / 1024 ** 2}
+
+
+# ---------------------------
+# History
+# ---------------------------
+
+def environment() -> dict:
+    """What a result is comparable with: same machine and library versions."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {"machine": platform.node(), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "commit": commit or None}
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # a truncated last line from an interrupted run
+    return records
+
+
+def append_history(path: str, records: list):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            # rows without a baseline carry NaN after the DataFrame round trip
+            f.write(json.dumps({k: v for k, v in record.items() if v == v}) + "\n")
+
+
+def baseline(history: list, record: dict, runs=BASELINE_RUNS):
+    """
+    {metric: (median, spread)} for seconds and peak MB over the last ``runs``
+    results of the same case and size on the same machine and Python, NumPy
+    and pandas versions, or None. The spread is the median absolute
+    deviation of those results.
+    """
+    key = tuple(record[k] for k in COMPARABLE)
+    same = [r for r in history if tuple(r.get(k) for k in COMPARABLE) == key][-runs:]
+    if not same:
+        return None
+    out = {}
+    for metric in ("seconds", "peak_mb"):
+        values = [r[metric] for r in same]
+        median = statistics.median(values)
+        out[metric] = median, statistics.median(abs(v - median) for v in values)
+    return out
+
+
+def regressed(value: float, median: float, spread: float, metric: str, threshold=THRESHOLD) -> bool:
+    """Worse than the baseline by ``threshold``, by ``NOISE`` spreads and by ``MIN_DELTA``."""
+    return value - median > max(threshold * median, NOISE * spread, MIN_DELTA[metric])
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def run_suite(grid: dict, cases=CASES, repeat=3, history=(), threshold=THRESHOLD, seed=0) -> pd.DataFrame:
+    """
+    Run every case on every (years, tickers) size of ``grid`` and compare
+    with ``history``. Returns one row per case and size; ``regression``
+    names what got worse by more than ``threshold``, the run-to-run spread
+    of the baseline and a minimum absolute change ("time", "memory").
+    """
+    env = environment()
+    stamp = datetime.now().isoformat(timespec="seconds")
+    rows = []
+    for years in grid["years"]:
+        for n_tickers in grid["tickers"]:
+            panel = synthetic_panel(int(years * TRADING_DAYS), n_tickers, seed=seed)
+            for name, (setup, run) in cases.items():
+                record = {"timestamp": stamp, "case": name, "years": years, "tickers": n_tickers, **env,
+                          **measure(run, setup(panel), repeat)}
+                base = baseline(history, record)
+                flags = []
+                if base is not None:
+                    record["baseline_seconds"], record["baseline_seconds_spread"] = base["seconds"]
+                    record["baseline_peak_mb"], record["baseline_peak_mb_spread"] = base["peak_mb"]
+                    for metric, flag in (("seconds", "time"), ("peak_mb", "memory")):
+                        if regressed(record[metric], *base[metric], metric, threshold):
+                            flags.append(flag)
+                record["regression"] = ",".join(flags)
+                rows.append(record)
+                print(f"{name:<26} {years:>3}y x {n_tickers:>4} tickers: {record['seconds'] * 1000:9.1f}ms "
+                      f"{record['peak_mb']:8.1f} MB  {'REGRESSION: ' + record['regression'] if flags else ''}",
+                      flush=True)
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid", choices=list(GRIDS), default="quick")
+    parser.add_argument("--years", type=float, nargs="+", help="override the grid's history lengths")
+    parser.add_argument("--tickers", type=int, nargs="+", help="override the grid's universe sizes")
+    parser.add_argument("--filter", default="", help="regex selecting case names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative change flagged as a regression")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines file of past results")
+    parser.add_argument("--no-save", action="store_true", help="compare with the history without appending to it")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything regressed")
+    args = parser.parse_args()
+
+    grid = dict(GRIDS[args.grid])
+    if args.years:
+        grid["years"] = args.years
+    if args.tickers:
+        grid["tickers"] = args.tickers
+    cases = {name: case for name, case in CASES.items() if re.search(args.filter, name)}
+    if not cases:
+        parser.error(f"no case matches {args.filter!r}")
+
+    results = run_suite(grid, cases, repeat=args.repeat, history=load_history(args.history), threshold=args.threshold)
+    if not args.no_save:
+        append_history(args.history, results.to_dict("records"))
+    regressed = results[results["regression"] != ""]
+    print(f"\n{len(results)} results, {len(regressed)} regressions (threshold {args.threshold:.0%})"
+          + ("" if args.no_save else f", history: {args.history}"))
+    if len(regressed):
+        print(regressed[["case", "years", "tickers", "seconds", "baseline_seconds", "peak_mb",
+                         "baseline_peak_mb", "regression"]].to_string(index=False))
+    if args.fail_on_regression and len(regressed):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
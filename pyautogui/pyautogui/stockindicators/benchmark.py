@@ -0,0 +1,331 @@
+"""
+Offline benchmarks for the stock indicators analytics, on synthetic data.
+
+    python benchmark.py indicators --tickers 10000 --years 20
+    python benchmark.py montecarlo --paths 100000 --tickers 10
+    python benchmark.py frontier --tickers 500 --points 50
+    python benchmark.py charts --tickers 10 --years 20
+    python benchmark.py rebalance --tickers 50 --years 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error
+
+from indicator_engine import compute_indicators, INDICATORS
+from montecarlo import simulate_portfolio, risk_summary
+from frontier import optimize_portfolio
+import charts
+from rebalance import schedule, simulate_rebalancing, _targets, _cash_growth
+
+TRADING_DAYS = 252
+
+
+# ---------------------------
+# Synthetic data
+# ---------------------------
+
+def synthetic_panel(n_days: int, n_tickers: int, seed=0) -> dict:
+    """Geometric random-walk OHLCV arrays of shape (n_days, n_tickers)."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.015, size=(n_days, n_tickers))
+    close = 100.0 * np.exp(np.cumsum(returns, axis=0))
+    spread = np.abs(rng.normal(0.0, 0.01, size=(n_days, n_tickers))) * close
+    return {
+        "Open": close * (1 + rng.normal(0.0, 0.003, size=(n_days, n_tickers))),
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Volume": rng.lognormal(13.0, 0.5, size=(n_days, n_tickers)),
+    }
+
+
+def panel_frame(panel: dict, j: int) -> pd.DataFrame:
+    """One ticker of a synthetic panel as an app-style OHLCV DataFrame."""
+    n_days = len(panel["Close"])
+    index = pd.bdate_range("2000-01-03", periods=n_days, name="Date")
+    return pd.DataFrame({k: v[:, j] for k, v in panel.items()}, index=index)
+
+
+# ---------------------------
+# Indicators
+# ---------------------------
+
+def naive_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """The same indicators as a chain of pandas column operations."""
+    c, h, l, v = df["Close"], df["High"], df["Low"], df["Volume"]
+    out = pd.DataFrame(index=df.index)
+    out["EMA"] = c.ewm(span=20, adjust=False).mean()
+    delta = c.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    out["RSI"] = 100 - 100 / (1 + gain / loss)
+    out["MACD"] = c.ewm(span=12, adjust=False).mean() - c.ewm(span=26, adjust=False).mean()
+    out["MACD_Signal"] = out["MACD"].ewm(span=9, adjust=False).mean()
+    out["MACD_Hist"] = out["MACD"] - out["MACD_Signal"]
+    tr = pd.concat([h - l, (h - c.shift()).abs(), (l - c.shift()).abs()], axis=1).max(axis=1)
+    out["ATR"] = tr.ewm(alpha=1 / 14, adjust=False).mean()
+    out["BB_Mid"] = c.rolling(20, min_periods=1).mean()
+    std = c.rolling(20, min_periods=1).std(ddof=0)
+    out["BB_Upper"] = out["BB_Mid"] + 2 * std
+    out["BB_Lower"] = out["BB_Mid"] - 2 * std
+    typical = (h + l + c) / 3
+    out["VWAP"] = (typical * v).cumsum() / v.cumsum()
+    out["OBV"] = (np.sign(delta.fillna(0)) * v).cumsum()
+    return out
+
+
+# ---------------------------
+# Lag regression
+# ---------------------------
+
+def create_lag_features(df: pd.DataFrame, lags=5):
+    """The app's original lag columns, one shifted copy of Close per lag."""
+    df = df.copy()
+    for lag in range(1, lags+1):
+        df[f"lag_{lag}"] = df["Close"].shift(lag)
+    df = df.dropna()
+    return df
+
+
+def train_predict_lr(df: pd.DataFrame, lags=5, predict_days=5):
+    """
+    The app's original per-ticker model, the reference for ``forecast``:
+    scikit-learn regression on the lag features, predicted recursively.
+    Returns (preds, model, rmse), or Nones for fewer than 20 rows.
+    """
+    df_feat = create_lag_features(df, lags=lags)
+    X = df_feat[[f"lag_{i}" for i in range(1, lags+1)]].values
+    y = df_feat["Close"].values
+    if len(X) < 20:
+        return None, None, None
+    model = LinearRegression()
+    model.fit(X, y)
+    last_row = df_feat.iloc[-1]
+    preds = []
+    current_input = np.array([last_row[f"lag_{i}"] for i in range(1, lags+1)]).ravel()
+    for i in range(predict_days):
+        p = float(model.predict(current_input.reshape(1, -1))[0])
+        preds.append(p)
+        current_input = np.concatenate((np.array([p]), current_input[:-1].ravel()))
+    rmse = float(np.sqrt(mean_squared_error(y, model.predict(X))))
+    return preds, model, rmse
+
+
+def bench_indicators(args):
+    n_days = int(args.years * TRADING_DAYS)
+    fused_time = 0.0
+    sample = None
+    for start in range(0, args.tickers, args.chunk):
+        width = min(args.chunk, args.tickers - start)
+        panel = synthetic_panel(n_days, width, seed=start)
+        t0 = time.perf_counter()
+        result = compute_indicators(panel["Close"], panel["High"], panel["Low"], panel["Volume"], INDICATORS)
+        fused_time += time.perf_counter() - t0
+        if sample is None:
+            sample = (panel, result)
+
+    # the pandas chain is timed on a sample of tickers and scaled up
+    panel, result = sample
+    n_sample = min(args.naive_sample, panel["Close"].shape[1])
+    frames = [panel_frame(panel, j) for j in range(n_sample)]
+    t0 = time.perf_counter()
+    naive = [naive_indicators(df) for df in frames]
+    naive_time = (time.perf_counter() - t0) * args.tickers / n_sample
+
+    max_err = 0.0
+    for j, expected in enumerate(naive):
+        for col in expected.columns:
+            err = np.abs(result[col][:, j] - expected[col].to_numpy()) / np.maximum(1.0, np.abs(expected[col].to_numpy()))
+            max_err = max(max_err, float(np.nanmax(err)))
+
+    print(f"{args.tickers} tickers x {args.years:g} years ({n_days} bars), {len(INDICATORS)} indicators")
+    print(f"fused NumPy:  {fused_time:8.2f}s")
+    print(f"pandas chain: {naive_time:8.2f}s (extrapolated from {n_sample} tickers)")
+    print(f"speed-up:     {naive_time / fused_time:8.1f}x, max relative difference {max_err:.2e}")
+
+
+# ---------------------------
+# Monte Carlo
+# ---------------------------
+
+def bench_montecarlo(args):
+    panel = synthetic_panel(int(args.years * TRADING_DAYS), args.tickers)
+    prices = pd.DataFrame(panel["Close"])
+    weights = np.full(args.tickers, 1.0 / args.tickers)
+    for method in ("cholesky", "bootstrap"):
+        t0 = time.perf_counter()
+        sim = simulate_portfolio(prices, weights, n_paths=args.paths, horizon=args.horizon,
+                                 method=method, block=args.block if method == "bootstrap" else 1, seed=args.seed)
+        elapsed = time.perf_counter() - t0
+        summary = risk_summary(sim)["Value"]
+        print(f"{method:9s}: {args.paths} paths x {args.horizon} days x {args.tickers} assets in {elapsed:.2f}s "
+              f"({args.paths / elapsed:,.0f} paths/s), VaR 95% {summary['VaR 95%']:.2%}, "
+              f"CVaR 95% {summary['CVaR 95%']:.2%}")
+
+
+# ---------------------------
+# Efficient frontier
+# ---------------------------
+
+def bench_frontier(args):
+    panel = synthetic_panel(int(args.years * TRADING_DAYS), args.tickers)
+    prices = pd.DataFrame(panel["Close"])
+    t0 = time.perf_counter()
+    result = optimize_portfolio(prices, n_points=args.points, upper=args.max_weight)
+    elapsed = time.perf_counter() - t0
+    best = result["frontier"]["Sharpe Ratio"].max()
+    print(f"{args.tickers} assets, {args.points} frontier points, max weight {args.max_weight:g}: {elapsed:.2f}s "
+          f"({len(result['frontier'])} distinct points, best frontier Sharpe {best:.2f})")
+
+
+# ---------------------------
+# Charts
+# ---------------------------
+
+def matplotlib_png(price: pd.DataFrame, all_close: pd.DataFrame) -> float:
+    """Seconds to rasterize the two figures the app drew with matplotlib."""
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    t0 = time.perf_counter()
+    for frame in (price, all_close.pct_change().add(1).cumprod()):
+        fig, ax = plt.subplots(figsize=(12, 5))
+        for col in frame.columns:
+            ax.plot(frame.index, frame[col], label=col)
+        ax.legend()
+        fig.savefig(io.BytesIO(), format="png", dpi=100)
+        plt.close(fig)
+    return time.perf_counter() - t0
+
+
+def bench_charts(args):
+    panel = synthetic_panel(int(args.years * TRADING_DAYS), args.tickers)
+    all_close = pd.DataFrame(panel["Close"], index=panel_frame(panel, 0).index,
+                             columns=[f"T{j}" for j in range(args.tickers)])
+    df = all_close.iloc[:, :1].rename(columns={"T0": "Close"})
+    df["SMA_20"] = df["Close"].rolling(20).mean()
+    df["SMA_50"] = df["Close"].rolling(50).mean()
+    cross = np.sign(df["SMA_20"] - df["SMA_50"]).diff().fillna(0)
+    buys, sells = df[cross > 0], df[cross < 0]
+    cum_returns = (1 + all_close.pct_change().dropna().mean(axis=1)).cumprod()
+
+    charts.histogram_chart(np.zeros(10), "warm-up").to_dict()  # load the Vega-Lite schema once
+    best_build = best_total = np.inf
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        price = charts.price_chart(df, buys, sells, 20, 50, max_points=args.max_points)
+        cumulative = charts.cumulative_returns_chart(all_close, cum_returns, max_points=args.max_points)
+        built = time.perf_counter() - t0
+        # Streamlit validates the spec with to_dict and ships the data as Arrow
+        specs = [price.to_dict(), cumulative.to_dict()]
+        best_build, best_total = min(best_build, built), min(best_total, time.perf_counter() - t0)
+    rows = sum(len(values) for spec in specs for values in spec["datasets"].values())
+    print(f"{args.tickers} tickers x {len(all_close)} days, {len(buys) + len(sells)} markers -> {rows} rows sent: "
+          f"build {best_build * 1000:.0f}ms, build + spec {best_total * 1000:.0f}ms (best of {args.repeat})")
+    if not args.skip_matplotlib:
+        print(f"matplotlib PNG of the same data: {matplotlib_png(df, all_close) * 1000:.0f}ms")
+
+
+# ---------------------------
+# Rebalancing
+# ---------------------------
+
+def naive_rebalancing(prices: pd.DataFrame, spec: dict, fee_rate: float, cash_rate: float) -> pd.Series:
+    """One schedule simulated day by day with shares and cash, the plain-loop reference."""
+    values = prices.to_numpy(dtype="float64")
+    target, forced = _targets(spec, prices)
+    band = spec["band"]
+    out = np.empty(len(values))
+    value, last = 1.0, 0
+    for t in range(len(values)):
+        if t > 0:
+            held = shares * values[t]
+            value = held.sum() + cash * _cash_growth(cash_rate, t - last)
+            drift = np.abs(held / value - target[t]).max()
+            trade = forced[t] or (band is not None and drift > band)
+        else:
+            held, trade = np.zeros(values.shape[1]), True
+        if trade:
+            value *= 1.0 - fee_rate * np.abs(target[t] - held / value).sum()
+            shares = target[t] * value / values[t]
+            cash = (1.0 - target[t].sum()) * value
+            last = t
+        out[t] = value
+    return pd.Series(out, index=prices.index)
+
+
+def bench_rebalance(args):
+    panel = synthetic_panel(int(args.years * TRADING_DAYS), args.tickers)
+    prices = pd.DataFrame(panel["Close"], index=panel_frame(panel, 0).index)
+    weights = np.full(args.tickers, 1.0 / args.tickers)
+    signal = np.sign(prices.rolling(20).mean() - prices.rolling(50).mean())
+    specs = [schedule("hold", weights), schedule("daily", weights, freq="D"), schedule("monthly", weights, freq="M"),
+             schedule("quarterly", weights, freq="Q"), schedule("band 1%", weights, band=0.01),
+             schedule("band 5%", weights, band=0.05), schedule("signal", weights, signal=signal)]
+    t0 = time.perf_counter()
+    result = simulate_rebalancing(prices, specs, fee_rate=0.001)
+    elapsed = time.perf_counter() - t0
+    counts = ", ".join(f"{name} {n}" for name, n in result["summary"]["Rebalances"].items())
+    print(f"{len(specs)} schedules x {args.tickers} tickers x {len(prices)} days: {elapsed * 1000:.0f}ms")
+    print(f"rebalances: {counts}")
+
+    # check the vectorized schedules against the day-by-day loop
+    for spec in specs:
+        t0 = time.perf_counter()
+        naive = naive_rebalancing(prices, spec, fee_rate=0.001, cash_rate=0.0)
+        loop_time = time.perf_counter() - t0
+        error = np.abs(result["value"][spec["name"]].to_numpy() / 100_000.0 - naive.to_numpy()).max()
+        print(f"{spec['name']:<10} max |value - loop| {error:.2e} per unit of capital, loop {loop_time * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("indicators", help="fused compute_indicators vs pandas chain")
+    p.add_argument("--tickers", type=int, default=10000)
+    p.add_argument("--years", type=float, default=20)
+    p.add_argument("--chunk", type=int, default=250, help="tickers per fused call (bounds memory)")
+    p.add_argument("--naive-sample", type=int, default=100, help="tickers timed with pandas")
+    p.set_defaults(func=bench_indicators)
+
+    p = sub.add_parser("montecarlo", help="portfolio path simulation throughput")
+    p.add_argument("--paths", type=int, default=100000)
+    p.add_argument("--horizon", type=int, default=252)
+    p.add_argument("--tickers", type=int, default=10)
+    p.add_argument("--years", type=float, default=5, help="history used to fit the returns")
+    p.add_argument("--block", type=int, default=5, help="bootstrap block length")
+    p.add_argument("--seed", type=int, default=42)
+    p.set_defaults(func=bench_montecarlo)
+
+    p = sub.add_parser("frontier", help="batched efficient frontier solve")
+    p.add_argument("--tickers", type=int, default=500)
+    p.add_argument("--points", type=int, default=50)
+    p.add_argument("--years", type=float, default=2, help="history used for the covariance")
+    p.add_argument("--max-weight", type=float, default=1.0, help="per-asset upper bound")
+    p.set_defaults(func=bench_frontier)
+
+    p = sub.add_parser("charts", help="downsampled chart build vs matplotlib rendering")
+    p.add_argument("--tickers", type=int, default=10)
+    p.add_argument("--years", type=float, default=20)
+    p.add_argument("--max-points", type=int, default=charts.MAX_POINTS, help="points per chart")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--skip-matplotlib", action="store_true")
+    p.set_defaults(func=bench_charts)
+
+    p = sub.add_parser("rebalance", help="rebalancing schedules over a long history")
+    p.add_argument("--tickers", type=int, default=50)
+    p.add_argument("--years", type=float, default=20)
+    p.set_defaults(func=bench_rebalance)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Downsampled Altair charts for the stock indicators app.
+
+Long histories are reduced to a few thousand points per series before they
+are handed to the browser: single price lines use LTTB (largest triangle
+three buckets), which keeps the visual shape of the curve, and wide
+multi-ticker panels use vectorized min/max bucketing, which keeps every
+local extreme. Buy/sell markers are never downsampled, so they sit exactly
+on their bars. Vega-Lite renders the charts client-side, so the server
+only builds a small JSON spec instead of rasterizing a figure.
+"""
+import altair as alt
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 2000  # points per chart sent to the browser, about two per pixel
+
+
+# ---------------------------
+# Downsampling
+# ---------------------------
+
+def lttb_indices(y: np.ndarray, n_out: int, x=None) -> np.ndarray:
+    """
+    Indices of the ``n_out`` points LTTB keeps from ``y``. The first and
+    last points are always kept; each bucket in between keeps the point
+    forming the largest triangle with the previous pick and the next
+    bucket's mean.
+    """
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype="float64") if x is None else np.asarray(x, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # bucket means from prefix sums; the last "next bucket" is the final point
+    cx, cy = np.concatenate([[0.0], np.cumsum(x)]), np.concatenate([[0.0], np.cumsum(y)])
+    counts = np.diff(edges)
+    mean_x = np.append((cx[edges[1:]] - cx[edges[:-1]]) / counts, x[-1])
+    mean_y = np.append((cy[edges[1:]] - cy[edges[:-1]]) / counts, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nx, ny = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    (rows x series) indices keeping the minimum and maximum of each of
+    ``n_out // 2`` buckets per column, in time order. NaNs are never picked
+    unless a bucket holds nothing else.
+    """
+    values = np.asarray(values, dtype="float64")
+    if values.ndim == 1:
+        values = values[:, None]
+    n, k = values.shape
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.repeat(np.arange(n)[:, None], k, axis=1)
+    size = -(-n // n_buckets)
+    padded = np.full((n_buckets * size, k), np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(n_buckets, size, k)
+    lo = np.nan_to_num(blocks, nan=np.inf).argmin(axis=1)
+    hi = np.nan_to_num(blocks, nan=-np.inf).argmax(axis=1)
+    start = (np.arange(n_buckets) * size)[:, None]
+    picks = np.sort(np.stack([lo, hi], axis=1), axis=1) + start[:, None, :]
+    return np.minimum(picks.reshape(-1, k), n - 1)
+
+
+def downsample_long(frame: pd.DataFrame, max_points=MAX_POINTS, method="lttb", value_name="value") -> pd.DataFrame:
+    """
+    Long (Date, series, value) table of ``frame``'s columns with at most
+    ``max_points`` rows in total, ready for an Altair line chart.
+    """
+    index = frame.index.to_numpy()
+    per_series = max(max_points // max(frame.shape[1], 1), 4)
+    parts = []
+    if method == "minmax":
+        values = frame.to_numpy(dtype="float64")
+        picks = minmax_indices(values, per_series)
+        for j, name in enumerate(frame.columns):
+            rows = np.unique(picks[:, j])
+            rows = rows[~np.isnan(values[rows, j])]
+            parts.append(pd.DataFrame({"Date": index[rows], "series": name, value_name: values[rows, j]}))
+    else:
+        for name in frame.columns:
+            s = frame[name].dropna()
+            rows = lttb_indices(s.to_numpy(dtype="float64"), per_series)
+            parts.append(pd.DataFrame({"Date": s.index.to_numpy()[rows], "series": name,
+                                       value_name: s.to_numpy()[rows]}))
+    return pd.concat(parts, ignore_index=True)
+
+
+# ---------------------------
+# Charts
+# ---------------------------
+
+def _lines(data: pd.DataFrame, title: str, y_title: str, value_name="value", height=350):
+    return alt.Chart(data, title=title, height=height).mark_line().encode(
+        x=alt.X("Date:T", title=None),
+        y=alt.Y(f"{value_name}:Q", title=y_title, scale=alt.Scale(zero=False)),
+        color=alt.Color("series:N", title=None, sort=None),
+        tooltip=[alt.Tooltip("Date:T"), "series:N", alt.Tooltip(f"{value_name}:Q", format=",.2f")],
+    )
+
+
+def price_chart(df: pd.DataFrame, buys: pd.DataFrame, sells: pd.DataFrame, sma_short, sma_long,
+                max_points=MAX_POINTS):
+    """Close and SMA lines (LTTB) with exact buy/sell markers."""
+    columns = ["Close", f"SMA_{sma_short}", f"SMA_{sma_long}"]
+    lines = _lines(downsample_long(df[columns], max_points), "Price with SMA and Buy/Sell signals", "Price")
+    markers = pd.concat([
+        pd.DataFrame({"Date": buys.index, "signal": "Buy", "Close": buys["Close"].to_numpy()}),
+        pd.DataFrame({"Date": sells.index, "signal": "Sell", "Close": sells["Close"].to_numpy()}),
+    ], ignore_index=True)
+    points = alt.Chart(markers).mark_point(filled=True, size=90).encode(
+        x="Date:T",
+        y="Close:Q",
+        shape=alt.Shape("signal:N", scale=alt.Scale(domain=["Buy", "Sell"], range=["triangle-up", "triangle-down"]), title=None),
+        color=alt.Color("signal:N", scale=alt.Scale(domain=["Buy", "Sell"], range=["green", "red"]), title=None),
+        tooltip=[alt.Tooltip("Date:T"), "signal:N", alt.Tooltip("Close:Q", format=",.2f")],
+    )
+    return alt.layer(lines, points).resolve_scale(color="independent", shape="independent").interactive(bind_y=False)
+
+
+def prediction_chart(df: pd.DataFrame, preds, recent=60):
+    """The last ``recent`` closes and the predicted path."""
+    last_date = df.index[-1]
+    pred_index = pd.DatetimeIndex([last_date + pd.Timedelta(days=i + 1) for i in range(len(preds))])
+    data = pd.concat([
+        pd.DataFrame({"Date": df.index[-recent:], "series": "Recent Close", "value": df["Close"].iloc[-recent:].to_numpy()}),
+        pd.DataFrame({"Date": pred_index, "series": "Predicted Close", "value": np.asarray(preds, dtype="float64")}),
+    ], ignore_index=True)
+    return _lines(data, "Recent Close and Predicted Prices", "Price", height=300).mark_line(point=True)
+
+
+def cumulative_returns_chart(all_close: pd.DataFrame, cum_returns: pd.Series, max_points=MAX_POINTS):
+    """Per-ticker and portfolio cumulative returns (min/max bucketing)."""
+    panel = all_close.pct_change().add(1).cumprod() - 1
+    panel["Portfolio"] = cum_returns - 1
+    data = downsample_long(panel.iloc[1:], max_points, method="minmax")
+    return _lines(data, "Cumulative Returns", "Return").encode(
+        strokeDash=alt.condition(alt.datum.series == "Portfolio", alt.value([6, 3]), alt.value([1, 0])),
+        size=alt.condition(alt.datum.series == "Portfolio", alt.value(2.5), alt.value(1.2)),
+    ).interactive(bind_y=False)
+
+
+def portfolio_value_chart(values: pd.DataFrame, investment_amt: float, max_points=MAX_POINTS):
+    """Portfolio value of each rebalancing schedule (one column per schedule)."""
+    data = downsample_long(values, max_points)
+    return _lines(data, f"Simulated Portfolio Value (initial {investment_amt:.0f} INR)", "INR", height=300).interactive(bind_y=False)
+
+
+def rolling_chart(frame: pd.DataFrame, title: str, y_title: str, max_points=MAX_POINTS):
+    """One line per column of a rolling-statistics frame (LTTB)."""
+    data = downsample_long(frame, max_points)
+    return _lines(data, title, y_title, height=300).interactive(bind_y=False)
+
+
+def correlation_heatmap(corr: pd.DataFrame, title: str):
+    """Correlation matrix as a diverging heatmap with the values printed."""
+    data = corr.rename_axis(index="row", columns="column").stack().rename("correlation").reset_index()
+    base = alt.Chart(data, title=title).encode(
+        x=alt.X("column:N", title=None, sort=list(corr.columns)),
+        y=alt.Y("row:N", title=None, sort=list(corr.index)),
+    )
+    cells = base.mark_rect().encode(
+        color=alt.Color("correlation:Q", scale=alt.Scale(scheme="redblue", domain=[-1, 1], reverse=True)),
+        tooltip=["row:N", "column:N", alt.Tooltip("correlation:Q", format=".2f")],
+    )
+    labels = base.mark_text(fontSize=11).encode(text=alt.Text("correlation:Q", format=".2f"))
+    return alt.layer(cells, labels) if len(corr) <= 15 else cells
+
+
+def frontier_chart(frontier: pd.DataFrame, points: pd.DataFrame):
+    """Efficient frontier with labelled (Annual Volatility, Annual Return) points."""
+    curve = alt.Chart(frontier, title="Efficient frontier").mark_line(point=True).encode(
+        x=alt.X("Annual Volatility:Q", axis=alt.Axis(format="%")),
+        y=alt.Y("Annual Return:Q", axis=alt.Axis(format="%"), scale=alt.Scale(zero=False)),
+        tooltip=[alt.Tooltip("Annual Volatility:Q", format=".2%"), alt.Tooltip("Annual Return:Q", format=".2%"),
+                 alt.Tooltip("Sharpe Ratio:Q", format=".3f")],
+    )
+    marks = alt.Chart(points).mark_point(filled=True, size=160).encode(
+        x="Annual Volatility:Q",
+        y="Annual Return:Q",
+        color=alt.Color("portfolio:N", title=None),
+        shape=alt.Shape("portfolio:N", title=None),
+        tooltip=["portfolio:N", alt.Tooltip("Annual Volatility:Q", format=".2%"),
+                 alt.Tooltip("Annual Return:Q", format=".2%")],
+    )
+    return alt.layer(curve, marks)
+
+
+def histogram_chart(values: np.ndarray, title: str, bins=100, marker=None, marker_label=""):
+    """Histogram binned with NumPy (only the bin counts go to the browser)."""
+    counts, edges = np.histogram(values, bins=bins)
+    data = pd.DataFrame({"start": edges[:-1], "end": edges[1:], "count": counts})
+    bars = alt.Chart(data, title=title, height=300).mark_bar(color="steelblue").encode(
+        x=alt.X("start:Q", title=None), x2="end:Q", y=alt.Y("count:Q", title="Paths"),
+        tooltip=[alt.Tooltip("start:Q", format=".2f"), alt.Tooltip("end:Q", format=".2f"), "count:Q"],
+    )
+    if marker is None:
+        return bars
+    rule = alt.Chart(pd.DataFrame({"x": [marker], "label": [marker_label]})).mark_rule(color="red", strokeDash=[6, 3]).encode(
+        x="x:Q", tooltip=["label:N", alt.Tooltip("x:Q", format=".2f")],
+    )
+    return alt.layer(bars, rule)
@@ -0,0 +1,323 @@
+"""
+Batched least-squares lag regression.
+
+Close regressed on its previous ``lags`` closes with an intercept, then
+predicted recursively, fitted for many tickers and many lag counts at once.
+
+Every entry of a ticker's normal equations is a sum of products
+x[t-i] * x[t-j] over a range of rows, which only depends on the lag
+distance j - i and the range. So the lag matrix is never built: for each
+distance one cumulative sum of lagged products is computed and the few rows
+the equations read are gathered from it before the next distance, and
+every lag count of a sweep shares that pass. The normal equations for all
+tickers are then solved in one batched ``np.linalg.solve`` per lag count: a
+portfolio x lags 1..20 sweep is one ``lag_sweep`` call. Tickers are handled
+in chunks of about ``CHUNK_BYTES`` working memory.
+
+``fit_direct`` fits direct multi-horizon models instead: one coefficient
+vector per horizon, each regressing the close h bars ahead on the same lag
+columns. The horizons share the Gram matrix, so they are the right-hand
+sides of a single batched solve, and ``forecast_direct`` produces every
+horizon of every ticker in one product. Walk-forward validation reuses the
+same cumulative sums: a fold's normal equations are the sums up to its
+origin, so all (fold, ticker) refits join the in-sample fits in that solve.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MIN_OBS = 20  # fewer regression rows than this and a ticker gets no model
+CHUNK_BYTES = 64 * 1024 ** 2  # working memory per chunk of tickers
+
+
+def _as_matrix(close):
+    if isinstance(close, pd.Series):
+        close = close.to_frame()
+    if isinstance(close, pd.DataFrame):
+        return close.to_numpy(dtype="float64"), list(close.columns)
+    close = np.asarray(close, dtype="float64")
+    if close.ndim == 1:
+        close = close[:, None]
+    return close, list(range(close.shape[1]))
+
+
+def right_align(values: np.ndarray):
+    """
+    Move each column's valid values to the bottom, keeping their order, so a
+    ticker's series is contiguous and ends on the last row (missing dates
+    are dropped, like building lags on the ticker's own frame). Returns the
+    aligned matrix (padding NaN) and the first valid row per column.
+    """
+    valid = ~np.isnan(values)
+    order = np.argsort(valid, axis=0, kind="stable")
+    aligned = np.take_along_axis(values, order, axis=0)
+    return aligned, len(values) - valid.sum(axis=0)
+
+
+def _ticker_chunk(n_dates: int, systems_per_ticker: int, width: int) -> int:
+    """Tickers per chunk: a few (dates) columns and ``systems_per_ticker`` (width x width) systems each."""
+    per_ticker = 8 * (6 * n_dates + 6 * systems_per_ticker * width * width)
+    return max(1, CHUNK_BYTES // per_ticker)
+
+
+def _prepare(values: np.ndarray):
+    """Right-aligned, demeaned series and their cumulative sums."""
+    aligned, first = right_align(values)
+    # demean each series so the normal equations stay well conditioned
+    shift = np.nanmean(aligned, axis=0)
+    shift = np.where(np.isnan(shift), 0.0, shift)
+    x = np.where(np.isnan(aligned), 0.0, aligned - shift)
+    S = np.zeros((len(x) + 1, x.shape[1]))
+    np.cumsum(x, axis=0, out=S[1:])
+    return aligned, first, shift, x, S
+
+
+def _normal_equations(x, S, start, end, cols, width):
+    """
+    Centered cross products of the variables x[t - j], j = 0..width-1, over
+    rows start <= t < end of series ``cols`` (all (M,) arrays, so one series
+    can appear several times with different row ranges). Returns
+    (centered (M, width, width), mean (M, width), n_obs, ok).
+    """
+    start = np.minimum(start, end)
+    n_obs = end - start
+    ok = n_obs >= MIN_OBS
+    j = np.arange(width)
+    sums = S[end[None, :] - j[:, None], cols] - S[start[None, :] - j[:, None], cols]  # (width, M)
+
+    # entry (hi - d, hi) sums x[s] * x[s + d] over s in [start - hi, end - hi):
+    # a difference of one cumulative sum per lag distance d, kept only as
+    # long as its rows are gathered
+    T = len(x)
+    gram = np.empty((len(cols), width, width))
+    products = np.zeros((T + 1, x.shape[1]))
+    for d in range(width):
+        np.cumsum(x[:T - d] * x[d:], axis=0, out=products[1:T - d + 1])
+        hi = j[d:]
+        upper = np.clip(end[:, None] - hi, 0, T - d)
+        lower = np.clip(start[:, None] - hi, 0, T - d)
+        block = products[upper, cols[:, None]] - products[lower, cols[:, None]]     # (M, width - d)
+        gram[:, hi - d, hi] = block
+        gram[:, hi, hi - d] = block
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(ok, sums / n_obs, 0.0).T                                   # (M, width)
+    gram -= n_obs[:, None, None] * mean[:, :, None] * mean[:, None, :]
+    return gram, mean, n_obs, ok
+
+
+def _solve(sxx: np.ndarray, sxy: np.ndarray, ok: np.ndarray) -> np.ndarray:
+    """Batched least-squares coefficients for (M, k, k) x (M, k, r) normal equations."""
+    # keep the batch solvable; these rows are reported as NaN by the callers
+    sxx[~ok] = np.eye(sxx.shape[-1])
+    sxy[~ok] = 0.0
+    try:
+        return np.linalg.solve(sxx, sxy)
+    except np.linalg.LinAlgError:
+        # a degenerate ticker (e.g. constant price) makes the batch singular
+        return np.linalg.pinv(sxx) @ sxy
+
+
+def _recent(aligned: np.ndarray, lags: int) -> np.ndarray:
+    """(tickers x lags) most recent closes, lag_1 first."""
+    T, N = aligned.shape
+    return aligned[T - lags:][::-1].T if lags <= T else np.full((N, lags), np.nan)
+
+
+def _fit_chunk(values: np.ndarray, lag_list):
+    aligned, first, shift, x, S = _prepare(values)
+    T, N = x.shape
+    # one system per (lag count, ticker) at the largest width; rows t in
+    # [first + lags, T) have a full window and column j holds x[t - j], so a
+    # smaller lag count's equations are the leading block of its system
+    lag_counts = np.repeat(lag_list, N)
+    cols = np.tile(np.arange(N), len(lag_list))
+    centered_all, mean_all, n_obs_all, ok_all = _normal_equations(
+        x, S, first[cols] + lag_counts, np.full(len(cols), T), cols, max(lag_list) + 1)
+
+    models = {}
+    for i, lags in enumerate(lag_list):
+        rows = slice(i * N, (i + 1) * N)
+        centered = centered_all[rows, :lags + 1, :lags + 1]
+        mean, n_obs, ok = mean_all[rows, :lags + 1], n_obs_all[rows], ok_all[rows]
+        sxx, sxy, syy = centered[:, 1:, 1:].copy(), centered[:, 1:, :1].copy(), centered[:, 0, 0]
+        coef = _solve(sxx, sxy, ok)[..., 0]
+        sse = np.maximum(syy - np.einsum("ni,ni->n", coef, sxy[..., 0]), 0.0)
+        intercept_c = mean[:, 0] - np.einsum("ni,ni->n", mean[:, 1:], coef)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rmse = np.sqrt(sse / n_obs)
+
+        # undo the demeaning: y = a + b.x  with  a = a_c + shift * (1 - sum(b))
+        intercept = intercept_c + shift * (1.0 - coef.sum(axis=1))
+        coef[~ok], intercept[~ok], rmse[~ok] = np.nan, np.nan, np.nan
+        # the first forecast step starts from the most recent closes
+        models[lags] = {"coef": coef, "intercept": intercept, "rmse": rmse,
+                        "n_obs": n_obs, "last": _recent(aligned, lags)}
+    return models
+
+
+def fit_lag_sweep(close, lag_list) -> dict:
+    """
+    Fit one lag regression per (ticker, lag count).
+
+    Returns {lags: model} where each model has ``coef`` (tickers x lags,
+    lag_1 first), ``intercept``, in-sample ``rmse``, ``n_obs`` and ``last``
+    (the most recent ``lags`` closes). Tickers with fewer than ``MIN_OBS``
+    complete rows get NaN coefficients.
+    """
+    values, _ = _as_matrix(close)
+    lag_list = sorted(set(int(l) for l in lag_list))
+    chunk = _ticker_chunk(len(values), len(lag_list), max(lag_list) + 1)
+    parts = [_fit_chunk(values[:, i:i + chunk], lag_list) for i in range(0, values.shape[1], chunk)]
+    return {lags: {key: np.concatenate([p[lags][key] for p in parts]) for key in parts[0][lags]}
+            for lags in lag_list}
+
+
+def fit_lag_models(close, lags=5) -> dict:
+    """One lag regression per ticker for a single lag count."""
+    return fit_lag_sweep(close, [lags])[int(lags)]
+
+
+def forecast_lag_models(model: dict, predict_days=5) -> np.ndarray:
+    """
+    Recursive forecasts (tickers x predict_days). The first step uses the
+    ``lags`` most recent closes, so it predicts the next bar.
+    """
+    coef, intercept, current = model["coef"], model["intercept"], model["last"]
+    preds = np.empty((coef.shape[0], predict_days))
+    for i in range(predict_days):
+        p = np.einsum("ni,ni->n", current, coef) + intercept
+        preds[:, i] = p
+        current = np.concatenate([p[:, None], current[:, :-1]], axis=1)
+    return preds
+
+
+def lag_sweep(close, lag_range=range(1, 21), predict_days=5) -> pd.DataFrame:
+    """
+    Fit and forecast every (ticker, lags) combination.
+
+    Returns a DataFrame indexed by (ticker, lags) with rmse, n_obs and the
+    forecast path in columns ``pred_1`` .. ``pred_<predict_days>``.
+    """
+    _, tickers = _as_matrix(close)
+    frames = []
+    for lags, model in fit_lag_sweep(close, lag_range).items():
+        frame = pd.DataFrame(forecast_lag_models(model, predict_days), index=tickers,
+                             columns=[f"pred_{i + 1}" for i in range(predict_days)])
+        frame.insert(0, "n_obs", model["n_obs"])
+        frame.insert(0, "rmse", model["rmse"])
+        frame["lags"] = lags
+        frames.append(frame)
+    out = pd.concat(frames)
+    out.index.name = "ticker"
+    return out.set_index("lags", append=True).sort_index()
+
+
+# ---------------------------
+# Direct multi-horizon models
+# ---------------------------
+
+def _fit_direct_equations(x, S, shift, start, end, cols, lags, horizons):
+    """
+    Direct models for rows start <= u < end, where u is the bar of the
+    horizon-``horizons`` target: x[u - j] is the horizon ``horizons - j``
+    target for j < horizons and lag ``j - horizons + 1`` after that. Every
+    horizon regresses on the same lag columns, so they share one Gram matrix
+    and are solved together as right-hand sides of one batched solve.
+    """
+    H = horizons
+    centered, mean, n_obs, ok = _normal_equations(x, S, start, end, cols, H + lags)
+    sxx, sxy = centered[:, H:, H:], centered[:, H:, H - 1::-1]                # (M, lags, H), horizon 1 first
+    syy = np.diagonal(centered, axis1=1, axis2=2)[:, H - 1::-1]
+    coef = _solve(sxx, sxy, ok)                                                # (M, lags, H)
+    sse = np.maximum(syy - np.einsum("mlh,mlh->mh", coef, sxy), 0.0)
+    intercept_c = mean[:, H - 1::-1] - np.einsum("ml,mlh->mh", mean[:, H:], coef)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.sqrt(sse / n_obs[:, None])
+    coef = np.ascontiguousarray(coef.transpose(0, 2, 1))                       # (M, H, lags)
+    intercept = intercept_c + shift[cols, None] * (1.0 - coef.sum(axis=2))
+    coef[~ok], intercept[~ok], rmse[~ok] = np.nan, np.nan, np.nan
+    return coef, intercept, rmse, n_obs
+
+
+def _fit_direct_chunk(values: np.ndarray, lags: int, horizons: int, folds: int, step: int) -> dict:
+    aligned, first, shift, x, S = _prepare(values)
+    T, N = x.shape
+    cols = np.arange(N)
+    start = first + lags + horizons - 1
+
+    # walk-forward: refit on the rows whose targets all precede each origin,
+    # predict the next ``horizons`` bars from there; every (origin, ticker)
+    # pair is one more item of the in-sample fit's batched solve
+    origins = T - horizons - step * np.arange(folds)[::-1]
+    origins = origins[origins >= lags]
+    o, c = np.repeat(origins, N), np.tile(cols, len(origins))
+    coef, intercept, rmse, n_obs = _fit_direct_equations(
+        x, S, shift, np.concatenate([start, start[c]]), np.concatenate([np.full(N, T), o]),
+        np.concatenate([cols, c]), lags, horizons)
+    f_coef, f_intercept = coef[N:], intercept[N:]
+    model = {"coef": coef[:N], "intercept": intercept[:N], "rmse": rmse[:N], "n_obs": n_obs[:N],
+             "last": _recent(aligned, lags)}
+    window = aligned[o[:, None] - 1 - np.arange(lags), c[:, None]]             # (M, lags), lag_1 first
+    actual = aligned[o[:, None] + np.arange(horizons), c[:, None]]             # (M, H)
+    direct = np.einsum("mhl,ml->mh", f_coef, window) + f_intercept
+    # the horizon-1 model iterated forward is the recursive forecast
+    recursive = forecast_lag_models({"coef": f_coef[:, 0], "intercept": f_intercept[:, 0], "last": window},
+                                    horizons)
+    shape = (len(origins), N, horizons)
+    for key, pred in (("wf_rmse", direct), ("wf_rmse_recursive", recursive)):
+        err = (pred - actual).reshape(shape)
+        with np.errstate(invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # tickers without a usable fold
+            model[key] = np.sqrt(np.nanmean(err * err, axis=0))
+    model["wf_folds"] = (~np.isnan(direct[:, 0])).reshape(shape[:2]).sum(axis=0)
+    return model
+
+
+def fit_direct(close, lags=5, horizons=5, folds=20, step=None) -> dict:
+    """
+    Fit one direct regression per (ticker, horizon): the close ``h`` bars
+    ahead regressed on the ``lags`` most recent closes, so no horizon feeds
+    on the forecasts of another.
+
+    Returns ``coef`` (tickers x horizons x lags, lag_1 first),
+    ``intercept`` and in-sample ``rmse`` (tickers x horizons), ``n_obs``,
+    ``last`` and the walk-forward validation: ``wf_rmse`` of the direct
+    models and ``wf_rmse_recursive`` of the horizon-1 model iterated
+    forward, over ``folds`` origins ``step`` bars apart (default
+    ``horizons``, so the validation windows do not overlap) ending at the
+    last origin whose targets are all known. Each fold only sees rows whose
+    targets precede its origin; ``wf_folds`` counts the folds scored.
+    """
+    values, _ = _as_matrix(close)
+    lags, horizons = int(lags), int(horizons)
+    step = horizons if step is None else int(step)
+    chunk = _ticker_chunk(len(values), folds + 1, lags + horizons)
+    parts = [_fit_direct_chunk(values[:, i:i + chunk], lags, horizons, folds, step)
+             for i in range(0, values.shape[1], chunk)]
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def forecast_direct(model: dict) -> np.ndarray:
+    """(tickers x horizons) forecasts: every horizon of every ticker in one product."""
+    return np.einsum("nhl,nl->nh", model["coef"], model["last"]) + model["intercept"]
+
+
+def direct_forecast(close, lags=5, predict_days=5, folds=20, step=None) -> pd.DataFrame:
+    """
+    Fit and forecast the direct models of every ticker.
+
+    Returns a DataFrame indexed by (ticker, horizon) with the forecast
+    ``pred``, in-sample ``rmse``, walk-forward ``wf_rmse`` and
+    ``wf_rmse_recursive``, and the number of folds scored.
+    """
+    _, tickers = _as_matrix(close)
+    model = fit_direct(close, lags, predict_days, folds, step)
+    index = pd.MultiIndex.from_product([tickers, range(1, predict_days + 1)], names=["ticker", "horizon"])
+    return pd.DataFrame({
+        "pred": forecast_direct(model).ravel(),
+        "rmse": model["rmse"].ravel(),
+        "wf_rmse": model["wf_rmse"].ravel(),
+        "wf_rmse_recursive": model["wf_rmse_recursive"].ravel(),
+        "wf_folds": np.repeat(model["wf_folds"], predict_days),
+    }, index=index)
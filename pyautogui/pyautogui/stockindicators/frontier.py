@@ -0,0 +1,202 @@
+"""
+Mean-variance portfolio optimizer: efficient frontier, minimum-variance and
+maximum-Sharpe weights.
+
+Annualised mean returns and covariance are estimated once from the daily
+returns, with the same conventions as ``compute_portfolio_metrics``
+(``pct_change``, 252 trading days, Sharpe ratio without a risk-free rate).
+Every frontier point solves
+
+    minimize  w' C w - lam * mu' w   subject to  sum(w) = 1,  lower <= w <= upper
+
+for its own risk tolerance ``lam``. All points are solved together with
+accelerated projected gradient: one iteration is a single
+(points x assets) @ (assets x assets) product plus a projection onto the
+bounded simplex, and points drop out of the batch as they converge, so a
+frontier over several hundred assets takes a fraction of a second.
+"""
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+TOL = 1e-6  # largest weight change per iteration at convergence
+MAX_ITER = 20_000
+
+
+def annualized_moments(price_df: pd.DataFrame, trading_days=TRADING_DAYS):
+    """Annualised mean daily return (Series) and covariance (DataFrame)."""
+    daily_returns = price_df.pct_change().dropna()
+    return daily_returns.mean() * trading_days, daily_returns.cov() * trading_days
+
+
+def weight_bounds(n_assets: int, long_only=True, lower=None, upper=None):
+    """
+    Per-asset (lower, upper) arrays. Scalars are broadcast; the defaults are
+    [0, 1] when long-only and [-1, 1] otherwise.
+    """
+    if lower is None:
+        lower = 0.0 if long_only else -1.0
+    if upper is None:
+        upper = 1.0
+    lower = np.broadcast_to(np.asarray(lower, dtype="float64"), (n_assets,)).copy()
+    upper = np.broadcast_to(np.asarray(upper, dtype="float64"), (n_assets,)).copy()
+    if long_only:
+        lower = np.maximum(lower, 0.0)
+    if np.any(lower > upper) or lower.sum() > 1.0 + 1e-12 or upper.sum() < 1.0 - 1e-12:
+        raise ValueError("weight bounds leave no portfolio that sums to 1")
+    return lower, upper
+
+
+# ---------------------------
+# Solver
+# ---------------------------
+
+def _sort_project(V: np.ndarray, lower, upper):
+    """Exact projection via the sorted breakpoints of sum(clip(v - tau))."""
+    K, N = V.shape
+    points = np.concatenate([V - upper, V - lower], axis=1)
+    steps = np.concatenate([np.ones((K, N)), -np.ones((K, N))], axis=1)
+    order = np.argsort(points, axis=1)
+    points = np.take_along_axis(points, order, axis=1)
+    # number of unclipped weights between consecutive breakpoints
+    free = np.cumsum(np.take_along_axis(steps, order, axis=1), axis=1)
+    total = np.empty_like(points)
+    total[:, 0] = upper.sum()
+    total[:, 1:] = upper.sum() - np.cumsum(free[:, :-1] * np.diff(points, axis=1), axis=1)
+    j = np.maximum(np.argmax(total <= 1.0, axis=1), 1)
+    rows = np.arange(K)
+    t0, t1 = total[rows, j - 1], total[rows, j]
+    p0, p1 = points[rows, j - 1], points[rows, j]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tau = np.where(t0 > t1, p0 + (t0 - 1.0) * (p1 - p0) / (t0 - t1), p0)
+    return np.clip(V - tau[:, None], lower, upper), tau
+
+
+def project_bounded_simplex(V: np.ndarray, lower, upper, tau=None, newton_steps=8):
+    """
+    Project each row of V onto {w : sum(w) = 1, lower <= w <= upper}.
+
+    The projection is clip(v - tau, lower, upper) for the tau that makes the
+    row sum to 1. Starting from the previous iteration's ``tau`` a few
+    Newton steps usually find it exactly; rows that do not settle fall back
+    to the sort-based solution. Returns (W, tau).
+    """
+    tau = np.zeros(len(V)) if tau is None else tau
+    for _ in range(newton_steps):
+        shifted = V - tau[:, None]
+        W = np.clip(shifted, lower, upper)
+        excess = W.sum(axis=1) - 1.0
+        done = np.abs(excess) < 1e-12
+        if done.all():
+            return W, tau
+        free = ((shifted > lower) & (shifted < upper)).sum(axis=1)
+        tau = tau + np.where(free > 0, excess / np.maximum(free, 1), 0.0)
+    stuck = ~done
+    W[stuck], tau[stuck] = _sort_project(V[stuck], lower, upper)
+    return W, tau
+
+
+def solve_batch(mu: np.ndarray, cov: np.ndarray, lams: np.ndarray, lower, upper,
+                tol=TOL, max_iter=MAX_ITER) -> np.ndarray:
+    """Weights (len(lams) x assets) minimising w'Cw - lam * mu'w for every lam."""
+    lams = np.asarray(lams, dtype="float64")
+    K, N = len(lams), len(mu)
+    step = 0.5 / max(np.linalg.eigvalsh(cov)[-1], 1e-300)
+    W, tau = project_bounded_simplex(np.full((K, N), 1.0 / N), lower, upper)
+    out = W.copy()
+    active = np.arange(K)
+    Y, t = W.copy(), np.ones(K)
+    for _ in range(max_iter):
+        gradient = 2.0 * (Y @ cov) - lams[active, None] * mu
+        W_new, tau = project_bounded_simplex(Y - step * gradient, lower, upper, tau)
+        # FISTA momentum, restarted per row when it points uphill
+        restart = np.einsum("ki,ki->k", Y - W_new, W_new - W) > 0
+        t_new = (1.0 + np.sqrt(1.0 + 4.0 * t * t)) / 2.0
+        momentum = np.where(restart, 0.0, (t - 1.0) / t_new)
+        t = np.where(restart, 1.0, t_new)
+        Y = W_new + momentum[:, None] * (W_new - W)
+        converged = np.abs(W_new - W).max(axis=1) < tol
+        W = W_new
+        if converged.any():
+            out[active[converged]] = W[converged]
+            keep = ~converged
+            active, W, Y, t, tau = active[keep], W[keep], Y[keep], t[keep], tau[keep]
+            if not len(active):
+                break
+    out[active] = W
+    return out
+
+
+# ---------------------------
+# Frontier
+# ---------------------------
+
+def _lam_grid(mu, cov, n_points):
+    # lam converts return into variance; scale the grid by their typical ratio
+    scale = np.trace(cov) / len(mu) / max(np.abs(mu).mean(), 1e-12)
+    return np.concatenate([[0.0], scale * np.geomspace(1e-3, 1e3, max(n_points - 1, 1))])
+
+
+def _describe(W, mu, cov):
+    ret = W @ mu
+    vol = np.sqrt(np.maximum(np.einsum("ki,ij,kj->k", W, cov, W), 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(vol > 0, ret / vol, -np.inf)
+    return ret, vol, sharpe
+
+
+def _frontier_frame(W, mu: pd.Series, cov_v) -> pd.DataFrame:
+    ret, vol, sharpe = _describe(W, mu.to_numpy(dtype="float64"), cov_v)
+    frame = pd.DataFrame(W, columns=mu.index)
+    frame.insert(0, "Sharpe Ratio", np.where(np.isinf(sharpe), np.nan, sharpe))
+    frame.insert(0, "Annual Volatility", vol)
+    frame.insert(0, "Annual Return", ret)
+    # points past the all-in-on-the-best-asset corner coincide
+    frame = frame[~frame[["Annual Return", "Annual Volatility"]].round(6).duplicated()]
+    return frame.sort_values("Annual Volatility").reset_index(drop=True)
+
+
+def _max_sharpe(mu_v, cov_v, lams, W, lower, upper, refine=32):
+    # the best frontier point, refined with a second batch between its
+    # neighbours; searching along the frontier works with any bounds
+    _, _, sharpe = _describe(W, mu_v, cov_v)
+    best = int(np.argmax(sharpe))
+    fine = np.linspace(lams[max(best - 1, 0)], lams[min(best + 1, len(lams) - 1)], refine)
+    W_fine = solve_batch(mu_v, cov_v, fine, lower, upper)
+    _, _, sharpe_fine = _describe(W_fine, mu_v, cov_v)
+    return W_fine[int(np.argmax(sharpe_fine))] if sharpe_fine.max() > sharpe[best] else W[best]
+
+
+def efficient_frontier(mu: pd.Series, cov: pd.DataFrame, n_points=50, long_only=True,
+                       lower=None, upper=None) -> pd.DataFrame:
+    """
+    Up to ``n_points`` efficient portfolios from minimum variance to maximum
+    return, sorted by volatility. Columns are Annual Return, Annual
+    Volatility, Sharpe Ratio and one weight column per ticker.
+    """
+    mu_v, cov_v = mu.to_numpy(dtype="float64"), cov.to_numpy(dtype="float64")
+    lower, upper = weight_bounds(len(mu_v), long_only, lower, upper)
+    W = solve_batch(mu_v, cov_v, _lam_grid(mu_v, cov_v, n_points), lower, upper)
+    return _frontier_frame(W, mu, cov_v)
+
+
+def optimize_portfolio(price_df: pd.DataFrame, n_points=50, long_only=True, lower=None, upper=None,
+                       trading_days=TRADING_DAYS) -> dict:
+    """
+    Efficient frontier plus minimum-variance and maximum-Sharpe weights for
+    the columns of ``price_df``, from one covariance estimate and one
+    batched frontier solve.
+
+    Returns {"frontier": DataFrame, "min_variance": Series,
+    "max_sharpe": Series}; the weight Series are indexed by ticker.
+    """
+    mu, cov = annualized_moments(price_df, trading_days)
+    mu_v, cov_v = mu.to_numpy(dtype="float64"), cov.to_numpy(dtype="float64")
+    lower, upper = weight_bounds(len(mu_v), long_only, lower, upper)
+    lams = _lam_grid(mu_v, cov_v, n_points)
+    W = solve_batch(mu_v, cov_v, lams, lower, upper)
+    return {
+        "frontier": _frontier_frame(W, mu, cov_v),
+        "min_variance": pd.Series(W[0], index=mu.index),  # lam = 0
+        "max_sharpe": pd.Series(_max_sharpe(mu_v, cov_v, lams, W, lower, upper), index=mu.index),
+    }
@@ -0,0 +1,337 @@
+"""
+Vectorized multi-ticker indicator engine.
+
+Works on a wide (dates x tickers) close matrix and computes the SMA
+crossover indicators of ``add_technical_indicators`` for every ticker in one
+NumPy pass, using cumulative sums for the rolling windows over each ticker's
+own trading days. SMA columns are
+memoized per (ticker, window), so the single-stock and portfolio sections of
+the app share the same results instead of recomputing them.
+
+``compute_indicators`` adds EMA, RSI, MACD, ATR, Bollinger Bands, VWAP and
+OBV in one pass over OHLCV arrays, following the conventions documented in
+``streaming.py``.
+"""
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+
+# ---------------------------
+# Array kernels
+# ---------------------------
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over ``window`` rows of a 2-D array, ignoring NaNs, with
+    the same result as ``rolling(window, min_periods=1).mean()`` per column.
+    """
+    valid = ~np.isnan(values)
+    # subtract a per-column offset first to keep the running sums small
+    offset = values[np.argmax(valid, axis=0), np.arange(values.shape[1])]
+    offset = np.where(np.isnan(offset), 0.0, offset)
+    csum = np.cumsum(np.where(valid, values - offset, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0, dtype=np.int64)
+    if window < len(values):
+        csum[window:] -= csum[:-window].copy()
+        ccount[window:] -= ccount[:-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(ccount > 0, csum / ccount + offset, np.nan)
+
+
+def rolling_mean_valid(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    ``rolling_mean`` over each column's own valid rows: a window spans the
+    last ``window`` prices of the ticker, skipping dates it has no price on,
+    exactly like ``rolling(window, min_periods=1)`` on the ticker's own
+    series. Rows without a price are NaN. Columns with interior gaps are
+    right-aligned first (as in ``forecast.right_align``), averaged, and
+    scattered back to their dates.
+    """
+    valid = ~np.isnan(values)
+    listed = np.maximum.accumulate(valid, axis=0)
+    still_listed = np.maximum.accumulate(valid[::-1], axis=0)[::-1]
+    gapped = np.flatnonzero((listed & still_listed & ~valid).any(axis=0))
+    out = rolling_mean(values, window)
+    if len(gapped):
+        sub = values[:, gapped]
+        order = np.argsort(~np.isnan(sub), axis=0, kind="stable")
+        aligned = rolling_mean(np.take_along_axis(sub, order, axis=0), window)
+        np.put_along_axis(sub, order, aligned, axis=0)
+        out[:, gapped] = sub
+    out[~valid] = np.nan
+    return out
+
+
+def ffill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column of a 2-D array."""
+    rows = np.where(~np.isnan(values), np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def crossover_signals(sma_short: np.ndarray, sma_long: np.ndarray, valid: np.ndarray):
+    """
+    Signal (+1 short above long, -1 below, 0 equal) and Crossover (its change
+    since the previous valid bar of the same ticker, so +2 is a buy and -2 a
+    sell, as in ``generate_trade_points``). Rows where a ticker has no price
+    get Signal 0 and Crossover 0.
+    """
+    signal = np.sign(sma_short - sma_long)
+    signal[~valid] = np.nan
+    filled = ffill(signal)
+    crossover = np.zeros_like(filled)
+    crossover[1:] = filled[1:] - filled[:-1]
+    crossover[np.isnan(crossover) | ~valid] = 0.0
+    return np.nan_to_num(signal).astype(np.int64), crossover
+
+
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    ``ewm(alpha=alpha, adjust=False).mean()`` down each column of a 2-D
+    array without NaNs, seeded with the first row. Runs as one IIR filter
+    call over all columns.
+    """
+    zi = (1.0 - alpha) * values[:1]
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], values, axis=0, zi=zi)
+    return out
+
+
+def _hold_first(values: np.ndarray, first_row: np.ndarray) -> np.ndarray:
+    """
+    Repeat each column's value at ``first_row`` over the rows before it, so
+    a recursive average over the column starts from that value.
+    """
+    rows = np.maximum(np.arange(len(values))[:, None], first_row[None, :])
+    return np.take_along_axis(values, np.minimum(rows, len(values) - 1), axis=0)
+
+
+# ---------------------------
+# Extended indicators
+# ---------------------------
+
+INDICATORS = ("EMA", "RSI", "MACD", "ATR", "BB", "VWAP", "OBV")
+INDICATOR_COLUMNS = {
+    "EMA": ["EMA"],
+    "RSI": ["RSI"],
+    "MACD": ["MACD", "MACD_Signal", "MACD_Hist"],
+    "ATR": ["ATR"],
+    "BB": ["BB_Mid", "BB_Upper", "BB_Lower"],
+    "VWAP": ["VWAP"],
+    "OBV": ["OBV"],
+}
+
+
+def compute_indicators(close, high=None, low=None, volume=None, indicators=INDICATORS,
+                       ema_span=20, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9,
+                       atr_period=14, bb_window=20, bb_k=2.0) -> dict:
+    """
+    Selected indicators for 1-D (dates) or 2-D (dates x tickers) arrays.
+
+    Shared intermediates (close diff, true range, fill masks) are computed
+    once, every output is written into one preallocated block, and the
+    recursive averages with the same smoothing factor (RSI gains/losses and
+    ATR by default) run as a single filter call. ATR needs high/low, VWAP
+    needs high/low/volume and OBV needs volume.
+
+    Leading NaNs (tickers listed later) stay NaN in the output; interior
+    gaps are forward-filled, i.e. treated as an unchanged bar with no volume.
+    """
+    indicators = [name for name in INDICATORS if name in set(indicators)]
+    close = np.asarray(close, dtype="float64")
+    squeeze = close.ndim == 1
+    as_2d = (lambda a: None if a is None else np.asarray(a, dtype="float64").reshape(len(close), -1))
+    close, high, low, volume = as_2d(close), as_2d(high), as_2d(low), as_2d(volume)
+    if "ATR" in indicators and (high is None or low is None):
+        raise ValueError("ATR needs high and low prices")
+    if "VWAP" in indicators and (high is None or low is None or volume is None):
+        raise ValueError("VWAP needs high, low and volume")
+    if "OBV" in indicators and volume is None:
+        raise ValueError("OBV needs volume")
+
+    names = [col for name in indicators for col in INDICATOR_COLUMNS[name]]
+    block = np.empty((len(names),) + close.shape)
+    out = {name: block[i] for i, name in enumerate(names)}
+
+    # one fill pass: leading gaps take the first price, interior gaps the last
+    listed = np.maximum.accumulate(~np.isnan(close), axis=0)
+    first_row = np.argmax(listed, axis=0)
+    close = ffill(close)
+    first = close[first_row, np.arange(close.shape[1])]
+    close = np.where(listed, close, first)
+    if high is not None:
+        high = np.where(np.isnan(high), close, high)
+        low = np.where(np.isnan(low), close, low)
+    if volume is not None:
+        volume = np.where(listed & ~np.isnan(volume), volume, 0.0)
+
+    diff = np.zeros_like(close)
+    diff[1:] = close[1:] - close[:-1]
+
+    # recursive averages grouped by smoothing factor -> one filter call each
+    streams = {}
+    if "EMA" in indicators:
+        streams.setdefault(2.0 / (ema_span + 1.0), []).append(("EMA", close))
+    if "MACD" in indicators:
+        streams.setdefault(2.0 / (macd_fast + 1.0), []).append(("fast", close))
+        streams.setdefault(2.0 / (macd_slow + 1.0), []).append(("slow", close))
+    if "RSI" in indicators:
+        # Wilder averages start at the second bar, like ewm on close.diff()
+        streams.setdefault(1.0 / rsi_period, []).append(("gain", _hold_first(np.maximum(diff[1:], 0.0), first_row)))
+        streams.setdefault(1.0 / rsi_period, []).append(("loss", _hold_first(np.maximum(-diff[1:], 0.0), first_row)))
+    if "ATR" in indicators:
+        prev_close = np.vstack([close[:1], close[:-1]])
+        true_range = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+        true_range[0] = high[0] - low[0]
+        streams.setdefault(1.0 / atr_period, []).append(("ATR", _hold_first(true_range, first_row)))
+
+    smoothed = {}
+    for alpha, items in streams.items():
+        # inputs of different lengths (RSI starts one bar later) are filtered separately
+        by_length = {}
+        for key, values in items:
+            by_length.setdefault(len(values), []).append((key, values))
+        for group in by_length.values():
+            result = ewm(np.hstack([v for _, v in group]), alpha)
+            width = close.shape[1]
+            for j, (key, _) in enumerate(group):
+                smoothed[key] = result[:, j * width:(j + 1) * width]
+
+    if "EMA" in indicators:
+        out["EMA"][:] = smoothed["EMA"]
+    if "MACD" in indicators:
+        np.subtract(smoothed["fast"], smoothed["slow"], out=out["MACD"])
+        out["MACD_Signal"][:] = ewm(out["MACD"], 2.0 / (macd_signal + 1.0))
+        np.subtract(out["MACD"], out["MACD_Signal"], out=out["MACD_Hist"])
+    if "RSI" in indicators:
+        gain, loss = smoothed["gain"], smoothed["loss"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+        rsi = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), rsi)
+        out["RSI"][0] = np.nan
+        out["RSI"][1:] = rsi
+    if "ATR" in indicators:
+        out["ATR"][:] = smoothed["ATR"]
+    if "BB" in indicators:
+        centered = np.where(listed, close - first, np.nan)
+        mid = rolling_mean(centered, bb_window)
+        var = rolling_mean(centered * centered, bb_window) - mid * mid
+        mid += first
+        width = bb_k * np.sqrt(np.maximum(var, 0.0))
+        out["BB_Mid"][:] = mid
+        np.add(mid, width, out=out["BB_Upper"])
+        np.subtract(mid, width, out=out["BB_Lower"])
+    if "VWAP" in indicators:
+        typical = (high + low + close) / 3.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(np.cumsum(typical * volume, axis=0), np.cumsum(volume, axis=0), out=out["VWAP"])
+    if "OBV" in indicators:
+        np.cumsum(np.sign(diff) * volume, axis=0, out=out["OBV"])
+
+    # before listing there is nothing to report
+    block[:, ~listed] = np.nan
+    if squeeze:
+        return {name: values[:, 0] for name, values in out.items()}
+    return out
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+
+def close_matrix(data_map: dict) -> pd.DataFrame:
+    """Outer-join the Close column of every frame in ``data_map``."""
+    series_list = []
+    for t, df in data_map.items():
+        s = df["Close"]
+        if isinstance(s, pd.DataFrame):
+            s = s.iloc[:, 0]
+        series_list.append(s.rename(t))
+    return pd.concat(series_list, axis=1, join="outer", sort=True).astype("float64")
+
+
+class IndicatorEngine:
+    """
+    SMA crossover indicators for all tickers of a close matrix.
+
+    Tickers only need prices on their own trading days: windows count a
+    ticker's own bars and skip dates it has no price on, so every column
+    matches ``add_technical_indicators`` on that ticker's frame exactly, and
+    SMA values are NaN on dates without a price.
+    """
+
+    def __init__(self, close: pd.DataFrame):
+        self.close = close
+        self._values = close.to_numpy(dtype="float64")
+        self._valid = ~np.isnan(self._values)
+        self._columns = {t: i for i, t in enumerate(close.columns)}
+        self._sma = {}  # (ticker, window) -> 1-D array
+
+    @classmethod
+    def from_data_map(cls, data_map: dict):
+        return cls(close_matrix(data_map))
+
+    def _tickers(self, tickers):
+        return list(self.close.columns) if tickers is None else list(tickers)
+
+    def sma_values(self, window: int, tickers=None) -> np.ndarray:
+        """(dates x tickers) SMA array, computing only columns not cached yet."""
+        window = int(window)
+        tickers = self._tickers(tickers)
+        todo = [t for t in tickers if (t, window) not in self._sma]
+        if todo:
+            cols = [self._columns[t] for t in todo]
+            result = rolling_mean_valid(self._values[:, cols], window)
+            for j, t in enumerate(todo):
+                self._sma[(t, window)] = result[:, j]
+        return np.column_stack([self._sma[(t, window)] for t in tickers])
+
+    def sma(self, window: int, tickers=None) -> pd.DataFrame:
+        tickers = self._tickers(tickers)
+        return pd.DataFrame(self.sma_values(window, tickers), index=self.close.index, columns=tickers)
+
+    def signals(self, sma_short=20, sma_long=50, tickers=None):
+        """(Signal, Crossover) DataFrames for the given tickers."""
+        tickers = self._tickers(tickers)
+        valid = self._valid[:, [self._columns[t] for t in tickers]]
+        signal, crossover = crossover_signals(
+            self.sma_values(sma_short, tickers), self.sma_values(sma_long, tickers), valid
+        )
+        return (
+            pd.DataFrame(signal, index=self.close.index, columns=tickers),
+            pd.DataFrame(crossover, index=self.close.index, columns=tickers),
+        )
+
+    def latest_signals(self, sma_short=20, sma_long=50, tickers=None) -> pd.Series:
+        """Signal on each ticker's last available bar."""
+        tickers = self._tickers(tickers)
+        signal, _ = self.signals(sma_short, sma_long, tickers)
+        cols = [self._columns[t] for t in tickers]
+        valid = self._valid[:, cols]
+        last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+        return pd.Series(signal.to_numpy()[last, np.arange(len(tickers))], index=tickers)
+
+    def frame(self, df: pd.DataFrame, ticker: str, sma_short=20, sma_long=50) -> pd.DataFrame:
+        """``df`` with the columns ``add_technical_indicators`` would add."""
+        signal, crossover = self.signals(sma_short, sma_long, [ticker])
+        out = df.copy()
+        out[f"SMA_{sma_short}"] = self.sma(sma_short, [ticker])[ticker].reindex(out.index)
+        out[f"SMA_{sma_long}"] = self.sma(sma_long, [ticker])[ticker].reindex(out.index)
+        out["Signal"] = signal[ticker].reindex(out.index).fillna(0).astype(np.int64)
+        out["Crossover"] = crossover[ticker].reindex(out.index).fillna(0.0)
+        return out
+
+
+def add_technical_indicators(df: pd.DataFrame, sma_short=20, sma_long=50) -> pd.DataFrame:
+    """
+    ``df`` with SMA_<short>, SMA_<long>, Signal and Crossover columns of its
+    own Close, for a single ticker's frame without building an engine.
+    """
+    close = df["Close"]
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    values = close.to_numpy(dtype="float64")[:, None]
+    short, long = rolling_mean_valid(values, sma_short), rolling_mean_valid(values, sma_long)
+    signal, crossover = crossover_signals(short, long, ~np.isnan(values))
+    return df.assign(**{f"SMA_{sma_short}": short[:, 0], f"SMA_{sma_long}": long[:, 0],
+                        "Signal": signal[:, 0], "Crossover": crossover[:, 0]})
@@ -0,0 +1,494 @@
+"""
+Intraday (minute-bar) analysis in date-partitioned, memory-bounded chunks.
+
+A year of minute bars for a portfolio does not fit the app's "whole range
+in one DataFrame" model, so intraday mode streams one trading day at a
+time. ``IntradayEngine`` processes each day as (minutes x tickers)
+matrices and carries everything that crosses a day boundary:
+
+- the last rows of closes needed by the SMA and Bollinger windows,
+- the state of every recursive average (EMA, MACD, RSI, ATR),
+- the last close, the last SMA signal and the running OBV,
+- running return moments (Chan/Welford merge), peak and max drawdown.
+
+Chunked results are the same as one pass over the whole range, following
+the conventions of ``compute_indicators`` and ``IndicatorEngine``. The one
+deliberate difference is that VWAP restarts every session, as intraday
+VWAP does, instead of accumulating from the first bar. Bars are resampled
+to 5m/15m/1h buckets aligned to the session open in the same pass; a
+bucket never spans two days, so no partial bucket has to be carried.
+
+Peak memory depends on the number of tickers and bars per day, not on the
+length of the date range: only one day is held at a time.
+
+``watch_intraday`` is the live path: it seeds one ``IncrementalIndicators``
+per ticker from the previous sessions, then polls the current session and
+feeds only the bars that arrived since the last poll, reporting SMA
+crossovers as they happen instead of re-running the day.
+
+    python intraday.py RELIANCE TCS INFY --start 2024-01-01 --end 2024-03-01 --synthetic --out intraday/
+    python intraday.py RELIANCE TCS INFY --watch 60
+"""
+import argparse
+import os
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from batch_fetch import fetch_many
+from indicator_engine import rolling_mean, ffill, INDICATORS
+from price_cache import normalize_ohlcv, to_date, yf_history
+from streaming import StreamingSignals
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+RESAMPLE_FREQS = ("5min", "15min", "1h")
+SESSION_OPEN = datetime.strptime("09:15", "%H:%M").time()
+BARS_PER_DAY = 375  # NSE cash session 09:15-15:30
+TRADING_DAYS = 252
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+
+class YFinanceMinuteSource:
+    """
+    Minute bars from Yahoo Finance, one request per ticker and day. Yahoo
+    only serves 1m bars for roughly the last 30 days (longer for 5m+).
+    """
+
+    def __init__(self, interval="1m", timeout=10):
+        self.interval = interval
+        self.timeout = timeout
+
+    def fetch_day(self, ticker: str, day: date):
+        data = yf_history(ticker, start=str(day), end=str(day + timedelta(days=1)),
+                          interval=self.interval, actions=False, timeout=self.timeout)
+        return normalize_ohlcv(data)
+
+
+class ParquetMinuteSource:
+    """Reads ``<directory>/<TICKER>/<YYYY-MM-DD>.parquet`` minute files."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch_day(self, ticker: str, day: date):
+        path = os.path.join(self.directory, ticker, f"{day}.parquet")
+        if not os.path.exists(path):
+            return None
+        return normalize_ohlcv(pd.read_parquet(path))
+
+
+class SyntheticMinuteSource:
+    """
+    Deterministic synthetic minute bars for weekday sessions, seeded from the
+    ticker and the day so any date range reproduces the same bars.
+    """
+
+    def __init__(self, seed=0, bars_per_day=BARS_PER_DAY):
+        self.seed = seed
+        self.bars_per_day = bars_per_day
+
+    def fetch_day(self, ticker: str, day: date):
+        day = to_date(day)
+        if day.weekday() >= 5:
+            return None
+        n = self.bars_per_day
+        index = pd.date_range(datetime.combine(day, SESSION_OPEN), periods=n, freq="min", name="Date")
+        key = zlib.crc32(ticker.encode())
+        base = 100 + 50 * np.random.default_rng([self.seed, key]).random()
+        rng = np.random.default_rng([self.seed, key, day.toordinal()])
+        days = (day - date(2000, 1, 1)).days
+        day_open = base * np.exp(0.0003 * days + 0.1 * np.sin(days / 40.0)) * (1 + rng.normal(0.0, 0.005))
+        close = day_open * np.exp(np.cumsum(rng.normal(0.0, 0.0008, n)))
+        open_ = np.r_[day_open, close[:-1]]
+        spread = np.abs(rng.normal(0.0, 0.0004, n)) * close
+        return pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread,
+            "Low": np.minimum(open_, close) - spread,
+            "Close": close,
+            "Volume": rng.lognormal(8.0, 0.5, n).round(),
+        }, index=index)
+
+
+# ---------------------------
+# Chunk kernels
+# ---------------------------
+
+def _ewm_carry(values: np.ndarray, alpha: float, prev: np.ndarray):
+    """
+    ``ewm(alpha, adjust=False)`` down each column, continuing from ``prev``
+    (each column's last output of the previous chunk). Columns without a
+    ``prev`` start from their first value; rows before it stay NaN. Returns
+    (output, new prev).
+    """
+    has = ~np.isnan(values)
+    first = values[np.argmax(has, axis=0), np.arange(values.shape[1])]
+    start = np.where(np.isnan(prev), first, prev)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], np.where(has, values, start), axis=0,
+                     zi=(1.0 - alpha) * start[None, :])
+    out[~np.maximum.accumulate(has, axis=0) & np.isnan(prev)] = np.nan
+    return out, out[-1].copy()
+
+
+def _session_cumsum(values: np.ndarray, sessions: np.ndarray) -> np.ndarray:
+    """Cumulative sum down each column, restarting where ``sessions`` changes."""
+    csum = np.cumsum(values, axis=0)
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    before = np.vstack([np.zeros((1, values.shape[1])), csum[starts[1:] - 1]])
+    return csum - np.repeat(before, np.diff(np.r_[starts, len(values)]), axis=0)
+
+
+def resample_bars(index: pd.DatetimeIndex, fields: dict, freq: str):
+    """
+    OHLCV buckets of ``freq`` for (minutes x tickers) matrices, aligned to
+    each session's first minute. Returns (bucket index, dict of matrices);
+    buckets in which a ticker has no bar are NaN.
+    """
+    stamps = index.to_numpy()
+    day_open = index.normalize().to_numpy()
+    session_start = pd.Series(stamps).groupby(day_open).transform("min").to_numpy()
+    step = pd.Timedelta(freq).to_timedelta64()
+    labels = session_start + (stamps - session_start) // step * step
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+    close = fields["Close"]
+    valid = ~np.isnan(close)
+    rows = np.arange(len(close))[:, None]
+    first_row = np.minimum.reduceat(np.where(valid, rows, len(close) - 1), starts, axis=0)
+    last_row = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis=0)
+    has = last_row >= 0
+    last_row = np.maximum(last_row, 0)
+    out = {
+        "Open": np.take_along_axis(fields["Open"], first_row, axis=0),
+        "High": np.fmax.reduceat(fields["High"], starts, axis=0),
+        "Low": np.fmin.reduceat(fields["Low"], starts, axis=0),
+        "Close": np.take_along_axis(close, last_row, axis=0),
+        "Volume": np.add.reduceat(np.nan_to_num(fields["Volume"]), starts, axis=0),
+    }
+    for values in out.values():
+        values[~has] = np.nan
+    return pd.DatetimeIndex(labels[starts], name="Date"), out
+
+
+def long_frame(index: pd.DatetimeIndex, tickers, columns: dict) -> pd.DataFrame:
+    """Long (ticker, Date) table of the rows where each ticker has a close."""
+    rows = ~np.isnan(columns["Close"]).T
+    multi = pd.MultiIndex.from_arrays(
+        [np.repeat(list(tickers), rows.sum(axis=1)), np.broadcast_to(index.to_numpy(), rows.shape)[rows]],
+        names=["ticker", "Date"],
+    )
+    return pd.DataFrame({name: values.T[rows] for name, values in columns.items()}, index=multi)
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+
+class IntradayEngine:
+    """
+    Indicators and running metrics for a fixed ticker list, fed one
+    (minutes x tickers) chunk at a time in time order.
+    """
+
+    def __init__(self, tickers, sma_short=20, sma_long=50, indicators=INDICATORS, ema_span=20,
+                 rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9, atr_period=14,
+                 bb_window=20, bb_k=2.0, bars_per_day=BARS_PER_DAY):
+        self.tickers = list(tickers)
+        self.sma_short, self.sma_long = int(sma_short), int(sma_long)
+        self.indicators = [name for name in INDICATORS if name in set(indicators)]
+        self.alphas = {"EMA": 2.0 / (ema_span + 1.0), "fast": 2.0 / (macd_fast + 1.0),
+                       "slow": 2.0 / (macd_slow + 1.0), "MACD_Signal": 2.0 / (macd_signal + 1.0),
+                       "gain": 1.0 / rsi_period, "loss": 1.0 / rsi_period, "ATR": 1.0 / atr_period}
+        self.bb_window, self.bb_k = int(bb_window), bb_k
+        self.bars_per_year = TRADING_DAYS * bars_per_day
+        n = len(self.tickers)
+        nan = np.full(n, np.nan)
+        # rows carried into the next chunk for the trailing windows
+        self._tail = np.full((0, n), np.nan)
+        self._bb_tail = np.full((0, n), np.nan)
+        self._offset = nan.copy()
+        self._last_close = nan.copy()
+        self._signal = nan.copy()
+        self._ewm = {key: nan.copy() for key in self.alphas}
+        self._obv = np.zeros(n)
+        # running metrics
+        self._first = nan.copy()
+        self._count = np.zeros(n)
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+        self._peak = nan.copy()
+        self._max_dd = nan.copy()
+
+    def _keep_tail(self, stacked: np.ndarray, window: int) -> np.ndarray:
+        return stacked[max(len(stacked) - (window - 1), 0):]
+
+    def process(self, index: pd.DatetimeIndex, fields: dict) -> dict:
+        """
+        Indicators for one chunk of (minutes x tickers) OHLCV matrices
+        (later chunks must start after this one ends). Returns a dict of
+        (minutes x tickers) arrays.
+        """
+        close_raw = fields["Close"]
+        valid = ~np.isnan(close_raw)
+        close = ffill(np.vstack([self._last_close, close_raw]))
+        prev_close, close = close[:-1], close[1:]
+        listed = ~np.isnan(close)
+        self._offset = np.where(np.isnan(self._offset), close[np.argmax(listed, axis=0), np.arange(close.shape[1])],
+                                self._offset)
+        out = {}
+
+        # SMA crossover on each ticker's own bars, like IndicatorEngine
+        window = max(self.sma_short, self.sma_long)
+        stacked = np.vstack([self._tail, close_raw])
+        n_tail = len(self._tail)
+        sma_short = rolling_mean(stacked, self.sma_short)[n_tail:]
+        sma_long = rolling_mean(stacked, self.sma_long)[n_tail:]
+        self._tail = self._keep_tail(stacked, window)
+        signal = np.sign(sma_short - sma_long)
+        signal[~valid] = np.nan
+        filled = ffill(np.vstack([self._signal, signal]))
+        crossover = filled[1:] - filled[:-1]
+        crossover[np.isnan(crossover) | ~valid] = 0.0
+        self._signal = filled[-1]
+        out[f"SMA_{self.sma_short}"] = sma_short
+        out[f"SMA_{self.sma_long}"] = sma_long
+        out["Signal"] = np.nan_to_num(signal)
+        out["Crossover"] = crossover
+
+        high = np.where(np.isnan(fields["High"]), close, fields["High"])
+        low = np.where(np.isnan(fields["Low"]), close, fields["Low"])
+        volume = np.where(listed & ~np.isnan(fields["Volume"]), fields["Volume"], 0.0)
+        diff = close - prev_close
+        ewm = self._smooth
+        if "EMA" in self.indicators:
+            out["EMA"] = ewm("EMA", close)
+        if "RSI" in self.indicators:
+            gain, loss = ewm("gain", np.maximum(diff, 0.0)), ewm("loss", np.maximum(-diff, 0.0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+            out["RSI"] = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), rsi)
+            out["RSI"][np.isnan(loss)] = np.nan
+        if "MACD" in self.indicators:
+            macd = ewm("fast", close) - ewm("slow", close)
+            out["MACD"] = macd
+            out["MACD_Signal"] = ewm("MACD_Signal", macd)
+            out["MACD_Hist"] = macd - out["MACD_Signal"]
+        if "ATR" in self.indicators:
+            true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+            out["ATR"] = ewm("ATR", true_range)
+        if "BB" in self.indicators:
+            stacked = np.vstack([self._bb_tail, np.where(listed, close - self._offset, np.nan)])
+            n_tail = len(self._bb_tail)
+            mid = rolling_mean(stacked, self.bb_window)[n_tail:]
+            var = rolling_mean(stacked * stacked, self.bb_window)[n_tail:] - mid * mid
+            self._bb_tail = self._keep_tail(stacked, self.bb_window)
+            mid += self._offset
+            width = self.bb_k * np.sqrt(np.maximum(var, 0.0))
+            out["BB_Mid"], out["BB_Upper"], out["BB_Lower"] = mid, mid + width, mid - width
+        if "VWAP" in self.indicators:
+            sessions = index.normalize().to_numpy()
+            typical = (high + low + close) / 3.0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out["VWAP"] = (_session_cumsum(np.nan_to_num(typical * volume), sessions)
+                               / _session_cumsum(volume, sessions))
+        if "OBV" in self.indicators:
+            out["OBV"] = self._obv + np.cumsum(np.nan_to_num(np.sign(diff)) * volume, axis=0)
+            self._obv = out["OBV"][-1].copy()
+
+        for name, values in out.items():
+            if name not in ("Signal", "Crossover"):
+                values[~listed] = np.nan
+        self._update_metrics(close, prev_close, listed)
+        self._last_close = close[-1].copy()
+        return out
+
+    def _smooth(self, key: str, values: np.ndarray) -> np.ndarray:
+        out, self._ewm[key] = _ewm_carry(values, self.alphas[key], self._ewm[key])
+        return out
+
+    def _update_metrics(self, close, prev_close, listed):
+        cols = np.arange(close.shape[1])
+        self._first = np.where(np.isnan(self._first), close[np.argmax(listed, axis=0), cols], self._first)
+        # merge this chunk's return moments into the running ones (Chan et al.)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = close / prev_close - 1.0
+            has = ~np.isnan(returns)
+            count = has.sum(axis=0)
+            mean = np.where(count > 0, np.nansum(returns, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((returns - mean) ** 2, axis=0)
+            total = self._count + count
+            delta = mean - self._mean
+            self._mean = np.where(total > 0, self._mean + delta * count / np.maximum(total, 1), 0.0)
+            self._m2 = self._m2 + m2 + np.where(total > 0, delta ** 2 * self._count * count / np.maximum(total, 1), 0.0)
+            self._count = total
+            peak = np.fmax.accumulate(np.vstack([self._peak, close]), axis=0)[1:]
+            self._max_dd = np.fmin(self._max_dd, np.fmin.reduce(close / peak - 1.0, axis=0))
+        self._peak = peak[-1]
+
+    def metrics(self) -> pd.DataFrame:
+        """``compute_portfolio_metrics``-style figures of each ticker's bars so far."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ann_vol = np.sqrt(self._m2 / (self._count - 1)) * np.sqrt(self.bars_per_year)
+            ann_return = self._mean * self.bars_per_year
+            metrics = pd.DataFrame({
+                "Total Return": self._last_close / self._first - 1.0,
+                "Annual Return": ann_return,
+                "Annual Volatility": ann_vol,
+                "Sharpe Ratio": np.where(ann_vol > 0, ann_return / ann_vol, np.nan),
+                "Max Drawdown": self._max_dd,
+                "Bars": self._count + ~np.isnan(self._first),
+            }, index=pd.Index(self.tickers, name="ticker"))
+        metrics.loc[self._count < 2, ["Annual Return", "Annual Volatility", "Sharpe Ratio"]] = np.nan
+        return metrics
+
+
+# ---------------------------
+# Streaming driver
+# ---------------------------
+
+def align_day(data_map: dict, tickers) -> tuple:
+    """Union minute index of one day and its (minutes x tickers) OHLCV matrices."""
+    index = pd.DatetimeIndex(np.unique(np.concatenate([df.index.to_numpy() for df in data_map.values()])), name="Date")
+    fields = {field: np.full((len(index), len(tickers)), np.nan) for field in FIELDS}
+    for j, t in enumerate(tickers):
+        df = data_map.get(t)
+        if df is None:
+            continue
+        rows = index.get_indexer(df.index)
+        for field in FIELDS:
+            if field in df.columns:
+                fields[field][rows, j] = df[field].to_numpy(dtype="float64")
+    return index, fields
+
+
+def stream_intraday(engine: IntradayEngine, start, end, source, resample=RESAMPLE_FREQS,
+                    fetch_workers=8, timeout=30.0, retries=1):
+    """
+    Yield one dict per trading day with start <= day < end: ``date``,
+    ``bars`` (long 1-minute table with indicators), ``resampled``
+    ({freq: long OHLCV table}) and fetch ``failures``. Only the current day
+    is held in memory; ``engine.metrics()`` summarizes everything seen.
+    """
+    for day in pd.bdate_range(to_date(start), to_date(end) - timedelta(days=1)).date:
+        data_map, failures = fetch_many(engine.tickers, lambda t: source.fetch_day(t, day),
+                                        max_workers=fetch_workers, timeout=timeout, retries=retries)
+        if not data_map:
+            continue  # holiday or no data for anyone
+        index, fields = align_day(data_map, engine.tickers)
+        indicators = engine.process(index, fields)
+        resampled = {}
+        for freq in resample:
+            bucket_index, buckets = resample_bars(index, fields, freq)
+            resampled[freq] = long_frame(bucket_index, engine.tickers, buckets)
+        bars = long_frame(index, engine.tickers, {**fields, **indicators})
+        bars["Signal"] = bars["Signal"].astype(np.int64)
+        yield {"date": day, "bars": bars, "resampled": resampled, "failures": failures}
+
+
+def run_intraday(tickers, start, end, out_dir, source, resample=RESAMPLE_FREQS, **params):
+    """
+    Stream ``tickers`` day by day and write ``<out_dir>/bars_1min/<day>.parquet``,
+    ``<out_dir>/bars_<freq>/<day>.parquet`` and ``metrics.parquet``.
+    Returns the metrics frame.
+    """
+    engine = IntradayEngine(tickers, **params)
+    for chunk in stream_intraday(engine, start, end, source, resample):
+        for freq, frame in [("1min", chunk["bars"])] + list(chunk["resampled"].items()):
+            folder = os.path.join(out_dir, f"bars_{freq}")
+            os.makedirs(folder, exist_ok=True)
+            frame.to_parquet(os.path.join(folder, f"{chunk['date']}.parquet"))
+    metrics = engine.metrics()
+    os.makedirs(out_dir, exist_ok=True)
+    metrics.to_parquet(os.path.join(out_dir, "metrics.parquet"))
+    return metrics
+
+
+def watch_intraday(tickers, source, day=None, poll=60.0, polls=None, history_days=3,
+                   fetch_workers=8, timeout=30.0, retries=1, **params):
+    """
+    Yield (ticker, timestamp, "BUY"/"SELL", close) crossover events from
+    ``day``'s minute bars (default today) as they arrive. The state is seeded
+    from the ``history_days`` sessions before ``day``; each poll feeds only
+    bars newer than a ticker's last bar. Stops after ``polls`` polls
+    (None: run until interrupted), sleeping ``poll`` seconds in between.
+    ``params`` are ``IncrementalIndicators`` parameters.
+    """
+    day = to_date(day) if day is not None else date.today()
+    signals = StreamingSignals(**params)
+    history = {t: [] for t in tickers}
+    for past in pd.bdate_range(end=day - timedelta(days=1), periods=history_days).date:
+        data_map, _ = fetch_many(tickers, lambda t: source.fetch_day(t, past),
+                                 max_workers=fetch_workers, timeout=timeout, retries=retries)
+        for t, df in data_map.items():
+            history[t].append(df)
+    signals.seed({t: pd.concat(frames) for t, frames in history.items() if frames})
+
+    count = 0
+    while polls is None or count < polls:
+        if count:
+            time.sleep(poll)
+        count += 1
+        data_map, _ = fetch_many(tickers, lambda t: source.fetch_day(t, day),
+                                 max_workers=fetch_workers, timeout=timeout, retries=retries)
+        for t in tickers:
+            df = data_map.get(t)
+            if df is None:
+                continue
+            state = signals.states.get(t)
+            if state is not None and state.last_time is not None:
+                df = df[df.index > state.last_time]
+            for timestamp, close in df["Close"].dropna().items():
+                event = signals.update(t, close, timestamp)
+                if event:
+                    yield event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="+", help="NSE tickers (.NS is added when missing)")
+    parser.add_argument("--start", default=(datetime.today() - timedelta(days=7)).strftime("%Y-%m-%d"))
+    parser.add_argument("--end", default=(datetime.today() + timedelta(days=1)).strftime("%Y-%m-%d"))
+    parser.add_argument("--out", default="intraday")
+    parser.add_argument("--sma-short", type=int, default=20)
+    parser.add_argument("--sma-long", type=int, default=50)
+    parser.add_argument("--interval", default="1m", help="Yahoo bar interval")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="poll today's bars every SECONDS and print crossovers instead of writing files")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--parquet-dir", help="read <dir>/<TICKER>/<YYYY-MM-DD>.parquet instead of Yahoo")
+    source.add_argument("--synthetic", action="store_true", help="use deterministic synthetic bars (offline)")
+    args = parser.parse_args()
+
+    from pipeline import normalize_nse_ticker
+    tickers = list(dict.fromkeys(normalize_nse_ticker(t) for t in args.tickers if t.strip()))
+    if args.synthetic:
+        bar_source = SyntheticMinuteSource()
+    elif args.parquet_dir:
+        bar_source = ParquetMinuteSource(args.parquet_dir)
+    else:
+        bar_source = YFinanceMinuteSource(args.interval)
+    if args.watch is not None:
+        try:
+            for ticker, timestamp, event, close in watch_intraday(tickers, bar_source, poll=args.watch,
+                                                                  sma_short=args.sma_short,
+                                                                  sma_long=args.sma_long):
+                print(f"{timestamp}  {ticker:<14} {event:<4} {close:.2f}", flush=True)
+        except KeyboardInterrupt:
+            pass
+        return
+    t0 = time.perf_counter()
+    metrics = run_intraday(tickers, args.start, args.end, args.out, bar_source,
+                           sma_short=args.sma_short, sma_long=args.sma_long)
+    print(metrics.round(4).to_string())
+    print(f"{len(tickers)} tickers, {args.start} .. {args.end}: {time.perf_counter() - t0:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
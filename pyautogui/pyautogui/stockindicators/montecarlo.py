@@ -0,0 +1,112 @@
+"""
+Monte Carlo portfolio simulation.
+
+Generates future portfolio paths from the historical daily returns of the
+portfolio tickers (``all_close.pct_change()`` in the app), either as
+correlated normal draws (Cholesky factor of the return covariance) or by
+bootstrapping historical days (optionally in blocks to keep short-term
+autocorrelation). Paths are generated in chunks whose size is derived from
+a memory budget, and only two numbers per path are kept (terminal return
+and maximum drawdown), so 100k+ paths run in bounded memory.
+
+With ``rebalance="none"`` the portfolio is bought once and held, like the
+app's "Buy and hold" schedule; with ``"daily"`` it is rebalanced to the
+target weights every day, like ``compute_portfolio_metrics``.
+"""
+import numpy as np
+import pandas as pd
+
+METHODS = ("cholesky", "bootstrap")
+DEFAULT_MEMORY_BUDGET = 64 * 1024 ** 2  # bytes of simulated returns per chunk
+
+
+def _cholesky(cov: np.ndarray) -> np.ndarray:
+    """Cholesky factor, adding a small diagonal jitter if cov is only PSD."""
+    jitter = 0.0
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    for _ in range(10):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 10
+    raise np.linalg.LinAlgError("covariance matrix is not positive semi-definite")
+
+
+def simulate_portfolio(price_df: pd.DataFrame, weights, n_paths=100_000, horizon=252,
+                       method="cholesky", rebalance="none", block=1, seed=None,
+                       chunk_size=None, memory_budget=DEFAULT_MEMORY_BUDGET) -> dict:
+    """
+    Simulate ``n_paths`` portfolio paths of ``horizon`` trading days.
+
+    Returns a dict with ``terminal_returns`` and ``max_drawdowns`` arrays (one
+    value per path) plus the settings used. The same ``seed`` and chunk size
+    always give the same paths.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if rebalance not in ("none", "daily"):
+        raise ValueError("rebalance must be 'none' or 'daily'")
+    history = price_df.pct_change().dropna().to_numpy(dtype="float64")
+    if len(history) < 2:
+        raise ValueError("need at least three prices per ticker")
+    weights = np.asarray(weights, dtype="float64")
+    n_assets = history.shape[1]
+    if chunk_size is None:
+        chunk_size = max(1, int(memory_budget // (horizon * n_assets * 8)))
+    chunk_size = min(chunk_size, n_paths)
+
+    rng = np.random.default_rng(seed)
+    mean = history.mean(axis=0)
+    chol = _cholesky(np.cov(history, rowvar=False).reshape(n_assets, n_assets)) if method == "cholesky" else None
+
+    terminal = np.empty(n_paths)
+    drawdown = np.empty(n_paths)
+    for start in range(0, n_paths, chunk_size):
+        n = min(chunk_size, n_paths - start)
+        if method == "cholesky":
+            # one 2-D matmul over all draws of the chunk
+            returns = (rng.standard_normal((n * horizon, n_assets)) @ chol.T).reshape(n, horizon, n_assets)
+            returns += mean
+        else:
+            # block bootstrap: random start days, then consecutive days
+            n_blocks = -(-horizon // block)
+            starts = rng.integers(0, len(history) - block + 1, size=(n, n_blocks))
+            idx = (starts[:, :, None] + np.arange(block)).reshape(n, -1)[:, :horizon]
+            returns = history[idx]
+
+        if rebalance == "daily":
+            growth = np.cumprod(1.0 + returns @ weights, axis=1)
+        else:
+            # buy and hold: each asset compounds on its own
+            growth = np.cumprod(1.0 + returns, axis=1) @ weights
+        peak = np.maximum(np.maximum.accumulate(growth, axis=1), 1.0)
+        terminal[start:start + n] = growth[:, -1] - 1.0
+        drawdown[start:start + n] = np.minimum((growth / peak - 1.0).min(axis=1), 0.0)
+
+    return {
+        "terminal_returns": terminal,
+        "max_drawdowns": drawdown,
+        "method": method,
+        "rebalance": rebalance,
+        "horizon": horizon,
+        "n_paths": n_paths,
+    }
+
+
+def risk_summary(sim: dict, levels=(0.95, 0.99)) -> pd.DataFrame:
+    """VaR/CVaR of the terminal return and drawdown percentiles, as fractions."""
+    returns, drawdowns = sim["terminal_returns"], sim["max_drawdowns"]
+    rows = {
+        "Mean Return": returns.mean(),
+        "Median Return": np.median(returns),
+        "Probability of Loss": (returns < 0).mean(),
+    }
+    for level in levels:
+        cutoff = np.quantile(returns, 1.0 - level)
+        rows[f"VaR {level:.0%}"] = -cutoff
+        rows[f"CVaR {level:.0%}"] = -returns[returns <= cutoff].mean()
+    for q in (50, 95, 99):
+        # the q-th worst-case percentile of the drawdown distribution
+        rows[f"Max Drawdown p{q}"] = np.percentile(drawdowns, 100 - q)
+    rows["Mean Max Drawdown"] = drawdowns.mean()
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["Value"])
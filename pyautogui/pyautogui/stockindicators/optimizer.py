@@ -0,0 +1,214 @@
+"""
+Parallel SMA window optimizer with result caching.
+
+Sweeps (sma_short, sma_long) pairs for a portfolio: every pair is traded on
+each ticker with the backtest rules from ``backtest.py``, the per-ticker
+equity curves are combined with the portfolio weights and scored by
+``compute_portfolio_metrics``, and the pairs are ranked by Sharpe ratio or
+CAGR.
+
+Pairs are split across a ``ProcessPoolExecutor``. The close matrix is put
+into one ``multiprocessing.shared_memory`` block that every worker maps, so
+no price frames are pickled per task. Results are cached in memory and on
+disk under a hash of the prices and sweep settings, so repeating a sweep is
+instant. Both caches are shared by every session of the app process and
+bounded: least recently used results are dropped past
+``MEMORY_CACHE_SIZE`` tables in memory and ``DISK_CACHE_FILES`` files on
+disk.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import bar_returns, held_signal, held_sma, strategy_returns, _pairs
+from portfolio import compute_portfolio_metrics
+
+RANK_METRICS = ("Sharpe Ratio", "CAGR")
+SMA_CACHE_SIZE = 64       # SMA matrices kept per worker
+MEMORY_CACHE_SIZE = 32    # sweep results kept in memory
+DISK_CACHE_FILES = 256    # sweep results kept on disk
+RULES_VERSION = 2         # bump when the backtest rules change, so cached sweeps are not reused
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stockindicators", "optimizer")
+
+_memory_cache = OrderedDict()  # key -> result table, least recently used first
+_memory_lock = threading.Lock()
+_worker = {}  # per-process state set up by _init_worker
+
+
+# ---------------------------
+# Worker side
+# ---------------------------
+
+def _init_worker(shm_name, shape, index, columns, weights, cost, long_only):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    close = np.ndarray(shape, dtype="float64", buffer=shm.buf)
+    _setup(close, index, columns, weights, cost, long_only)
+    _worker["shm"] = shm  # keep the mapping alive
+
+
+def _setup(close, index, columns, weights, cost, long_only):
+    _worker.update(
+        close=close,
+        returns=bar_returns(close),
+        index=pd.DatetimeIndex(index),
+        columns=list(columns),
+        weights=weights,
+        cost=cost,
+        long_only=long_only,
+        sma={},
+    )
+
+
+def _sma(window: int):
+    cache = _worker["sma"]
+    if window not in cache:
+        # bounded so wide portfolios do not keep every window in memory
+        if len(cache) >= SMA_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[window] = held_sma(_worker["close"], window)
+    return cache[window]
+
+
+def _evaluate(pairs):
+    """compute_portfolio_metrics of the strategy portfolio for each pair."""
+    out = []
+    for s, l in pairs:
+        _, net, _ = strategy_returns(held_signal(_sma(s), _sma(l)), _worker["returns"], _worker["cost"], _worker["long_only"])
+        equity = pd.DataFrame(np.cumprod(1.0 + net, axis=0), index=_worker["index"], columns=_worker["columns"])
+        metrics, _, _ = compute_portfolio_metrics(equity, _worker["weights"])
+        out.append(((s, l), metrics))
+    return out
+
+
+# ---------------------------
+# Caching
+# ---------------------------
+
+def sweep_key(close: pd.DataFrame, weights, pairs, cost, long_only) -> str:
+    """Hash of everything a sweep result depends on."""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(close.to_numpy(dtype="float64")).tobytes())
+    h.update(close.index.asi8.tobytes())
+    h.update(repr((RULES_VERSION, list(close.columns), np.round(weights, 12).tolist(), pairs, cost,
+                   long_only)).encode())
+    return h.hexdigest()
+
+
+def _remember(key, frame):
+    with _memory_lock:
+        _memory_cache[key] = frame
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _load_cached(key, cache_dir):
+    with _memory_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+    path = os.path.join(cache_dir, key + ".parquet") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            frame = pd.read_parquet(path)
+            os.utime(path)  # the modification time orders the disk cache by last use
+        except (OSError, ValueError):
+            return None  # pruned or half-written meanwhile: recompute
+        _remember(key, frame)
+        return frame
+    return None
+
+
+def _store_cached(key, frame, cache_dir):
+    _remember(key, frame)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, key + ".parquet")
+        frame.to_parquet(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        prune_disk_cache(cache_dir)
+
+
+def prune_disk_cache(cache_dir, max_files=None):
+    """Delete the least recently used result files beyond ``max_files``; returns how many."""
+    max_files = DISK_CACHE_FILES if max_files is None else max_files
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".parquet"):
+            try:
+                files.append((entry.stat().st_mtime_ns, entry.path))
+            except OSError:
+                pass
+    files.sort()
+    removed = 0
+    for _, path in files[:max(0, len(files) - max_files)]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass  # another process got there first
+    return removed
+
+
+# ---------------------------
+# Sweep
+# ---------------------------
+
+def optimize_sma(close: pd.DataFrame, shorts, longs, weights=None, metric="Sharpe Ratio",
+                 fee_bps=10.0, slippage_bps=5.0, long_only=True, workers=None,
+                 cache_dir=DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    Rank every (short, long) pair with short < long by ``metric``.
+
+    Returns a DataFrame indexed by (sma_short, sma_long) with the
+    compute_portfolio_metrics columns, best pair first. ``weights`` default
+    to equal weights; ``cache_dir=None`` keeps the cache in memory only.
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"metric must be one of {RANK_METRICS}")
+    n = close.shape[1]
+    weights = np.full(n, 1.0 / n) if weights is None else np.asarray(weights, dtype="float64")
+    pairs = _pairs(shorts, longs)
+    cost = (fee_bps + slippage_bps) / 1e4
+
+    key = sweep_key(close, weights, pairs, cost, long_only)
+    table = _load_cached(key, cache_dir)
+    if table is None:
+        table = _run_sweep(close, pairs, weights, cost, long_only, workers)
+        _store_cached(key, table, cache_dir)
+    return table.sort_values(metric, ascending=False, na_position="last")
+
+
+def _run_sweep(close, pairs, weights, cost, long_only, workers):
+    values = np.ascontiguousarray(close.to_numpy(dtype="float64"))
+    init_args = (close.index.to_numpy(), list(close.columns), weights, cost, long_only)
+    workers = min(workers or os.cpu_count() or 1, len(pairs))
+    # a few contiguous batches per worker: balanced load, and pairs that
+    # share a short window stay together so its SMA is reused
+    size = max(1, -(-len(pairs) // (workers * 4)))
+    batches = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+
+    if workers <= 1:
+        _setup(values, *init_args)
+        results = [_evaluate(pairs)]
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype="float64", buffer=shm.buf)[:] = values
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, values.shape) + init_args) as pool:
+                results = list(pool.map(_evaluate, batches))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    rows = {pair: metrics for batch in results for pair, metrics in batch}
+    table = pd.DataFrame.from_dict(rows, orient="index")
+    table.index = pd.MultiIndex.from_tuples(table.index, names=["sma_short", "sma_long"])
+    return table.sort_index()
@@ -0,0 +1,239 @@
+"""
+Headless analysis pipeline for the stock indicators app.
+
+The analysis helpers used by ``app.py`` live here so they can be imported
+without Streamlit, and ``run_batch`` runs the whole fetch -> indicators ->
+forecast -> metrics pipeline over a ticker universe and writes Parquet:
+
+    indicators.parquet   one row per (ticker, Date): Close, SMAs, Signal,
+                         Crossover and the extended indicators
+    forecasts.parquet    one row per ticker: lag-regression rmse,
+                         pred_1 .. pred_<predict_days> from one direct model
+                         per horizon and their walk-forward wf_rmse_<h>
+    metrics.parquet      one row per ticker: compute_portfolio_metrics of
+                         the ticker alone, latest signal and close
+    failures.parquet     tickers that could not be fetched, with the reason
+
+Every run rewrites all four files, with no rows if no ticker could be fetched.
+
+Prices are fetched concurrently through the on-disk ``PriceCache``; the
+analysis runs on chunks of tickers in a process pool, each chunk as one set
+of vectorized passes (``IndicatorEngine``, ``compute_indicators``, the
+batched lag regression and ``ticker_metrics``).
+
+    python pipeline.py universe.txt --start 2020-01-01 --out results/
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from batch_fetch import fetch_many
+from forecast import fit_direct, forecast_direct
+from indicator_engine import IndicatorEngine, compute_indicators, INDICATORS
+from portfolio import ticker_metrics
+from price_cache import PriceCache, YFinanceSource, CSVSource, SyntheticSource, DEFAULT_CACHE_DIR, OHLCV_COLUMNS
+
+CHUNK_SIZE = 200  # tickers per worker task
+
+
+# ---------------------------
+# Helper functions
+# ---------------------------
+
+def normalize_nse_ticker(ticker: str):
+    ticker = ticker.strip().upper()
+    if not ticker:
+        return ""
+    if "." not in ticker:
+        ticker = ticker + ".NS"
+    return ticker
+
+def add_extended_indicators(df: pd.DataFrame, indicators=INDICATORS):
+    """
+    Add the selected indicators (EMA, RSI, MACD, ATR, BB, VWAP, OBV) computed
+    in one fused pass over the OHLCV columns.
+    """
+    cols = {}
+    for c in ["Close", "High", "Low", "Volume"]:
+        s = df[c]
+        cols[c] = s.iloc[:, 0] if isinstance(s, pd.DataFrame) else s
+    values = compute_indicators(cols["Close"].values, cols["High"].values, cols["Low"].values,
+                                cols["Volume"].values, indicators=indicators)
+    return df.assign(**values)
+
+def generate_trade_points(df: pd.DataFrame):
+    buys = df[df["Crossover"] == 2]
+    sells = df[df["Crossover"] == -2]
+    return buys, sells
+
+
+# ---------------------------
+# Batch analysis
+# ---------------------------
+
+def read_universe(path: str) -> list:
+    """
+    Tickers from a universe file: a CSV with a ``ticker`` or ``symbol``
+    column, or plain text with one or more comma-separated tickers per line
+    (``#`` starts a comment). Tickers are NSE-normalised and de-duplicated.
+    """
+    if path.lower().endswith(".csv"):
+        frame = pd.read_csv(path)
+        column = next((c for c in frame.columns if c.strip().lower() in ("ticker", "symbol")), frame.columns[0])
+        raw = frame[column].dropna().astype(str).tolist()
+    else:
+        raw = []
+        with open(path) as f:
+            for line in f:
+                raw.extend(line.split("#", 1)[0].split(","))
+    return list(dict.fromkeys(t for t in (normalize_nse_ticker(r) for r in raw) if t))
+
+
+def analyze_chunk(data_map: dict, sma_short=20, sma_long=50, lags=5, predict_days=5,
+                  indicators=INDICATORS, tail=None):
+    """
+    Indicators, forecasts and metrics for a {ticker: OHLCV frame} chunk.
+    Returns three DataFrames (see the module docstring); ``tail`` keeps only
+    the last rows of each ticker's indicator history.
+
+    Everything runs on (dates x tickers) matrices of the chunk, with the
+    same conventions as ``IndicatorEngine`` and ``compute_indicators`` for
+    tickers whose dates differ; the long table is assembled once at the end.
+    """
+    tickers = list(data_map)
+    panel = pd.concat(data_map, axis=1, join="outer", sort=True)
+    fields = [c for c in OHLCV_COLUMNS if all(c in df.columns for df in data_map.values())]
+    matrices = {f: panel.xs(f, axis=1, level=1)[tickers].to_numpy(dtype="float64") for f in fields}
+    engine = IndicatorEngine(pd.DataFrame(matrices["Close"], index=panel.index, columns=tickers))
+
+    signal, crossover = engine.signals(sma_short, sma_long)
+    columns = dict(matrices)
+    columns[f"SMA_{sma_short}"] = engine.sma_values(sma_short)
+    columns[f"SMA_{sma_long}"] = engine.sma_values(sma_long)
+    columns["Signal"] = signal.to_numpy()
+    columns["Crossover"] = crossover.to_numpy()
+    if indicators:
+        columns.update(compute_indicators(matrices["Close"], matrices.get("High"), matrices.get("Low"),
+                                          matrices.get("Volume"), indicators=indicators))
+
+    # long (ticker, Date) table of each ticker's own dates, optionally the last ``tail``
+    valid = ~np.isnan(matrices["Close"])
+    keep = valid if not tail else valid & (np.cumsum(valid[::-1], axis=0)[::-1] <= tail)
+    rows = keep.T
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(tickers, rows.sum(axis=1)), np.broadcast_to(panel.index.to_numpy(), rows.shape)[rows]],
+        names=["ticker", "Date"],
+    )
+    indicator_frame = pd.DataFrame({name: values.T[rows] for name, values in columns.items()}, index=index)
+    indicator_frame["Signal"] = indicator_frame["Signal"].astype(np.int64)
+
+    # one batched regression for the chunk instead of one sklearn fit per ticker
+    model = fit_direct(engine.close, lags, predict_days)
+    horizons = range(1, predict_days + 1)
+    forecasts = pd.DataFrame(forecast_direct(model), index=tickers, columns=[f"pred_{h}" for h in horizons])
+    forecasts.insert(0, "n_obs", model["n_obs"])
+    forecasts.insert(0, "rmse", model["rmse"][:, 0])
+    forecasts[[f"wf_rmse_{h}" for h in horizons]] = model["wf_rmse"]
+    forecasts.index.name = "ticker"
+
+    metrics = ticker_metrics(engine.close)
+    last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+    cols = np.arange(len(tickers))
+    metrics["Latest Close"] = matrices["Close"][last, cols]
+    metrics["Latest Signal"] = columns["Signal"][last, cols].astype(np.int64)
+    metrics["Forecast Change"] = forecasts[f"pred_{predict_days}"] / metrics["Latest Close"] - 1
+    metrics.index.name = "ticker"
+    return indicator_frame, forecasts, metrics
+
+
+def _analyze_task(args):
+    data_map, settings = args
+    return analyze_chunk(data_map, **settings)
+
+
+def run_batch(tickers, start, end, out_dir, price_cache=None, sma_short=20, sma_long=50, lags=5,
+              predict_days=5, indicators=INDICATORS, tail=None, workers=None, chunk_size=CHUNK_SIZE,
+              fetch_workers=16):
+    """
+    Fetch and analyze ``tickers`` and write the Parquet outputs to
+    ``out_dir``. Returns {"ok": n, "failed": {ticker: reason}}.
+    """
+    price_cache = price_cache or PriceCache(source=YFinanceSource())
+    data_map, failures = fetch_many(tickers, lambda t: price_cache.get(t, start, end),
+                                    max_workers=fetch_workers, timeout=60.0, retries=2)
+    settings = dict(sma_short=sma_short, sma_long=sma_long, lags=lags, predict_days=predict_days,
+                    indicators=list(indicators), tail=tail)
+    names = list(data_map)
+    tasks = [({t: data_map[t] for t in names[i:i + chunk_size]}, settings)
+             for i in range(0, len(names), chunk_size)]
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers <= 1:
+        results = [_analyze_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_analyze_task, tasks))
+
+    os.makedirs(out_dir, exist_ok=True)
+    if not results:
+        # nothing analyzed: still replace the previous run's outputs
+        results = [(pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=["ticker", "Date"])),
+                    pd.DataFrame(index=pd.Index([], name="ticker")),
+                    pd.DataFrame(index=pd.Index([], name="ticker")))]
+    for i, name in enumerate(["indicators", "forecasts", "metrics"]):
+        pd.concat([r[i] for r in results]).to_parquet(os.path.join(out_dir, f"{name}.parquet"))
+    failed = pd.DataFrame({"ticker": list(failures), "reason": list(failures.values())}, dtype="object")
+    failed.to_parquet(os.path.join(out_dir, "failures.parquet"))
+    return {"ok": len(names), "failed": failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("universe", help="ticker universe file (.txt or .csv)")
+    parser.add_argument("--start", default=(datetime.today() - timedelta(days=365*2)).strftime("%Y-%m-%d"))
+    parser.add_argument("--end", default=(datetime.today() + timedelta(days=1)).strftime("%Y-%m-%d"))
+    parser.add_argument("--out", default="results", help="output directory")
+    parser.add_argument("--sma-short", type=int, default=20)
+    parser.add_argument("--sma-long", type=int, default=50)
+    parser.add_argument("--lags", type=int, default=5)
+    parser.add_argument("--predict-days", type=int, default=5)
+    parser.add_argument("--indicators", nargs="*", default=list(INDICATORS), choices=INDICATORS)
+    parser.add_argument("--tail", type=int, default=None, help="indicator rows kept per ticker (default all)")
+    parser.add_argument("--workers", type=int, default=None, help="analysis processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--fetch-workers", type=int, default=16)
+    parser.add_argument("--cache-dir", default=None,
+                        help="price cache (default: the app's cache for Yahoo, <out>/price_cache otherwise)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--csv-dir", help="read <TICKER>.csv files instead of Yahoo Finance")
+    source.add_argument("--synthetic", action="store_true", help="deterministic synthetic prices (offline)")
+    args = parser.parse_args()
+
+    if args.csv_dir:
+        data_source = CSVSource(args.csv_dir)
+    elif args.synthetic:
+        data_source = SyntheticSource()
+    else:
+        data_source = YFinanceSource()
+    # only Yahoo prices go into the cache shared with the app
+    cache_dir = args.cache_dir or (os.environ.get("STOCK_CACHE_DIR", DEFAULT_CACHE_DIR)
+                                   if isinstance(data_source, YFinanceSource) else os.path.join(args.out, "price_cache"))
+    tickers = read_universe(args.universe)
+
+    t0 = time.perf_counter()
+    summary = run_batch(tickers, args.start, args.end, args.out, PriceCache(cache_dir, source=data_source),
+                        sma_short=args.sma_short, sma_long=args.sma_long, lags=args.lags,
+                        predict_days=args.predict_days, indicators=args.indicators, tail=args.tail,
+                        workers=args.workers, chunk_size=args.chunk_size, fetch_workers=args.fetch_workers)
+    print(f"{summary['ok']} of {len(tickers)} tickers analyzed in {time.perf_counter() - t0:.2f}s -> {args.out}")
+    for t, reason in summary["failed"].items():
+        print(f"  failed {t}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Portfolio-level metrics shared by the app, the optimizer and batch jobs.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def compute_portfolio_metrics(price_df: pd.DataFrame, weights: np.ndarray, trading_days=252):
+    daily_returns = price_df.pct_change().dropna()
+    port_returns = daily_returns.dot(weights)
+    cum_returns = (1 + port_returns).cumprod()
+    total_return = cum_returns.iloc[-1] - 1
+    days = (price_df.index[-1] - price_df.index[0]).days
+    years = days / 365.25 if days > 0 else 1/365.25
+    cagr = (1 + total_return) ** (1/years) - 1 if years > 0 else 0.0
+    ann_vol = port_returns.std() * np.sqrt(trading_days)
+    ann_return = port_returns.mean() * trading_days
+    sharpe = (ann_return / ann_vol) if ann_vol != 0 else np.nan
+    rolling_max = cum_returns.cummax()
+    drawdown = cum_returns / rolling_max - 1
+    max_dd = drawdown.min()
+    metrics = {
+        "Total Return": float(total_return),
+        "CAGR": float(cagr),
+        "Annual Return": float(ann_return),
+        "Annual Volatility": float(ann_vol),
+        "Sharpe Ratio": float(sharpe) if not np.isnan(sharpe) else None,
+        "Max Drawdown": float(max_dd)
+    }
+    return metrics, port_returns, cum_returns
+
+
+def ticker_metrics(close: pd.DataFrame, trading_days=252) -> pd.DataFrame:
+    """
+    compute_portfolio_metrics of each column held alone, for a whole close
+    matrix at once. Every ticker is measured on its own dates: missing
+    values are skipped, like calling compute_portfolio_metrics on
+    ``close[[ticker]].dropna()``.
+    """
+    values = close.to_numpy(dtype="float64")
+    valid = ~np.isnan(values)
+    # pack each column's valid prices at the top, keeping their order
+    order = np.argsort(~valid, axis=0, kind="stable")
+    packed = np.take_along_axis(values, order, axis=0)
+    count = valid.sum(axis=0)
+    cols = np.arange(values.shape[1])
+    dates = close.index.to_numpy()
+    first = packed[0]
+    last = packed[np.maximum(count - 1, 0), cols]
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # tickers with < 2 prices
+        returns = packed[1:] / packed[:-1] - 1.0
+        total_return = last / first - 1.0
+        days = (dates[order[np.maximum(count - 1, 0), cols]] - dates[order[0]]) / np.timedelta64(1, "D")
+        years = np.where(days > 0, days / 365.25, 1 / 365.25)
+        cagr = (1 + total_return) ** (1 / years) - 1
+        ann_vol = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(trading_days)
+        ann_return = np.nanmean(returns, axis=0) * trading_days
+        sharpe = np.where(ann_vol != 0, ann_return / ann_vol, np.nan)
+        cum_returns = packed[1:] / first
+        max_dd = np.nanmin(cum_returns / np.fmax.accumulate(cum_returns, axis=0) - 1, axis=0)
+    metrics = pd.DataFrame({
+        "Total Return": total_return,
+        "CAGR": cagr,
+        "Annual Return": ann_return,
+        "Annual Volatility": ann_vol,
+        "Sharpe Ratio": sharpe,
+        "Max Drawdown": max_dd,
+    }, index=close.columns)
+    # compute_portfolio_metrics needs at least two prices
+    metrics[count < 2] = np.nan
+    return metrics
@@ -0,0 +1,332 @@
+"""
+Persistent on-disk OHLCV cache for the stock indicators app.
+
+Every ticker is stored as one Parquet file plus a small JSON sidecar that
+records the date range already requested from the upstream source. A later
+request only downloads the part of the range that is not covered yet (the
+missing head and/or tail) and merges it into the file, so moving the end
+date by one day costs one small request instead of a full re-download.
+
+The upstream is pluggable: anything with a ``fetch(ticker, start, end)``
+method returning a DataFrame (or None) works, e.g. ``YFinanceSource`` in the
+app, ``CSVSource`` for offline fixtures and ``SyntheticSource`` for
+benchmarks. A source may list the dates of splits and dividends in the
+frame's ``attrs["actions"]``; a new one invalidates the cached adjusted
+prices before it.
+"""
+import json
+import os
+import re
+import threading
+import time
+import warnings
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stockindicators", "prices")
+LIVE_TTL = 15 * 60  # seconds before today's still-changing bar is requested again
+
+# raise network and rate-limit errors instead of logging them and returning an
+# empty frame, which would look like a range without bars
+yf.config.debug.hide_exceptions = False
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+
+def to_date(value) -> date:
+    """Accept 'YYYY-MM-DD' strings, dates, datetimes or Timestamps."""
+    return pd.Timestamp(value).date()
+
+
+def normalize_ohlcv(data: pd.DataFrame):
+    """
+    Bring a downloaded frame into the cached layout: flat OHLCV columns,
+    tz-naive sorted DatetimeIndex without duplicates. Returns None if empty.
+    """
+    if data is None or data.empty:
+        return None
+    data = data.copy()
+    # yfinance returns (Price, Ticker) MultiIndex columns even for one ticker
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data = data[[c for c in OHLCV_COLUMNS if c in data.columns]]
+    data = data.loc[:, ~data.columns.duplicated()]
+    index = pd.to_datetime(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.rename("Date")
+    data = data[~data.index.duplicated(keep="last")].sort_index()
+    return data.astype("float64") if not data.empty else None
+
+
+def yf_history(ticker: str, **kwargs):
+    """``Ticker.history`` that raises source errors; None when the range has no bars."""
+    try:
+        return yf.Ticker(ticker).history(**kwargs)
+    except YFTickerMissingError:  # no bars in the range, or an unknown ticker
+        return None
+
+
+def last_session(today=None) -> date:
+    """The last weekday up to ``today``: the latest day that can have a bar."""
+    today = today or date.today()
+    return today - timedelta(days=max(0, today.weekday() - 4))
+
+
+def _slice(frame: pd.DataFrame, start: date, end: date):
+    """Rows with start <= date < end (end exclusive, like yfinance)."""
+    if frame is None:
+        return None
+    out = frame[(frame.index >= pd.Timestamp(start)) & (frame.index < pd.Timestamp(end))]
+    return out if not out.empty else None
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+
+class YFinanceSource:
+    """
+    Downloads daily split- and dividend-adjusted bars from Yahoo Finance.
+    Uses ``Ticker.history`` rather than ``yf.download`` because the latter
+    shares global state between calls and mixes up results when several
+    tickers are fetched from threads. The dates of the corporate actions in
+    the range go into ``attrs["actions"]``.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def fetch(self, ticker: str, start: date, end: date):
+        data = yf_history(ticker, start=str(start), end=str(end), actions=True, timeout=self.timeout)
+        out = normalize_ohlcv(data)
+        if out is not None:
+            acted = np.zeros(len(data), dtype=bool)
+            for column in ("Dividends", "Stock Splits"):
+                if column in data.columns:
+                    acted |= data[column].fillna(0).to_numpy() != 0
+            out.attrs["actions"] = sorted({str(d.date()) for d in pd.to_datetime(data.index[acted])})
+        return out
+
+
+class CSVSource:
+    """
+    Reads ``<directory>/<TICKER>.csv`` files with a Date column followed by
+    OHLCV columns. Handy as a local stand-in for yfinance.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, ticker: str, start: date, end: date):
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return None
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        return _slice(normalize_ohlcv(data), start, end)
+
+
+class SyntheticSource:
+    """
+    Deterministic synthetic business-day bars with an artificial per-call
+    latency. Stands in for a network provider in offline benchmarks.
+    """
+
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency
+        self.seed = seed
+
+    def fetch(self, ticker: str, start: date, end: date):
+        if self.latency:
+            time.sleep(self.latency)
+        index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+        if len(index) == 0:
+            return None
+        # seed from the ticker and the dates themselves so overlapping ranges agree
+        days = (index - pd.Timestamp("2000-01-01")).days.to_numpy()
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        base = 100 + 50 * rng.random()
+        close = base * np.exp(0.0003 * days + 0.1 * np.sin(days / (30 + 20 * rng.random())))
+        spread = 0.01 * close
+        return pd.DataFrame({
+            "Open": close - 0.2 * spread,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": 1e6 * (1.5 + np.cos(days / 7.0)),
+        }, index=index)
+
+
+# ---------------------------
+# Cache
+# ---------------------------
+
+class PriceCache:
+    """
+    Per-ticker Parquet cache with incremental top-up from ``source``.
+
+    Requests end at the last weekday at most. Every range the source
+    answered extends the recorded coverage, even with no rows (the years
+    before a listing), so it is not asked again; only an empty range at the
+    tail stays uncovered, as it may be an outage rather than a gap. Today's
+    bar can still change: coverage stops before it, and it is requested
+    again after ``live_ttl`` seconds and once more after the day is over. A
+    split or dividend that was not seen before replaces the whole cached
+    history, whose adjusted prices it changes. If a top-up fails, the cached
+    rows are served with a warning; only a ticker with nothing cached raises.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, source=None, live_ttl=LIVE_TTL):
+        self.cache_dir = cache_dir
+        self.source = source if source is not None else YFinanceSource()
+        self.live_ttl = live_ttl
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, ticker: str):
+        name = re.sub(r"[^\w.\-^&]", "_", ticker)
+        base = os.path.join(self.cache_dir, name)
+        return base + ".parquet", base + ".json"
+
+    def _lock_for(self, ticker: str):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def load(self, ticker: str):
+        """Return (cached frame, coverage dict) or (None, None)."""
+        data_path, meta_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            return pd.read_parquet(data_path), meta
+        except (OSError, ValueError):
+            # corrupt or half-written entry: treat it as a miss and rebuild
+            return None, None
+
+    def load_meta(self, ticker: str):
+        """The coverage dict alone, without reading the Parquet file; None if missing."""
+        try:
+            with open(self._paths(ticker)[1], encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def data_version(self, ticker: str):
+        """Changes whenever the ticker's Parquet file is rewritten; None if missing."""
+        try:
+            return os.stat(self._paths(ticker)[0]).st_mtime_ns
+        except OSError:
+            return None
+
+    def _store(self, ticker: str, frame, meta: dict):
+        """Write ``meta`` and, unless it is None, ``frame``."""
+        data_path, meta_path = self._paths(ticker)
+        # write to temp files and rename so readers never see a partial file
+        if frame is not None:
+            frame.to_parquet(data_path + ".tmp")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        if frame is not None:
+            os.replace(data_path + ".tmp", data_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def missing_ranges(self, meta, start: date, end: date):
+        """Date ranges [a, b) that still have to be requested from the source."""
+        end = min(end, last_session() + timedelta(days=1))
+        if start >= end:
+            return []
+        if meta is None:
+            return [(start, end)]
+        covered_start = to_date(meta["start"])
+        covered_end = to_date(meta["end"])
+        missing = []
+        # keep coverage contiguous: a gap before/after the cached span is fetched too
+        if start < covered_start:
+            missing.append((start, covered_start))
+        # the tail up to today was requested less than live_ttl seconds ago
+        live = meta.get("live") == str(date.today()) and time.time() - meta.get("fetched", 0) <= self.live_ttl
+        if end > covered_end and not live:
+            missing.append((covered_end, end))
+        return missing
+
+    def _fetch(self, ticker: str, ranges, meta: dict, cached: bool):
+        """
+        Fetch ``ranges`` and record them in ``meta``. Returns the non-empty
+        parts and the corporate action dates they list. A failed range is
+        skipped with a warning if ``cached``, and raises otherwise.
+        """
+        parts, actions = [], set()
+        today = date.today()
+        for a, b in ranges:
+            try:
+                part = self.source.fetch(ticker, a, b)
+            except Exception as e:  # any source error: network, rate limit, provider
+                if not cached:
+                    raise
+                warnings.warn(f"{ticker}: could not fetch {a} to {b} ({type(e).__name__}: {e}); "
+                              "serving cached data", RuntimeWarning)
+                continue
+            if b > today:
+                meta["live"], meta["fetched"] = str(today), time.time()
+            if part is None and "end" in meta and a >= to_date(meta["end"]):
+                continue  # an empty tail can be an outage: not covered, asked again
+            if part is not None:
+                actions.update(part.attrs.get("actions", ()))
+                part = part.copy()
+                part.attrs = {}
+                parts.append(part)
+            meta["start"] = str(min(a, to_date(meta.get("start", a))))
+            # today's bar is not final: coverage stops before it
+            settled = min(b, today)
+            meta["end"] = str(max(settled, to_date(meta.get("end", settled))))
+        return parts, actions
+
+    def get(self, ticker: str, start, end):
+        """
+        Bars for ``ticker`` with start <= date < end, downloading only what
+        is not cached yet. Returns None if no rows are available.
+        """
+        start, end = to_date(start), to_date(end)
+        with self._lock_for(ticker):
+            frame, meta = self.load(ticker)
+            missing = self.missing_ranges(meta, start, end)
+            if not missing:
+                return _slice(frame, start, end)
+
+            new_meta = {} if meta is None else dict(meta)
+            parts, actions = self._fetch(ticker, missing, new_meta, frame is not None)
+            seen = set(new_meta.get("actions", ()))
+            if frame is not None and any(pd.Timestamp(d) > frame.index[0] for d in actions - seen):
+                # a new split or dividend rescales every adjusted bar before it
+                span = (to_date(new_meta["start"]), max([to_date(new_meta["end"])] + [b for _, b in missing]))
+                full, full_actions = self._fetch(ticker, [span], new_meta, True)
+                if not full:
+                    # keep the old prices consistent and try again next time
+                    return _slice(frame, start, end)
+                frame, parts, actions = None, full, actions | full_actions
+            new_meta["actions"] = sorted(seen | actions)
+
+            changed = False
+            if parts:
+                merged = pd.concat(([] if frame is None else [frame]) + parts)
+                merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                # a re-requested bar often comes back unchanged: keep the file (and its readers' version)
+                changed = frame is None or not merged.equals(frame)
+                frame = merged
+            if frame is None:
+                # nothing at all for this ticker: store nothing, so a typo is not cached as "no data"
+                return None
+            if changed or new_meta != meta:
+                self._store(ticker, frame if changed else None, new_meta)
+            return _slice(frame, start, end)
@@ -0,0 +1,209 @@
+"""
+Process-wide, read-only price store shared by all Streamlit sessions.
+
+``PriceCache`` keeps every ticker as Parquet, so each session that reads it
+gets its own decoded pandas copy. ``PriceStore`` sits in front of the cache
+and keeps one memory-mapped NumPy file pair per ticker instead:
+
+    <name>.dates.npy   datetime64 dates, sorted
+    <name>.values.npy  float64 (columns x rows), one contiguous row per column
+
+``get`` returns DataFrames whose columns are zero-copy views into the
+mapping, so memory grows with the number of distinct tickers, not with the
+number of sessions looking at them. Pages are shared through the OS page
+cache, so several server processes on one machine share them too.
+
+Sessions ``lease`` the tickers they show; a lease expires unless it is
+renewed, so a closed browser tab stops pinning its tickers without any
+explicit logout. Tickers no live lease refers to are cold and are evicted,
+least recently used first, once the mapped bytes exceed ``max_bytes``.
+Evicting only drops the store's reference: views a session still holds
+keep their mapping alive until they are garbage collected.
+
+Files are replaced by rename, which leaves existing mappings of the old file
+intact on POSIX systems.
+"""
+import os
+import re
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from price_cache import PriceCache, to_date
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stockindicators", "mmap")
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2  # mapped bytes kept before cold tickers are evicted
+DEFAULT_LEASE_SECONDS = 30 * 60      # a session that stops rerunning releases its tickers after this
+
+
+class _Entry:
+    """One mapped ticker and the coverage of the cache it was built from."""
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, columns, meta: dict, version):
+        self.dates = dates
+        self.values = values
+        self.columns = list(columns)
+        self.meta = meta
+        self.version = version  # PriceCache.data_version of the Parquet file it mirrors
+        self.nbytes = dates.nbytes + values.nbytes
+        self.last_used = time.monotonic()
+
+    def frame(self, start: date, end: date):
+        """Rows with start <= date < end as a DataFrame of views."""
+        lo, hi = np.searchsorted(self.dates, np.array([start, end], dtype=self.dates.dtype))
+        if lo >= hi:
+            return None
+        index = pd.DatetimeIndex(self.dates[lo:hi], name="Date", copy=False)
+        # values[:, lo:hi] is (columns x rows), pandas' own block layout, so
+        # the transpose is wrapped without copying
+        return pd.DataFrame(self.values[:, lo:hi].T, index=index, columns=self.columns, copy=False)
+
+
+class PriceStore:
+    """
+    Memory-mapped, refcounted view of a ``PriceCache``.
+
+    ``get`` tops up the underlying cache exactly like ``PriceCache.get`` and
+    remaps a ticker only when its cached data actually changed.
+    """
+
+    def __init__(self, price_cache: PriceCache, store_dir: str = DEFAULT_STORE_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.price_cache = price_cache
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self._entries = {}  # ticker -> _Entry
+        self._leases = {}   # owner -> (tickers, expires_at)
+        self._lock = threading.RLock()
+        self._ticker_locks = {}
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _paths(self, ticker: str):
+        base = os.path.join(self.store_dir, re.sub(r"[^\w.\-^&]", "_", ticker))
+        return base + ".dates.npy", base + ".values.npy"
+
+    def _lock_for(self, ticker: str):
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+    # ---------------------------
+    # Mapping
+    # ---------------------------
+
+    def _write(self, ticker: str, frame: pd.DataFrame):
+        dates_path, values_path = self._paths(ticker)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        np.save(dates_path + suffix, frame.index.to_numpy())
+        np.save(values_path + suffix, np.ascontiguousarray(frame.to_numpy(dtype="float64").T))
+        os.replace(dates_path + suffix, dates_path)
+        os.replace(values_path + suffix, values_path)
+
+    def _map(self, ticker: str, columns, meta: dict, version) -> _Entry:
+        dates_path, values_path = self._paths(ticker)
+        return _Entry(np.load(dates_path, mmap_mode="r"), np.load(values_path, mmap_mode="r"), columns, meta,
+                      version)
+
+    def _refresh(self, ticker: str, start: date, end: date):
+        """
+        Top up the Parquet cache and remap ``ticker`` if its data changed.
+        Only called when the entry's coverage is stale; the Parquet file is
+        decoded only if the top-up actually rewrote it.
+        """
+        self.price_cache.get(ticker, start, end)
+        version = self.price_cache.data_version(ticker)
+        entry = self._entries.get(ticker)
+        if entry is not None and version == entry.version:
+            # e.g. today's bar re-requested and unchanged, or a range with no rows
+            entry.meta = self.price_cache.load_meta(ticker) or entry.meta
+            return entry
+        frame, meta = self.price_cache.load(ticker)
+        if frame is None:
+            return None
+        unchanged = (
+            entry is not None and entry.columns == list(frame.columns)
+            and entry.values.shape[1] == len(frame)
+            and entry.dates[-1] == frame.index.to_numpy()[-1]
+            and np.array_equal(entry.values[:, -1], frame.iloc[-1].to_numpy(dtype="float64"), equal_nan=True)
+        )
+        if unchanged:
+            entry.meta, entry.version = meta, version
+            return entry
+        self._write(ticker, frame)
+        return self._map(ticker, frame.columns, meta, version)
+
+    def get(self, ticker: str, start, end):
+        """
+        Bars for ``ticker`` with start <= date < end as a read-only DataFrame
+        backed by the shared mapping. Returns None if no rows are available.
+        """
+        start, end = to_date(start), to_date(end)
+        with self._lock_for(ticker):
+            entry = self._entries.get(ticker)
+            # missing_ranges is empty for covered data, so a mapped ticker is
+            # served without touching the Parquet cache
+            if entry is None or self.price_cache.missing_ranges(entry.meta, start, end):
+                entry = self._refresh(ticker, start, end)
+                if entry is None:
+                    return None
+                with self._lock:
+                    self._entries[ticker] = entry
+                self.evict(keep=ticker)
+            entry.last_used = time.monotonic()
+            return entry.frame(start, end)
+
+    # ---------------------------
+    # Leases and eviction
+    # ---------------------------
+
+    def lease(self, owner, tickers):
+        """Pin ``tickers`` for ``owner`` (e.g. a session id), replacing its previous lease."""
+        with self._lock:
+            self._leases[owner] = (frozenset(tickers), time.monotonic() + self.lease_seconds)
+
+    def release(self, owner):
+        with self._lock:
+            self._leases.pop(owner, None)
+
+    def refcounts(self) -> dict:
+        """ticker -> number of live leases on it; expired leases are dropped."""
+        now = time.monotonic()
+        with self._lock:
+            self._leases = {o: lease for o, lease in self._leases.items() if lease[1] > now}
+            counts = dict.fromkeys(self._entries, 0)
+            for tickers, _ in self._leases.values():
+                for t in tickers:
+                    counts[t] = counts.get(t, 0) + 1
+            return counts
+
+    def evict(self, max_bytes=None, keep=None):
+        """
+        Unmap cold tickers, least recently used first, until under
+        ``max_bytes``. ``keep`` is never evicted (the ticker being returned).
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        counts = self.refcounts()
+        evicted = []
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries.values())
+            cold = sorted((e.last_used, t) for t, e in self._entries.items() if counts.get(t, 0) == 0 and t != keep)
+            for _, ticker in cold:
+                if total <= max_bytes:
+                    break
+                total -= self._entries.pop(ticker).nbytes
+                evicted.append(ticker)
+        return evicted
+
+    def stats(self) -> pd.DataFrame:
+        """One row per mapped ticker: rows, MB, live leases, seconds since last use."""
+        counts = self.refcounts()
+        now = time.monotonic()
+        with self._lock:
+            rows = {t: {"rows": e.values.shape[1], "MB": e.nbytes / 1024 ** 2, "leases": counts.get(t, 0),
+                        "idle (s)": now - e.last_used} for t, e in self._entries.items()}
+        table = pd.DataFrame.from_dict(rows, orient="index", columns=["rows", "MB", "leases", "idle (s)"])
+        table.index.name = "ticker"
+        return table
@@ -0,0 +1,167 @@
+"""
+Portfolio value under rebalancing schedules, with cash and trading fees.
+
+A schedule trades the portfolio back to its target weights on its
+rebalance days and holds the shares in between. Whatever the targets do not
+allocate (``1 - sum(weights)``, or a ticker whose signal is off) is held as
+cash earning ``cash_rate``. Every trade pays ``fee_rate`` times its value,
+taken out of the portfolio.
+
+Between two rebalances nothing depends on the portfolio's level, only on
+price ratios since the last rebalance, so once the rebalance days are known
+the whole history of every schedule is one vectorized pass: segment growth
+factors from the price ratios, fee fractions from the drifted weights on
+each rebalance day, and a cumulative product over the segments. Periodic
+and signal-driven schedules know their rebalance days up front; threshold
+schedules find them with a scan that jumps from one rebalance to the next,
+checking the drift of a whole block of days per NumPy call.
+"""
+import numpy as np
+import pandas as pd
+
+from portfolio import ticker_metrics
+
+FREQUENCIES = {"Daily": "D", "Weekly": "W", "Monthly": "M", "Quarterly": "Q", "Yearly": "Y"}
+TRADING_DAYS = 252
+SCAN_BLOCK = 256  # days checked per NumPy call when looking for the next threshold breach
+
+
+def schedule(name: str, weights, freq=None, band=None, signal=None) -> dict:
+    """
+    Rebalancing policy for ``simulate_rebalancing``.
+
+    ``freq`` rebalances on the first trading day of every period (a pandas
+    period alias such as "M", or an int for every n trading days); ``band``
+    rebalances when any weight drifts more than ``band`` from its target;
+    ``signal`` (dates x tickers, e.g. the engine's SMA Signal) holds a
+    ticker's weight only while its signal is positive, keeping the rest in
+    cash, and rebalances when the held set changes. Without any of them the
+    portfolio is bought once and held.
+    """
+    return {"name": name, "weights": np.asarray(weights, dtype="float64"), "freq": freq, "band": band,
+            "signal": signal}
+
+
+def periodic_events(index: pd.DatetimeIndex, freq) -> np.ndarray:
+    """True on the first trading day of every ``freq`` period (and on day 0)."""
+    if isinstance(freq, (int, np.integer)):
+        return np.arange(len(index)) % int(freq) == 0
+    periods = index.to_period(freq).asi8
+    return np.r_[True, periods[1:] != periods[:-1]]
+
+
+def _targets(spec: dict, prices: pd.DataFrame):
+    """(dates x tickers) target weights and the days the schedule must trade."""
+    n_days, n_assets = prices.shape
+    weights = spec["weights"]
+    if weights.shape != (n_assets,):
+        raise ValueError(f"schedule {spec['name']!r} has {weights.size} weights for {n_assets} tickers")
+    target = np.broadcast_to(weights, (n_days, n_assets))
+    forced = np.zeros(n_days, dtype=bool)
+    forced[0] = True
+    if spec["signal"] is not None:
+        held = spec["signal"].reindex(index=prices.index, columns=prices.columns).ffill().fillna(0).to_numpy() > 0
+        target = weights * held
+        forced[1:] |= (held[1:] != held[:-1]).any(axis=1)
+    if spec["freq"] is not None:
+        forced |= periodic_events(prices.index, spec["freq"])
+    return np.ascontiguousarray(target), forced
+
+
+def _cash_growth(cash_rate: float, days) -> np.ndarray:
+    return (1.0 + cash_rate) ** (np.asarray(days, dtype="float64") / TRADING_DAYS)
+
+
+def threshold_events(values: np.ndarray, target: np.ndarray, forced: np.ndarray, band: float,
+                     cash_rate=0.0, block=SCAN_BLOCK) -> np.ndarray:
+    """
+    Rebalance days of a schedule that also trades whenever a weight drifts
+    more than ``band`` from its target. Python only loops once per
+    rebalance (or per ``block`` quiet days); each step evaluates the drift
+    of up to ``block`` days ahead at once.
+    """
+    n_days = len(values)
+    events = forced.copy()
+    offsets = np.arange(1, block + 1)
+    last = 0    # the last rebalance: drift is measured from its weights
+    cursor = 0  # the last day checked
+    while cursor < n_days - 1:
+        days = cursor + offsets[:n_days - 1 - cursor]
+        held = target[last] * (values[days] / values[last])
+        cash = (1.0 - target[last].sum()) * _cash_growth(cash_rate, days - last)
+        weights = held / (held.sum(axis=1) + cash)[:, None]
+        trigger = forced[days] | (np.abs(weights - target[days]).max(axis=1) > band)
+        if trigger.any():
+            last = cursor = int(days[np.argmax(trigger)])
+            events[last] = True
+        else:
+            cursor = int(days[-1])
+    return events
+
+
+def _simulate(values: np.ndarray, target: np.ndarray, events: np.ndarray, fee_rate: float, cash_rate: float):
+    """
+    Value, cash, fees and turnover of one schedule per unit of starting
+    capital, given its rebalance days.
+    """
+    n_days = len(values)
+    starts = np.flatnonzero(events)
+    segment = np.cumsum(events) - 1
+    base = starts[segment]
+    days = np.arange(n_days)
+    seg_target = target[base]
+    seg_cash = 1.0 - seg_target.sum(axis=1)
+    growth_cash = seg_cash * _cash_growth(cash_rate, days - base)
+    # growth of the post-trade value since the segment's rebalance
+    growth = (seg_target * (values / values[base])).sum(axis=1) + growth_cash
+
+    # drifted weights just before each rebalance, valued with the previous segment
+    prev, cur = starts[:-1], starts[1:]
+    held = target[prev] * (values[cur] / values[prev])
+    pre_growth = held.sum(axis=1) + (1.0 - target[prev].sum(axis=1)) * _cash_growth(cash_rate, cur - prev)
+    drifted = held / pre_growth[:, None]
+    turnover = np.r_[target[0].sum(), np.abs(target[cur] - drifted).sum(axis=1)]
+    kept = 1.0 - fee_rate * turnover
+    post_value = kept[0] * np.cumprod(np.r_[1.0, pre_growth * kept[1:]])
+    pre_value = np.r_[1.0, post_value[:-1] * pre_growth]
+
+    value = post_value[segment] * growth
+    cash = post_value[segment] * growth_cash
+    fees = pre_value * fee_rate * turnover
+    return value, cash, fees, turnover
+
+
+def simulate_rebalancing(price_df: pd.DataFrame, schedules, initial=100_000.0, fee_rate=0.001,
+                         cash_rate=0.0, block=SCAN_BLOCK) -> dict:
+    """
+    Simulate every schedule over ``price_df`` (dates x tickers), starting
+    from ``initial`` in cash and buying the targets on the first day.
+
+    Returns a dict with ``value`` and ``cash`` (dates x schedule DataFrames),
+    ``rebalances`` (dates x schedule booleans) and ``summary`` (one row per
+    schedule: the ``compute_portfolio_metrics`` figures of its value series,
+    plus rebalance count, fees paid and average turnover per rebalance).
+    """
+    prices = price_df.ffill().dropna()
+    if len(prices) < 2:
+        raise ValueError("need at least two dates with prices for every ticker")
+    values = prices.to_numpy(dtype="float64")
+    out = {"value": {}, "cash": {}, "rebalances": {}}
+    extra = {}
+    for spec in schedules:
+        target, forced = _targets(spec, prices)
+        events = forced
+        if spec["band"] is not None:
+            events = threshold_events(values, target, forced, spec["band"], cash_rate, block)
+        value, cash, fees, turnover = _simulate(values, target, events, fee_rate, cash_rate)
+        name = spec["name"]
+        out["value"][name] = value * initial
+        out["cash"][name] = cash * initial
+        out["rebalances"][name] = events
+        extra[name] = {"Rebalances": int(events.sum()) - 1, "Fees Paid": float(fees.sum()) * initial,
+                       "Avg Turnover": float(turnover[1:].mean()) if len(turnover) > 1 else 0.0,
+                       "Final Value": float(value[-1]) * initial}
+    for key in out:
+        out[key] = pd.DataFrame(out[key], index=prices.index)
+    out["summary"] = ticker_metrics(out["value"]).join(pd.DataFrame.from_dict(extra, orient="index"))
+    return out
@@ -0,0 +1,161 @@
+"""
+Rolling-window risk analytics for the portfolio section.
+
+``compute_portfolio_metrics`` summarizes the whole period; this module gives
+the same figures over trailing windows (30, 90 and 252 days by default):
+annualized volatility, Sharpe ratio (no risk-free rate, as in
+``compute_portfolio_metrics``), beta against a benchmark index, and the
+pairwise correlation matrix of the tickers on every date.
+
+Every window statistic is built from trailing sums of x, y, x*x and x*y,
+taken as differences of cumulative sums, so one pass costs the same for any
+window length and there is no ``rolling().apply`` callback. Correlation
+matrices are built in blocks of dates, so memory stays bounded for hundreds
+of tickers. The inputs are shifted by their column means first, the same
+trick Welford's update uses to keep the sums small and the differences free
+of cancellation.
+"""
+import numpy as np
+import pandas as pd
+
+WINDOWS = (30, 90, 252)
+TRADING_DAYS = 252
+CHUNK_BYTES = 64 * 1024 ** 2  # working memory of the rolling correlation blocks
+
+
+# ---------------------------
+# Array kernels
+# ---------------------------
+
+def window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing sums over ``window`` rows down axis 0 of an array without NaNs.
+    Rows before the first full window are NaN.
+    """
+    csum = np.cumsum(values, axis=0)
+    out = np.full_like(csum, np.nan)
+    if window > len(values):
+        return out
+    out[window - 1] = csum[window - 1]
+    out[window:] = csum[window:] - csum[:-window]
+    return out
+
+
+def rolling_moments(x: np.ndarray, window: int, y=None):
+    """
+    Trailing (mean of x, sample variance of x) down each column, plus the
+    sample covariance of x with ``y`` (broadcast against x) if given.
+    """
+    shift_x = x.mean(axis=0)
+    xc = x - shift_x
+    sx, sxx = window_sums(xc, window), window_sums(xc * xc, window)
+    mean = sx / window + shift_x
+    var = (sxx - sx * sx / window) / (window - 1)
+    if y is None:
+        return mean, var, None
+    yc = y - y.mean(axis=0)
+    sy, sxy = window_sums(yc, window), window_sums(xc * yc, window)
+    cov = (sxy - sx * sy / window) / (window - 1)
+    return mean, var, cov
+
+
+# ---------------------------
+# Portfolio analytics
+# ---------------------------
+
+def rolling_risk(port_returns: pd.Series, benchmark_returns=None, windows=WINDOWS,
+                 trading_days=TRADING_DAYS) -> pd.DataFrame:
+    """
+    Rolling "Volatility", "Sharpe Ratio" and, with ``benchmark_returns``,
+    "Beta" of a daily return series, one column per (metric, window), e.g.
+    "Sharpe Ratio 90d". Only dates where both series have a return are used.
+    """
+    if benchmark_returns is not None:
+        joined = pd.concat([port_returns, benchmark_returns], axis=1, join="inner").dropna()
+        port_returns, benchmark = joined.iloc[:, 0], joined.iloc[:, 1].to_numpy(dtype="float64")
+    else:
+        port_returns = port_returns.dropna()
+    x = port_returns.to_numpy(dtype="float64")
+    columns = {}
+    for window in windows:
+        if benchmark_returns is None:
+            mean, var, _ = rolling_moments(x, window)
+        else:
+            # beta = cov(p, b) / var(b): moments of b, covariance with p
+            mean_b, var_b, cov = rolling_moments(benchmark, window, x)
+            mean, var, _ = rolling_moments(x, window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vol = np.sqrt(np.maximum(var, 0.0) * trading_days)
+            columns[f"Volatility {window}d"] = vol
+            columns[f"Sharpe Ratio {window}d"] = np.where(vol > 0, mean * trading_days / vol, np.nan)
+            if benchmark_returns is not None:
+                columns[f"Beta {window}d"] = np.where(var_b > 0, cov / var_b, np.nan)
+    return pd.DataFrame(columns, index=port_returns.index)
+
+
+def _correlation_chunks(returns: pd.DataFrame, window: int, chunk_bytes=CHUNK_BYTES):
+    """
+    Yield (first row, (rows x tickers x tickers) correlations) over
+    consecutive blocks of dates, holding about ``chunk_bytes`` at a time.
+
+    The window sum of outer products at each block's first date is one
+    matrix product over the window; inside the block it is carried forward
+    by adding the entering day's outer product and removing the leaving
+    day's, as a cumulative sum over the block.
+    """
+    x = returns.to_numpy(dtype="float64")
+    T, N = x.shape
+    xc = x - x.mean(axis=0)
+    sx = window_sums(xc, window)
+    step = max(1, chunk_bytes // (4 * 8 * N * N))  # four (rows x N x N) temporaries per block
+    for a in range(0, T, step):
+        b = min(T, a + step)
+        lo = max(0, a - window)
+        start = xc[lo:a].T @ xc[lo:a]
+        delta = np.einsum("ti,tj->tij", xc[a:b], xc[a:b])
+        leaving = np.arange(a, b) - window
+        has_leaving = leaving >= 0
+        if has_leaving.any():
+            left = xc[leaving[has_leaving]]
+            delta[has_leaving] -= np.einsum("ti,tj->tij", left, left)
+        sxy = np.cumsum(delta, axis=0, out=delta)
+        sxy += start
+        s = sx[a:b]
+        cov = sxy - s[:, :, None] * s[:, None, :] / window
+        std = np.sqrt(np.maximum(np.diagonal(cov, axis1=1, axis2=2), 0.0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov /= std[:, :, None] * std[:, None, :]
+        yield a, np.clip(cov, -1.0, 1.0, out=cov)
+
+
+def rolling_correlation(returns: pd.DataFrame, window: int, rows=None, chunk_bytes=CHUNK_BYTES) -> np.ndarray:
+    """
+    (dates x tickers x tickers) trailing correlation matrices of a return
+    matrix without NaNs; matrices before the first full window are NaN.
+    ``rows`` (row positions, e.g. [-1] for the latest) returns only those
+    matrices: the full stack is dates x N x N floats, about 5 GB for ten
+    years of 500 tickers, while the work runs in ``chunk_bytes`` blocks
+    either way.
+    """
+    T, N = returns.shape
+    rows = np.arange(T) if rows is None else np.arange(T)[np.asarray(rows)]
+    out = np.empty((len(rows), N, N))
+    for a, corr in _correlation_chunks(returns, window, chunk_bytes):
+        hit = (rows >= a) & (rows < a + len(corr))
+        out[hit] = corr[rows[hit] - a]
+    return out
+
+
+def rolling_average_correlation(returns: pd.DataFrame, window: int, chunk_bytes=CHUNK_BYTES) -> np.ndarray:
+    """``average_correlation`` of every date's matrix, without keeping the matrices."""
+    return np.concatenate([np.empty(0)] + [average_correlation(corr)
+                                           for _, corr in _correlation_chunks(returns, window, chunk_bytes)])
+
+
+def average_correlation(corr: np.ndarray) -> np.ndarray:
+    """Mean off-diagonal correlation of each matrix in a (dates x n x n) stack."""
+    n = corr.shape[1]
+    if n < 2:
+        return np.full(len(corr), np.nan)
+    upper = np.triu_indices(n, k=1)
+    return corr[:, upper[0], upper[1]].mean(axis=1)
@@ -0,0 +1,369 @@
+"""
+Universe screener backed by a precomputed, incrementally updated index.
+
+The index holds one row per ticker with the latest values a screen filters
+on: close and volume against its recent average, the SMA crossover state
+and how many bars ago the last crossover happened, EMA / RSI / MACD, short
+returns, distance from the 52-week high and the risk metrics of the last
+year. It is saved as Parquet next to a JSON file with the settings it was
+built with, so a query is a ``DataFrame.query`` over a few thousand rows
+and answers in milliseconds. Queries come from users of a shared app, so
+they are checked first: only column names, numbers, strings, comparisons
+and and / or / not are allowed (``check_query``).
+
+    python screener.py universe.txt --synthetic --screen "Fresh golden cross, volume > 2x average"
+    python screener.py universe.txt --no-update --query "rsi < 30 and signal == 1" --sort rsi
+
+``update`` only recomputes tickers whose last bar changed since the index
+was built. Each row is computed from the ticker's last ``lookback`` bars
+(enough for a year of metrics plus the warm-up of the recursive averages),
+right-aligned so every ticker is measured on its own dates, in one
+vectorized pass per chunk. Crossovers older than that window are carried
+from the previous row: their age grows by the number of new bars.
+"""
+import argparse
+import ast
+import json
+import os
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from batch_fetch import fetch_many
+from indicator_engine import rolling_mean, crossover_signals, compute_indicators
+from pipeline import read_universe
+from price_cache import PriceCache, YFinanceSource, CSVSource, SyntheticSource, DEFAULT_CACHE_DIR
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stockindicators", "screener")
+LOOKBACK = 400      # bars per ticker the index rows are computed from
+CHUNK_SIZE = 500    # tickers per vectorized pass
+TRADING_DAYS = 252
+RETURN_DAYS = (1, 5, 20)
+
+SCREENS = {
+    # name -> (query, column to sort by, descending)
+    "Fresh golden cross, volume > 2x average": (
+        "cross_type == 'BUY' and cross_age <= 5 and volume_ratio > 2", "volume_ratio", True),
+    "Fresh death cross": ("cross_type == 'SELL' and cross_age <= 5", "cross_age", False),
+    "Oversold in an uptrend (RSI < 30, short SMA above long)": ("rsi < 30 and signal == 1", "rsi", False),
+    "Within 2% of the 52-week high": ("pct_from_high > -0.02", "return_20d", True),
+    "Best risk-adjusted (Sharpe > 1)": ("sharpe_ratio > 1", "sharpe_ratio", True),
+}
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+
+class QueryError(ValueError):
+    """A screener query outside the allowed subset, or one that fails on the index."""
+
+
+_QUERY_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Name, ast.Load, ast.Constant,
+)
+
+
+def check_query(expr: str, columns) -> str:
+    """
+    Raise QueryError unless ``expr`` only compares ``columns`` with numbers
+    and strings and combines comparisons with and / or / not. Everything
+    else (attribute and method calls, ``@`` variables, backticks, indexing)
+    is rejected before pandas evaluates anything.
+    """
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except (SyntaxError, ValueError) as e:
+        raise QueryError(f"syntax error: {e.msg if isinstance(e, SyntaxError) else e}") from None
+    columns = set(columns)
+    for node in ast.walk(tree):
+        if not isinstance(node, _QUERY_NODES):
+            raise QueryError(f"unsupported syntax in query: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in columns:
+            raise QueryError(f"unknown column {node.id!r}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool)
+                                               or not isinstance(node.value, (int, float, str))):
+            raise QueryError(f"unsupported value in query: {node.value!r}")
+    return expr
+
+
+# ---------------------------
+# Index rows
+# ---------------------------
+
+def index_rows(data_map: dict, sma_short=20, sma_long=50, volume_window=20, lookback=LOOKBACK) -> pd.DataFrame:
+    """
+    One index row per ticker of a {ticker: OHLCV frame} map, from each
+    frame's last ``lookback`` bars. ``cross_age`` is NaN when no crossover
+    happened in that window; crossovers during the long SMA's warm-up of a
+    truncated history are ignored.
+    """
+    tickers = list(data_map)
+    tails = {t: df.tail(lookback) for t, df in data_map.items()}
+    panel = pd.concat({t: df[["Close", "Volume"]] for t, df in tails.items()}, axis=1, join="outer", sort=True)
+    close = panel.xs("Close", axis=1, level=1)[tickers].to_numpy(dtype="float64")
+    volume = panel.xs("Volume", axis=1, level=1)[tickers].to_numpy(dtype="float64")
+
+    # move each ticker's bars to the bottom so its last bar is the last row
+    valid = ~np.isnan(close)
+    order = np.argsort(valid, axis=0, kind="stable")
+    close = np.take_along_axis(close, order, axis=0)
+    volume = np.take_along_axis(volume, order, axis=0)
+    dates = np.take_along_axis(np.broadcast_to(panel.index.to_numpy()[:, None], order.shape), order, axis=0)
+    T, N = close.shape
+    first = T - valid.sum(axis=0)
+    valid = np.arange(T)[:, None] >= first[None, :]
+    dates = np.where(valid, dates, np.datetime64("NaT"))
+
+    sma_s, sma_l = rolling_mean(close, sma_short), rolling_mean(close, sma_long)
+    signal, crossover = crossover_signals(sma_s, sma_l, valid)
+    truncated = np.array([len(data_map[t]) > lookback for t in tickers])
+    warm = first + np.where(truncated, sma_long, 0)
+    crossed = (crossover != 0) & (np.arange(T)[:, None] >= warm[None, :])
+    cross_row = T - 1 - np.argmax(crossed[::-1], axis=0)
+    has_cross = crossed.any(axis=0)
+    cols = np.arange(N)
+
+    ind = compute_indicators(close, indicators=("EMA", "RSI", "MACD"))
+    avg_volume = rolling_mean(volume, volume_window)[T - 2] if T > 1 else np.full(N, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rows = {
+            "date": dates[T - 1],
+            "close": close[T - 1],
+            "volume": volume[T - 1],
+            "avg_volume": avg_volume,
+            "volume_ratio": volume[T - 1] / avg_volume,
+            f"sma_{sma_short}": sma_s[T - 1],
+            f"sma_{sma_long}": sma_l[T - 1],
+            "signal": signal[T - 1],
+            "cross_type": np.where(has_cross, np.where(crossover[cross_row, cols] > 0, "BUY", "SELL"), None),
+            "cross_date": np.where(has_cross, dates[cross_row, cols], np.datetime64("NaT")),
+            "cross_age": np.where(has_cross, T - 1 - cross_row, np.nan),
+            "ema": ind["EMA"][T - 1],
+            "rsi": ind["RSI"][T - 1],
+            "macd": ind["MACD"][T - 1],
+            "macd_hist": ind["MACD_Hist"][T - 1],
+        }
+        for days in RETURN_DAYS:
+            rows[f"return_{days}d"] = close[T - 1] / close[T - 1 - days] - 1 if days < T else np.nan
+        year = close[-(TRADING_DAYS + 1):]
+        rows["pct_from_high"] = close[T - 1] / np.nanmax(year, axis=0) - 1
+        rows.update(_risk_metrics(year))
+    table = pd.DataFrame(rows, index=pd.Index(tickers, name="ticker"))
+    return table.astype({"signal": np.int64, "cross_type": "object"})
+
+
+def _risk_metrics(close: np.ndarray) -> dict:
+    """compute_portfolio_metrics' annual figures for each column (no risk-free rate)."""
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # tickers with < 2 prices
+        returns = close[1:] / close[:-1] - 1.0
+        ann_return = np.nanmean(returns, axis=0) * TRADING_DAYS
+        ann_vol = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        growth = np.where(np.isnan(close), np.nan, close / close[np.argmax(~np.isnan(close), axis=0),
+                                                                 np.arange(close.shape[1])])
+        drawdown = np.nanmin(growth / np.fmax.accumulate(growth, axis=0) - 1, axis=0)
+        return {"annual_return": ann_return, "annual_volatility": ann_vol,
+                "sharpe_ratio": np.where(ann_vol > 0, ann_return / ann_vol, np.nan), "max_drawdown": drawdown}
+
+
+# ---------------------------
+# Index
+# ---------------------------
+
+class ScreenerIndex:
+    """
+    Persistent screening index of a ticker universe.
+
+    ``update`` merges new price data, ``query`` filters the in-memory table.
+    Changing any setting rebuilds the index from scratch on the next update.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, sma_short=20, sma_long=50, volume_window=20,
+                 lookback=LOOKBACK):
+        self.index_dir = index_dir
+        self.settings = {"sma_short": int(sma_short), "sma_long": int(sma_long),
+                         "volume_window": int(volume_window), "lookback": int(lookback)}
+        self.table = pd.DataFrame()
+        self.updated = None
+        self._lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+        self.load()
+
+    def _paths(self):
+        return os.path.join(self.index_dir, "index.parquet"), os.path.join(self.index_dir, "index.json")
+
+    def load(self):
+        data_path, meta_path = self._paths()
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return self
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("settings") == self.settings:
+                self.table, self.updated = pd.read_parquet(data_path), meta.get("updated")
+        except (OSError, ValueError):
+            pass  # corrupt or half-written index: rebuilt by the next update
+        return self
+
+    def save(self):
+        data_path, meta_path = self._paths()
+        # write to temp files and rename so readers never see a partial file
+        self.table.to_parquet(data_path + ".tmp")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "updated": self.updated}, f)
+        os.replace(data_path + ".tmp", data_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def stale(self, data_map: dict) -> list:
+        """Tickers of ``data_map`` whose last bar is not the one in the index."""
+        tickers = [t for t, df in data_map.items() if df is not None and not df.empty]
+        if self.table.empty:
+            return tickers
+        last_date = pd.DatetimeIndex([data_map[t].index[-1] for t in tickers])
+        last_close = np.array([data_map[t]["Close"].iloc[-1] for t in tickers], dtype="float64")
+        indexed = self.table.reindex(tickers)
+        same = (last_date == pd.DatetimeIndex(indexed["date"])) & (last_close == indexed["close"].to_numpy())
+        return [t for t, keep in zip(tickers, same) if not keep]
+
+    def update(self, data_map: dict, drop_missing=False, chunk_size=CHUNK_SIZE) -> list:
+        """
+        Recompute the rows of tickers with new bars and save the index.
+        ``drop_missing`` removes tickers that are not in ``data_map``.
+        Returns the tickers that were recomputed.
+        """
+        with self._lock:
+            stale = self.stale(data_map)
+            parts = [index_rows({t: data_map[t] for t in stale[i:i + chunk_size]}, **self.settings)
+                     for i in range(0, len(stale), chunk_size)]
+            table = self.table
+            if drop_missing:
+                table = table[table.index.isin(list(data_map))]
+            if parts:
+                fresh = pd.concat(parts)
+                carried = fresh.index.intersection(table.index)
+                if len(carried):
+                    fresh.loc[carried] = _carry_crossovers(fresh.loc[carried], table.loc[carried],
+                                                           {t: data_map[t] for t in carried})
+                table = pd.concat([table.drop(index=fresh.index, errors="ignore"), fresh]).sort_index()
+            self.table = table
+            self.updated = datetime.now().isoformat(timespec="seconds")
+            self.save()
+            return stale
+
+    def refresh(self, tickers, price_cache: PriceCache, end=None, fetch_workers=16):
+        """
+        Top up ``price_cache`` with the last ``lookback`` bars of every ticker
+        and update the index. Returns (recomputed tickers, fetch failures).
+        """
+        end = pd.Timestamp(end or datetime.today() + timedelta(days=1)).date()
+        # calendar days covering ``lookback`` trading days, holidays included
+        start = end - timedelta(days=int(self.settings["lookback"] * 1.5) + 10)
+        data_map, failures = fetch_many(tickers, lambda t: price_cache.get(t, start, end),
+                                        max_workers=fetch_workers, timeout=60.0, retries=2)
+        return self.update(data_map), failures
+
+    def query(self, expr=None, sort=None, descending=True, limit=None) -> pd.DataFrame:
+        """
+        Rows matching a query such as "rsi < 30 and volume_ratio > 2" (see
+        ``check_query``), optionally sorted and truncated. Raises QueryError
+        for a query that is not allowed or does not apply to the columns.
+        """
+        table = self.table
+        if table.empty:
+            return table
+        if expr:
+            check_query(expr, table.columns)
+            try:
+                table = table.query(expr)
+            except (TypeError, ValueError) as e:  # e.g. a number compared with a text column
+                raise QueryError(f"query failed: {e}") from None
+        if sort:
+            table = table.sort_values(sort, ascending=not descending, na_position="last")
+        return table if limit is None else table.head(limit)
+
+    def screen(self, name: str, limit=None) -> pd.DataFrame:
+        """Rows of one of the preset ``SCREENS``."""
+        if name not in SCREENS:
+            raise ValueError(f"unknown screen {name!r}; choose from {list(SCREENS)}")
+        expr, sort, descending = SCREENS[name]
+        return self.query(expr, sort, descending, limit)
+
+
+def _carry_crossovers(fresh: pd.DataFrame, previous: pd.DataFrame, data_map: dict) -> pd.DataFrame:
+    """
+    Keep the previous row's crossover where the new window has none: it is
+    older than the window, and now older by the number of new bars.
+    """
+    fresh = fresh.copy()
+    lost = fresh["cross_type"].isna() & previous["cross_type"].notna()
+    for t in fresh.index[lost]:
+        new_bars = int((data_map[t].index > previous.at[t, "date"]).sum())
+        fresh.loc[t, ["cross_type", "cross_date", "cross_age"]] = [
+            previous.at[t, "cross_type"], previous.at[t, "cross_date"], previous.at[t, "cross_age"] + new_bars]
+    return fresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("universe", nargs="?", help="ticker universe file (.txt or .csv); needed to update")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--no-update", action="store_true", help="query the saved index without fetching")
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument("--screen", choices=list(SCREENS), help="preset screen")
+    query.add_argument("--query", help="comparisons of index columns joined by and / or / not")
+    parser.add_argument("--sort", default=None, help="column to sort by (descending unless --ascending)")
+    parser.add_argument("--ascending", action="store_true")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--sma-short", type=int, default=20)
+    parser.add_argument("--sma-long", type=int, default=50)
+    parser.add_argument("--fetch-workers", type=int, default=16)
+    parser.add_argument("--cache-dir", default=None,
+                        help="price cache (default: the app's cache for Yahoo, <index-dir>/price_cache otherwise)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--csv-dir", help="read <TICKER>.csv files instead of Yahoo Finance")
+    source.add_argument("--synthetic", action="store_true", help="deterministic synthetic prices (offline)")
+    args = parser.parse_args()
+
+    index = ScreenerIndex(args.index_dir, sma_short=args.sma_short, sma_long=args.sma_long)
+    if not args.no_update:
+        if not args.universe:
+            parser.error("a universe file is needed unless --no-update is given")
+        if args.csv_dir:
+            data_source = CSVSource(args.csv_dir)
+        elif args.synthetic:
+            data_source = SyntheticSource()
+        else:
+            data_source = YFinanceSource()
+        cache_dir = args.cache_dir or (os.environ.get("STOCK_CACHE_DIR", DEFAULT_CACHE_DIR)
+                                       if isinstance(data_source, YFinanceSource)
+                                       else os.path.join(args.index_dir, "price_cache"))
+        tickers = read_universe(args.universe)
+        t0 = time.perf_counter()
+        recomputed, failures = index.refresh(tickers, PriceCache(cache_dir, source=data_source),
+                                             fetch_workers=args.fetch_workers)
+        print(f"{len(recomputed)} of {len(tickers)} tickers recomputed in {time.perf_counter() - t0:.2f}s, "
+              f"{len(index.table)} in the index -> {args.index_dir}")
+        for t, reason in failures.items():
+            print(f"  failed {t}: {reason}")
+
+    t0 = time.perf_counter()
+    if args.screen:
+        result = index.screen(args.screen, limit=args.limit)
+    else:
+        try:
+            result = index.query(args.query, args.sort, not args.ascending, args.limit)
+        except QueryError as e:
+            parser.error(str(e))
+    elapsed = time.perf_counter() - t0
+    print(result.to_string())
+    print(f"{len(result)} rows in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
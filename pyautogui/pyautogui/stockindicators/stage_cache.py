@@ -0,0 +1,69 @@
+"""
+Stage-level memoization for Streamlit reruns.
+
+Every widget change reruns ``app.py`` from the top. Each analysis stage
+(fetch, indicators, model fit, portfolio metrics, charts...) is run through
+``StageCache.run`` with a key made of exactly the inputs it depends on, so a
+rerun only recomputes the stages whose inputs changed; a stage whose key
+includes an upstream stage's key is recomputed whenever that stage is.
+
+The app keeps one ``StageCache`` per browser session in ``st.session_state``;
+the class itself has no Streamlit dependency.
+"""
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+ENTRIES_PER_STAGE = 4  # recent input combinations kept per stage
+
+
+class StageCache:
+    """LRU of stage results keyed by (stage, inputs), with hit/miss statistics."""
+
+    def __init__(self, entries_per_stage=ENTRIES_PER_STAGE):
+        self.entries_per_stage = entries_per_stage
+        self._results = {}  # stage -> OrderedDict(key -> (value, seconds))
+        self._stats = {}    # stage -> counters
+
+    def run(self, stage: str, key, fn, *args, **kwargs):
+        """
+        ``fn(*args, **kwargs)`` memoized under ``key``. ``key`` must be
+        hashable and cover every input the result depends on; ``args`` are
+        not hashed, so pass data whose identity is already in the key.
+        """
+        results = self._results.setdefault(stage, OrderedDict())
+        stats = self._stats.setdefault(stage, {"hits": 0, "misses": 0, "last_seconds": 0.0, "saved_seconds": 0.0})
+        if key in results:
+            results.move_to_end(key)
+            value, seconds = results[key]
+            stats["hits"] += 1
+            stats["saved_seconds"] += seconds
+            stats["last"] = "hit"
+            return value
+        t0 = time.perf_counter()
+        value = fn(*args, **kwargs)
+        seconds = time.perf_counter() - t0
+        results[key] = (value, seconds)
+        while len(results) > self.entries_per_stage:
+            results.popitem(last=False)
+        stats["misses"] += 1
+        stats["last_seconds"] = seconds
+        stats["last"] = "miss"
+        return value
+
+    def new_run(self):
+        """Mark the start of a rerun; stages not run again show as skipped."""
+        for stats in self._stats.values():
+            stats["last"] = "skipped"
+
+    def clear(self):
+        self._results.clear()
+        self._stats.clear()
+
+    def stats(self) -> pd.DataFrame:
+        """One row per stage: hits, misses, last run, compute and saved time."""
+        table = pd.DataFrame.from_dict(self._stats, orient="index",
+                                       columns=["last", "hits", "misses", "last_seconds", "saved_seconds"])
+        table.index.name = "stage"
+        return table.rename(columns={"last": "last run", "last_seconds": "compute (s)", "saved_seconds": "saved (s)"})
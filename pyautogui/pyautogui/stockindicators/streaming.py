@@ -0,0 +1,243 @@
+"""
+Incremental indicator state for live bar updates.
+
+``IncrementalIndicators`` is seeded once from a history DataFrame and then
+updated bar by bar in O(1): ring-buffer SMAs and Bollinger Bands, EMA, RSI
+(Wilder smoothing) and MACD. Each update reports the same SMA crossover
+events as ``generate_trade_points`` ("BUY" when Crossover == 2, "SELL" when
+Crossover == -2), so the signal logic can run on a bar stream for hundreds
+of symbols without re-scanning history.
+
+Conventions (shared with the vectorized indicator functions):
+- SMA / Bollinger middle band: trailing mean with min_periods=1
+- Bollinger width: population standard deviation (ddof=0)
+- EMA: ``ewm(span=n, adjust=False)``, seeded with the first close
+- RSI: Wilder smoothing, ``ewm(alpha=1/n, adjust=False)`` of gains/losses
+- MACD: EMA(fast) - EMA(slow), signal line EMA(signal) of MACD
+"""
+import pandas as pd
+
+
+# ---------------------------
+# Building blocks
+# ---------------------------
+
+class RingBuffer:
+    """Fixed-size window of the last values with O(1) mean and std."""
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.values = [0.0] * self.window
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_resync = 0
+
+    def push(self, x: float):
+        x = float(x)
+        if self.count == self.window:
+            old = self.values[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.pos] = x
+        self.total += x
+        self.total_sq += x * x
+        self.pos = (self.pos + 1) % self.window
+        # recompute the running sums once per window to stop rounding drift
+        self._since_resync += 1
+        if self._since_resync >= self.window:
+            self._since_resync = 0
+            live = self.values if self.count == self.window else self.values[:self.count]
+            self.total = sum(live)
+            self.total_sq = sum(v * v for v in live)
+
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+    def std(self):
+        if not self.count:
+            return float("nan")
+        m = self.total / self.count
+        return max(self.total_sq / self.count - m * m, 0.0) ** 0.5
+
+
+class EMA:
+    """Exponential moving average, ``ewm(alpha, adjust=False)``."""
+
+    def __init__(self, alpha: float, value=None):
+        self.alpha = alpha
+        self.value = value
+
+    @classmethod
+    def from_span(cls, span: int, value=None):
+        return cls(2.0 / (span + 1.0), value)
+
+    def push(self, x: float):
+        self.value = float(x) if self.value is None else self.value + self.alpha * (float(x) - self.value)
+        return self.value
+
+
+def _last_ewm(series: pd.Series, alpha: float):
+    series = series.dropna()
+    if series.empty:
+        return None
+    return float(series.ewm(alpha=alpha, adjust=False).mean().iloc[-1])
+
+
+# ---------------------------
+# Per-symbol state
+# ---------------------------
+
+class IncrementalIndicators:
+    """SMA crossover plus EMA, RSI, MACD and Bollinger state for one symbol."""
+
+    def __init__(self, sma_short=20, sma_long=50, ema_span=20, rsi_period=14,
+                 macd_fast=12, macd_slow=26, macd_signal=9, bb_window=20, bb_k=2.0):
+        self.sma_short = RingBuffer(sma_short)
+        self.sma_long = RingBuffer(sma_long)
+        self.bollinger = RingBuffer(bb_window)
+        self.bb_k = bb_k
+        self.ema = EMA.from_span(ema_span)
+        self.macd_fast = EMA.from_span(macd_fast)
+        self.macd_slow = EMA.from_span(macd_slow)
+        self.macd_signal = EMA.from_span(macd_signal)
+        self.rsi_gain = EMA(1.0 / rsi_period)
+        self.rsi_loss = EMA(1.0 / rsi_period)
+        self.prev_close = None
+        self.signal = 0
+        self.last_time = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **params):
+        state = cls(**params)
+        state.seed(df)
+        return state
+
+    def seed(self, df: pd.DataFrame):
+        """
+        Load state from a history frame (needs a Close column) without
+        emitting events. Vectorized, so seeding long histories is cheap.
+        """
+        close = df["Close"]
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        close = close.dropna().astype("float64")
+        if close.empty:
+            return self
+        for buf in (self.sma_short, self.sma_long, self.bollinger):
+            for x in close.iloc[-buf.window:]:
+                buf.push(x)
+
+        self.ema.value = _last_ewm(close, self.ema.alpha)
+        self.macd_fast.value = _last_ewm(close, self.macd_fast.alpha)
+        self.macd_slow.value = _last_ewm(close, self.macd_slow.alpha)
+        macd_line = (close.ewm(alpha=self.macd_fast.alpha, adjust=False).mean()
+                     - close.ewm(alpha=self.macd_slow.alpha, adjust=False).mean())
+        self.macd_signal.value = _last_ewm(macd_line, self.macd_signal.alpha)
+        delta = close.diff()
+        self.rsi_gain.value = _last_ewm(delta.clip(lower=0), self.rsi_gain.alpha)
+        self.rsi_loss.value = _last_ewm(-delta.clip(upper=0), self.rsi_loss.alpha)
+
+        self.prev_close = float(close.iloc[-1])
+        self.signal = self._current_signal()
+        self.last_time = close.index[-1]
+        return self
+
+    def _current_signal(self):
+        short, long = self.sma_short.mean(), self.sma_long.mean()
+        return 1 if short > long else (-1 if short < long else 0)
+
+    def update(self, close: float, timestamp=None):
+        """
+        Add one bar. Returns "BUY" or "SELL" when the SMA signal flips from
+        -1 to 1 or from 1 to -1 on this bar, otherwise None.
+        """
+        close = float(close)
+        self.sma_short.push(close)
+        self.sma_long.push(close)
+        self.bollinger.push(close)
+        self.ema.push(close)
+        self.macd_signal.push(self.macd_fast.push(close) - self.macd_slow.push(close))
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            self.rsi_gain.push(max(delta, 0.0))
+            self.rsi_loss.push(max(-delta, 0.0))
+        self.prev_close = close
+        self.last_time = timestamp
+
+        prev_signal, self.signal = self.signal, self._current_signal()
+        crossover = self.signal - prev_signal
+        if crossover == 2:
+            return "BUY"
+        if crossover == -2:
+            return "SELL"
+        return None
+
+    def rsi(self):
+        gain, loss = self.rsi_gain.value, self.rsi_loss.value
+        if gain is None or loss is None:
+            return float("nan")
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def snapshot(self) -> dict:
+        """Current indicator values."""
+        mid = self.bollinger.mean()
+        width = self.bb_k * self.bollinger.std()
+        macd = (self.macd_fast.value - self.macd_slow.value) if self.macd_fast.value is not None else float("nan")
+        macd_signal = self.macd_signal.value if self.macd_signal.value is not None else float("nan")
+        return {
+            "Close": self.prev_close,
+            f"SMA_{self.sma_short.window}": self.sma_short.mean(),
+            f"SMA_{self.sma_long.window}": self.sma_long.mean(),
+            "Signal": self.signal,
+            "EMA": self.ema.value,
+            "RSI": self.rsi(),
+            "MACD": macd,
+            "MACD_Signal": macd_signal,
+            "MACD_Hist": macd - macd_signal,
+            "BB_Mid": mid,
+            "BB_Upper": mid + width,
+            "BB_Lower": mid - width,
+        }
+
+
+# ---------------------------
+# Many symbols
+# ---------------------------
+
+class StreamingSignals:
+    """One ``IncrementalIndicators`` per symbol, fed from a bar stream."""
+
+    def __init__(self, **params):
+        self.params = params
+        self.states = {}
+
+    def seed(self, data_map: dict):
+        for symbol, df in data_map.items():
+            self.states[symbol] = IncrementalIndicators.from_frame(df, **self.params)
+        return self
+
+    def update(self, symbol: str, close: float, timestamp=None):
+        """Feed one bar; returns (symbol, timestamp, event, close) or None."""
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = IncrementalIndicators(**self.params)
+        event = state.update(close, timestamp)
+        return (symbol, timestamp, event, float(close)) if event else None
+
+    def on_bars(self, bars: dict, timestamp=None):
+        """Feed {symbol: close} for one timestamp; returns the list of events."""
+        events = []
+        for symbol, close in bars.items():
+            event = self.update(symbol, close, timestamp)
+            if event:
+                events.append(event)
+        return events
+
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame({s: state.snapshot() for s, state in self.states.items()}).T
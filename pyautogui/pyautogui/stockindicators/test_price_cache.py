@@ -0,0 +1,165 @@
+"""
+Top-up and merge behaviour of ``PriceCache`` against offline sources.
+
+    python -m pytest test_price_cache.py
+"""
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_cache
+from price_cache import PriceCache, CSVSource, SyntheticSource
+
+TODAY = date(2026, 10, 14)  # a Wednesday
+
+
+class FixedDate(date):
+    today_value = TODAY
+
+    @classmethod
+    def today(cls):
+        return cls.today_value
+
+
+class RecordingSource(SyntheticSource):
+    """SyntheticSource that records its calls and can fail, go quiet or rescale."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.error = None
+        self.empty_from = None   # dates from here on have no bars
+        self.live_close = None   # Close of TODAY's bar while its session is open
+        self.scale = 1.0         # adjustment factor applied to every bar
+        self.actions = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((start, end))
+        if self.error is not None:
+            raise self.error
+        if self.empty_from is not None:
+            end = min(end, self.empty_from)
+        if start >= end:
+            return None
+        frame = super().fetch(ticker, start, end)
+        if frame is None:
+            return None
+        frame = frame * self.scale
+        if self.live_close is not None and pd.Timestamp(TODAY) in frame.index:
+            frame.loc[pd.Timestamp(TODAY), "Close"] = self.live_close
+        frame.attrs["actions"] = [d for d in self.actions if start <= date.fromisoformat(d) < end]
+        return frame
+
+
+@pytest.fixture
+def today(monkeypatch):
+    FixedDate.today_value = TODAY
+    monkeypatch.setattr(price_cache, "date", FixedDate)
+    return FixedDate
+
+
+@pytest.fixture
+def source():
+    return RecordingSource()
+
+
+@pytest.fixture
+def cache(tmp_path, source, today):
+    return PriceCache(str(tmp_path / "prices"), source=source)
+
+
+def test_top_up_requests_only_the_missing_head_and_tail(cache, source):
+    first = cache.get("AAA", "2026-03-02", "2026-06-01")
+    assert source.calls == [(date(2026, 3, 2), date(2026, 6, 1))]
+
+    source.calls.clear()
+    cache.get("AAA", "2026-01-05", "2026-07-01")
+    assert source.calls == [(date(2026, 1, 5), date(2026, 3, 2)), (date(2026, 6, 1), date(2026, 7, 1))]
+
+    source.calls.clear()
+    merged = cache.get("AAA", "2026-01-05", "2026-07-01")
+    assert source.calls == []
+    expected = SyntheticSource().fetch("AAA", date(2026, 1, 5), date(2026, 7, 1))
+    pd.testing.assert_frame_equal(merged, expected, check_freq=False)
+    pd.testing.assert_frame_equal(merged.loc[first.index], first, check_freq=False)
+
+
+def test_empty_head_is_covered_but_empty_tail_is_asked_again(cache, source):
+    cache.get("AAA", "2026-03-02", "2026-06-01")
+    source.empty_from = date(2026, 6, 1)
+
+    source.calls.clear()
+    cache.get("AAA", "2025-01-01", "2026-08-03")
+    source.calls.clear()
+    cache.get("AAA", "2025-01-01", "2026-08-03")
+    # the head answered (with bars); the empty tail stays uncovered
+    assert source.calls == [(date(2026, 6, 1), date(2026, 8, 3))]
+
+
+def test_live_bar_is_refreshed_after_the_session(cache, source, today):
+    end = TODAY + timedelta(days=1)
+    source.live_close = 90.0
+    assert cache.get("AAA", "2026-09-01", end)["Close"].iloc[-1] == 90.0
+
+    source.calls.clear()
+    cache.get("AAA", "2026-09-01", end)
+    assert source.calls == []  # within live_ttl
+
+    source.live_close = 120.0
+    today.today_value = TODAY + timedelta(days=1)
+    source.calls.clear()
+    frame = cache.get("AAA", "2026-09-01", end)
+    assert source.calls == [(TODAY, end)]
+    assert frame.loc[pd.Timestamp(TODAY), "Close"] == 120.0
+
+
+def test_failed_top_up_serves_cached_rows_and_empty_cache_raises(cache, source):
+    cached = cache.get("AAA", "2026-03-02", "2026-06-01")
+    source.error = ConnectionError("offline")
+    with pytest.warns(RuntimeWarning, match="serving cached data"):
+        frame = cache.get("AAA", "2026-03-02", "2026-07-01")
+    pd.testing.assert_frame_equal(frame, cached, check_freq=False)
+    with pytest.raises(ConnectionError):
+        cache.get("BBB", "2026-03-02", "2026-06-01")
+
+    # the failed range was not recorded as covered
+    source.error = None
+    source.calls.clear()
+    cache.get("AAA", "2026-03-02", "2026-07-01")
+    assert source.calls == [(date(2026, 6, 1), date(2026, 7, 1))]
+
+
+def test_new_corporate_action_replaces_the_cached_history(cache, source):
+    cache.get("AAA", "2026-03-02", "2026-06-01")
+    source.scale = 0.5
+    source.actions = ["2026-06-15"]
+
+    source.calls.clear()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        frame = cache.get("AAA", "2026-03-02", "2026-07-01")
+    assert source.calls == [(date(2026, 6, 1), date(2026, 7, 1)), (date(2026, 3, 2), date(2026, 7, 1))]
+    expected = SyntheticSource().fetch("AAA", date(2026, 3, 2), date(2026, 7, 1)) * 0.5
+    pd.testing.assert_frame_equal(frame, expected, check_freq=False)
+
+    # seen once: later top-ups merge again
+    source.calls.clear()
+    cache.get("AAA", "2026-03-02", "2026-08-03")
+    assert source.calls == [(date(2026, 7, 1), date(2026, 8, 3))]
+
+
+def test_csv_source_fixture(tmp_path, today):
+    bars = SyntheticSource().fetch("CSV", date(2026, 1, 5), date(2026, 4, 1))
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    bars.to_csv(fixtures / "CSV.csv")
+
+    cache = PriceCache(str(tmp_path / "prices"), source=CSVSource(str(fixtures)))
+    head = cache.get("CSV", "2026-01-05", "2026-02-02")
+    full = cache.get("CSV", "2026-01-05", "2026-04-01")
+    np.testing.assert_allclose(full.to_numpy(), bars.to_numpy())
+    pd.testing.assert_frame_equal(full.loc[head.index], head, check_freq=False)
+    assert cache.get("MISSING", "2026-01-05", "2026-04-01") is None
@@ -0,0 +1,76 @@
+"""
+Bar-by-bar ``IncrementalIndicators`` against the batch indicator functions,
+and the intraday watch path that drives it.
+
+    python -m pytest test_streaming.py
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_engine import add_technical_indicators, compute_indicators
+from intraday import SyntheticMinuteSource, watch_intraday
+from price_cache import SyntheticSource
+from streaming import IncrementalIndicators, StreamingSignals
+
+BATCH = ["EMA", "RSI", "MACD", "MACD_Signal", "MACD_Hist", "BB_Mid", "BB_Upper", "BB_Lower"]
+EVENTS = {2: "BUY", -2: "SELL"}
+
+
+@pytest.fixture
+def bars():
+    return SyntheticSource().fetch("AAA", date(2024, 1, 1), date(2026, 1, 1))
+
+
+@pytest.mark.parametrize("seed_rows", [1, 30, 200])
+def test_updates_match_the_batch_indicators(bars, seed_rows):
+    state = IncrementalIndicators.from_frame(bars.iloc[:seed_rows], sma_short=5, sma_long=20)
+    batch = compute_indicators(bars["Close"], indicators=["EMA", "RSI", "MACD", "BB"])
+    crossovers = add_technical_indicators(bars, sma_short=5, sma_long=20)
+
+    events = []
+    for i in range(seed_rows, len(bars)):
+        event = state.update(bars["Close"].iloc[i], bars.index[i])
+        if event:
+            events.append((bars.index[i], event))
+        snapshot = state.snapshot()
+        for key in BATCH:
+            np.testing.assert_allclose(snapshot[key], batch[key][i], rtol=1e-9, err_msg=f"{key} at row {i}")
+        for key in ("SMA_5", "SMA_20", "Signal"):
+            np.testing.assert_allclose(snapshot[key], crossovers[key].iloc[i], rtol=1e-9, err_msg=f"{key} at row {i}")
+
+    expected = crossovers.iloc[seed_rows:]
+    expected = expected[expected["Crossover"].isin(EVENTS)]
+    assert events == [(t, EVENTS[c]) for t, c in expected["Crossover"].items()]
+    assert events  # the series does cross
+
+
+def test_streaming_signals_seeds_and_updates_each_symbol(bars):
+    other = SyntheticSource().fetch("BBB", date(2024, 1, 1), date(2026, 1, 1))
+    signals = StreamingSignals(sma_short=5, sma_long=20).seed({"AAA": bars.iloc[:100], "BBB": other.iloc[:100]})
+    for t in bars.index[100:]:
+        signals.on_bars({"AAA": bars.at[t, "Close"], "BBB": other.at[t, "Close"]}, t)
+    table = signals.table()
+    for symbol, frame in (("AAA", bars), ("BBB", other)):
+        batch = compute_indicators(frame["Close"], indicators=["EMA", "RSI", "MACD", "BB"])
+        for key in BATCH:
+            np.testing.assert_allclose(table.at[symbol, key], batch[key][-1], rtol=1e-9)
+
+
+def test_watch_intraday_reports_the_crossovers_of_the_session():
+    source = SyntheticMinuteSource(bars_per_day=120)
+    day = date(2026, 10, 14)
+    events = list(watch_intraday(["AAA", "BBB"], source, day=day, polls=2, history_days=2,
+                                 sma_short=5, sma_long=20))
+
+    expected = []
+    for ticker in ("AAA", "BBB"):
+        frames = [source.fetch_day(ticker, d) for d in (date(2026, 10, 12), date(2026, 10, 13), day)]
+        crossovers = add_technical_indicators(pd.concat(frames), sma_short=5, sma_long=20).loc[str(day)]
+        crossovers = crossovers[crossovers["Crossover"].isin(EVENTS)]
+        expected += [(ticker, t, EVENTS[c], close)
+                     for t, c, close in zip(crossovers.index, crossovers["Crossover"], crossovers["Close"])]
+    assert events == expected  # the second poll has no new bars and adds nothing
+    assert events
@@ -0,0 +1,156 @@
+# serve.py
+"""
+Production serving entry point for the Flask demos.
+
+    python serve.py                                  # the calculator API
+    python serve.py message --workers 4 --threads 8  # the root app.py
+    python serve.py path/to/module.py:app --server waitress
+
+Picks the best installed WSGI server unless --server says otherwise:
+
+    gunicorn   pre-forked worker processes, each with a thread pool (POSIX)
+    waitress   one process with a thread pool (any platform)
+    werkzeug   Flask's own server, a thread per connection, with the
+               debugger and reloader off; the fallback when neither is
+               installed
+
+All three keep idle HTTP/1.1 connections open for --keep-alive seconds and
+shut down gracefully on SIGTERM or Ctrl+C: the listening socket closes
+first, then gunicorn gives its workers up to --graceful-timeout seconds and
+werkzeug joins its request threads. The debugger and reloader of
+``app.run`` are never enabled here.
+"""
+import argparse
+import importlib
+import os
+import signal
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APPS = {
+    "calculator": os.path.join(ROOT, "pyautogui", "pyautogui", "flask_demo", "flask_structure.py") + ":app",
+    "message": os.path.join(ROOT, "app.py") + ":app",
+}
+SERVERS = ("gunicorn", "waitress", "werkzeug")
+
+
+def load_app(spec: str):
+    """A WSGI app from an ``APPS`` name or ``path/to/module.py:attribute``."""
+    path, _, attr = APPS.get(spec, spec).partition(":")
+    directory, module = os.path.split(os.path.abspath(path))
+    # the demos import their sibling modules by plain name
+    sys.path.insert(0, directory)
+    return getattr(importlib.import_module(os.path.splitext(module)[0]), attr or "app")
+
+
+def default_server() -> str:
+    for name in SERVERS[:2]:
+        if name == "gunicorn" and os.name != "posix":
+            continue
+        try:
+            importlib.import_module(name)
+            return name
+        except ImportError:
+            pass
+    return "werkzeug"
+
+
+def serve_gunicorn(app, args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {"bind": f"{args.host}:{args.port}", "workers": args.workers, "threads": args.threads,
+                       "worker_class": "gthread", "keepalive": args.keep_alive,
+                       "graceful_timeout": args.graceful_timeout, "timeout": args.timeout,
+                       "accesslog": "-" if args.access_log else None}
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    # gunicorn handles SIGTERM itself: stop accepting, wait graceful_timeout for workers
+    Application().run()
+
+
+def serve_waitress(app, args):
+    import waitress
+
+    if args.workers > 1:
+        print("waitress runs a single process; use --threads to scale, or --server gunicorn for workers")
+    server = waitress.create_server(app, host=args.host, port=args.port, threads=args.threads,
+                                    channel_timeout=args.keep_alive, cleanup_interval=min(args.keep_alive, 30))
+
+    def stop(signum, frame):
+        server.close()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"waitress serving on http://{args.host}:{args.port} with {args.threads} threads")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def serve_werkzeug(app, args):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class Handler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep connections alive between requests
+        timeout = args.keep_alive       # ...until idle this long
+
+        def log_request(self, *a, **kw):
+            if args.access_log:
+                super().log_request(*a, **kw)
+
+    if args.workers > 1:
+        print("werkzeug runs a single process; use --server gunicorn for worker processes")
+    server = make_server(args.host, args.port, app, threaded=True, request_handler=Handler)
+    # let server_close() wait for requests in flight instead of killing them
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"werkzeug serving on http://{args.host}:{args.port} with a thread per connection "
+          "(install gunicorn or waitress for a production server)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # joins the request threads still running, bounded by the socket timeout
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("app", nargs="?", default="calculator",
+                        help=f"one of {', '.join(APPS)} or path/to/module.py:app (default: calculator)")
+    parser.add_argument("--server", choices=SERVERS, default=None, help="default: the best one installed")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="worker processes (gunicorn)")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker (gunicorn, waitress)")
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds an idle connection stays open")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds requests in flight get to finish on shutdown (gunicorn)")
+    parser.add_argument("--timeout", type=int, default=60, help="seconds before a stuck worker is restarted (gunicorn)")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    app = load_app(args.app)
+    server = args.server or default_server()
+    {"gunicorn": serve_gunicorn, "waitress": serve_waitress, "werkzeug": serve_werkzeug}[server](app, args)
+
+
+if __name__ == "__main__":
+    main()